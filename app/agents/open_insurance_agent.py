@@ -1,13 +1,17 @@
-from app.rag.vectorstore import build_or_load_vectorstore
+from app.rag.vectorstore import get_vectorstore
 from app.rag.rag_pipeline import answer_question
 from app.core.logger import logger
 
-logger.info("Carregando vetor Pinecone...")
-vs = build_or_load_vectorstore()  # carrega índice existente
-logger.info("Vetor carregado.")
+
+def __getattr__(name):
+    # Compatibilidade com `open_insurance_agent.vs`: o vectorstore é carregado no primeiro acesso
+    if name == "vs":
+        return get_vectorstore()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def run_oi_agent(question: str):
     logger.info(f"[Pergunta] {question}")
-    answer, meta = answer_question(vs, question)
+    answer, meta = answer_question(get_vectorstore(), question)
     logger.info(f"[Resposta] latência={meta['latency']}s | ctx={meta['contexts']}")
     return {"answer": answer, "meta": meta}
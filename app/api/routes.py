@@ -1,15 +1,25 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import time
+import math
 import os
+import json
+from contextlib import contextmanager
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 
 from app.rag.vectorstore import build_or_load_vectorstore
-from app.rag.rag_pipeline import answer_question
-from app.rag.prompts import PromptTemplates
-from app.rag.ingest import load_documents, chunk_documents
+from app.rag.rag_pipeline import aanswer_batch, aanswer_question, astream_answer_question
+from app.rag.jobs import get_job_manager
+from app.rag.cache import get_answer_cache
+from app.core.admission import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, Overloaded, get_admission_controller, provider_names, request_options,
+)
 from app.core.config import settings
+from app.core.profiling import SamplingProfiler, profile_path
+from app.core.tracing import start_trace
 
 router = APIRouter(prefix="/api/v1", tags=["Open Insurance Agent"])
 
@@ -31,6 +41,9 @@ class QuestionRequest(BaseModel):
     question: str = Field(..., description="Pergunta sobre Open Insurance Brasil", min_length=5, max_length=500)
     prompt_style: Optional[str] = Field("concise", description="Estilo do prompt: concise, detailed, bullet_points, yes_no")
     return_contexts: Optional[bool] = Field(False, description="Retornar contextos recuperados do vectorstore")
+    include_timings: Optional[bool] = Field(False, description="Incluir o tempo por etapa (trace) em metadata.timings")
+    profile: Optional[bool] = Field(False, description="Gravar um perfil de amostragem (collapsed stacks) da requisição; requer PROFILING_ENABLED")
+    deadline_seconds: Optional[float] = Field(None, gt=0, le=300, description="Prazo máximo de espera na fila de admissão (padrão ADMISSION_DEADLINE_SECONDS)")
     
     class Config:
         json_schema_extra = {
@@ -42,6 +55,25 @@ class QuestionRequest(BaseModel):
         }
 
 
+class BatchQuestionRequest(BaseModel):
+    """Request para consulta em lote (ex.: checklist de auditoria)"""
+    questions: List[str] = Field(..., description="Perguntas sobre Open Insurance Brasil", min_length=1)
+    prompt_style: Optional[str] = Field("concise", description="Estilo do prompt: concise, detailed, bullet_points, yes_no")
+    return_contexts: Optional[bool] = Field(False, description="Retornar contextos recuperados do vectorstore")
+    deadline_seconds: Optional[float] = Field(None, gt=0, le=3600, description="Prazo máximo de espera de cada pergunta na fila de admissão (padrão ADMISSION_BATCH_DEADLINE_SECONDS)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "questions": [
+                    "O que é DCR no Open Insurance?",
+                    "Quais são os requisitos de certificados no Open Insurance?"
+                ],
+                "prompt_style": "concise"
+            }
+        }
+
+
 class Context(BaseModel):
     """Contexto recuperado do vectorstore"""
     content: str = Field(..., description="Conteúdo do chunk")
@@ -81,6 +113,82 @@ class MetricsResponse(BaseModel):
     use_mmr: bool
     temperature: float
     max_tokens: int
+    answer_cache: Optional[Dict[str, Any]] = Field(None, description="Estatísticas do cache de respostas (se habilitado)")
+    embedding_cache: Optional[Dict[str, Any]] = Field(None, description="Estatísticas do cache de embeddings (se carregado)")
+    llm_router: Optional[Dict[str, Any]] = Field(None, description="Latência e erros por provider (se LLM_PROVIDERS tiver vários)")
+    admission: Optional[Dict[str, Any]] = Field(None, description="Fila de admissão: requisições em andamento e aguardando (se habilitada)")
+
+
+# ==================== HELPERS ====================
+
+def _select_prompt(prompt_style: Optional[str]):
+    """Seleciona o template de prompt pelo estilo (concise por padrão)"""
+    from app.rag.prompts import PromptTemplates
+
+    return PromptTemplates.get_prompt_by_style(prompt_style)
+
+
+def _to_contexts(docs) -> List[Context]:
+    """Converte Documents recuperados em modelos Context"""
+    return [
+        Context(
+            content=doc.page_content,
+            source=doc.metadata.get("source", "unknown"),
+            page=doc.metadata.get("page")
+        )
+        for doc in docs
+    ]
+
+
+@contextmanager
+def _request_diagnostics(request: QuestionRequest, name: str):
+    """Abre o trace da requisição e, se pedido, o profiler de amostragem.
+
+    Retorna (trace, arquivo do perfil); ambos None quando não solicitados. O perfil
+    é gravado ao sair do bloco.
+    """
+    if not (request.include_timings or request.profile):
+        yield None, None
+        return
+    if request.profile and not settings.profiling_enabled:
+        raise HTTPException(status_code=400, detail="Profiling desabilitado no servidor (PROFILING_ENABLED=false)")
+
+    with start_trace(name, prompt_style=request.prompt_style) as trace:
+        if not request.profile:
+            yield trace, None
+            return
+        profile_file = profile_path(settings.profile_dir, trace.id)
+        profiler = SamplingProfiler(interval=settings.profile_interval_ms / 1000)
+        profiler.start()
+        try:
+            yield trace, str(profile_file)
+        finally:
+            profiler.stop()
+            profiler.write(profile_file)
+
+
+def _diagnostics_metadata(request: QuestionRequest, trace, profile_file) -> Dict[str, Any]:
+    metadata = {}
+    if request.include_timings and trace is not None:
+        metadata["timings"] = trace.to_dict()
+    if profile_file is not None:
+        metadata["profile"] = profile_file
+    return metadata
+
+
+def _provider_and_model(name: Optional[str] = None) -> tuple:
+    """Separa "provider:modelo" em (provider, modelo).
+
+    Sem nome (respostas do cache ou de identidade, que não chamam o LLM), usa o
+    provider preferido da configuração.
+    """
+    provider, _, model = (name or provider_names()[0]).partition(":")
+    return provider, model or settings.llm_model
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Formata um evento no padrão Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 # ==================== ENDPOINTS ====================
@@ -110,61 +218,226 @@ async def ask_question(
       "return_contexts": true
     }
     ```
+    
+    Com `"include_timings": true`, `metadata.timings` traz o tempo por etapa (embedding,
+    busca vetorial, montagem do prompt, LLM) e a árvore de spans da requisição.
+    Com `"profile": true` (e `PROFILING_ENABLED=true`), um perfil de amostragem é gravado
+    em `PROFILE_DIR` no formato collapsed stacks e o caminho vem em `metadata.profile`.
+
+    Sob sobrecarga (fila de admissão cheia ou espera estimada maior que `deadline_seconds`),
+    responde 503 imediatamente, com o header `Retry-After`.
     """
     try:
-        start_time = time.time()
-        
-        # Selecionar template de prompt
-        prompt_map = {
-            "concise": PromptTemplates.get_concise_rag_prompt(),
-            "detailed": PromptTemplates.get_detailed_rag_prompt(),
-            "bullet_points": PromptTemplates.get_bullet_points_prompt(),
-            "yes_no": PromptTemplates.get_yes_no_prompt()
-        }
-        
-        prompt_template = prompt_map.get(request.prompt_style, PromptTemplates.get_concise_rag_prompt())
-        
-        # Executar consulta RAG
-        answer, metadata = answer_question(
-            vectorstore=vectorstore,
-            question=request.question,
-            return_contexts=request.return_contexts,
-            prompt_template=prompt_template
-        )
-        
-        latency = time.time() - start_time
-        
-        # Preparar contextos se solicitado
-        contexts_list = None
-        if request.return_contexts and "contexts" in metadata:
-            contexts_list = [
-                Context(
-                    content=ctx.page_content,
-                    source=ctx.metadata.get("source", "unknown"),
-                    page=ctx.metadata.get("page")
-                )
-                for ctx in metadata["contexts"]
-            ]
+        with _request_diagnostics(request, "ask") as (trace, profile_file), \
+                request_options(PRIORITY_INTERACTIVE, request.deadline_seconds):
+            start_time = time.time()
+            
+            prompt_template = _select_prompt(request.prompt_style)
+            
+            # Executar consulta RAG (assíncrona, não bloqueia o event loop)
+            answer, metadata = await aanswer_question(
+                vectorstore=vectorstore,
+                question=request.question,
+                return_contexts=request.return_contexts,
+                prompt_template=prompt_template,
+                prompt_style=request.prompt_style
+            )
+            
+            latency = time.time() - start_time
+            
+            # Preparar contextos se solicitado
+            contexts_list = None
+            if request.return_contexts and "contexts" in metadata:
+                contexts_list = _to_contexts(metadata["contexts"])
+            
+            provider, model = _provider_and_model(metadata.get("llm_provider"))
+            return QuestionResponse(
+                question=request.question,
+                answer=answer,
+                model=model,
+                provider=provider,
+                latency_seconds=round(latency, 2),
+                contexts=contexts_list,
+                metadata={
+                    "prompt_style": request.prompt_style,
+                    "top_k": settings.top_k,
+                    "use_mmr": settings.use_mmr,
+                    "internal_latency": metadata.get("latency"),
+                    "cache": metadata.get("cache"),
+                    "coalesced": metadata.get("coalesced", False),
+                    "context_tokens": metadata.get("context_tokens"),
+                    **_diagnostics_metadata(request, trace, profile_file)
+                }
+            )
         
-        return QuestionResponse(
-            question=request.question,
-            answer=answer,
-            model=settings.llm_model,
-            provider=settings.llm_provider,
-            latency_seconds=round(latency, 2),
-            contexts=contexts_list,
-            metadata={
-                "prompt_style": request.prompt_style,
-                "top_k": settings.top_k,
-                "use_mmr": settings.use_mmr,
-                "internal_latency": metadata.get("latency")
-            }
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
         )
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar pergunta: {str(e)}")
 
 
+@router.post("/ask/stream", summary="Consultar agente com resposta em streaming (SSE)")
+async def ask_question_stream(
+    request: QuestionRequest,
+    vectorstore = Depends(get_vectorstore)
+):
+    """
+    **Consulta o agente com resposta token a token via Server-Sent Events**
+    
+    Mesmo corpo de `/ask`. A resposta é um fluxo `text/event-stream` com os eventos:
+    - `sources`: contextos recuperados (enviados antes da geração)
+    - `token`: fragmentos da resposta à medida que o LLM os gera (`{"text": "..."}`)
+    - `done`: metadados finais, incluindo `latency_seconds` e `ttft_seconds` (tempo até o primeiro token);
+      com `include_timings`/`profile`, também `timings` e `profile`, como em `/ask`
+    - `error`: erro ocorrido durante o processamento; sob sobrecarga, com `retry_after_seconds`
+    
+    **Exemplo de uso:**
+    ```bash
+    curl -N -X POST "http://127.0.0.1:8000/api/v1/ask/stream" \\
+      -H "Content-Type: application/json" \\
+      -d '{"question": "O que é DCR no Open Insurance?"}'
+    ```
+    """
+    prompt_template = _select_prompt(request.prompt_style)
+
+    if request.profile and not settings.profiling_enabled:
+        raise HTTPException(status_code=400, detail="Profiling desabilitado no servidor (PROFILING_ENABLED=false)")
+
+    async def event_stream():
+        try:
+            with _request_diagnostics(request, "ask_stream") as (trace, profile_file), \
+                    request_options(PRIORITY_INTERACTIVE, request.deadline_seconds):
+                async for event, data in astream_answer_question(
+                    vectorstore=vectorstore,
+                    question=request.question,
+                    return_contexts=request.return_contexts,
+                    prompt_template=prompt_template,
+                    prompt_style=request.prompt_style
+                ):
+                    if event == "sources":
+                        yield _sse_event("sources", [ctx.model_dump() for ctx in _to_contexts(data)])
+                    elif event == "token":
+                        yield _sse_event("token", {"text": data})
+                    elif event == "done":
+                        provider, model = _provider_and_model(data.get("llm_provider"))
+                        yield _sse_event("done", {
+                            "question": request.question,
+                            "model": model,
+                            "provider": provider,
+                            "latency_seconds": data.get("latency"),
+                            "ttft_seconds": data.get("ttft"),
+                            "cache": data.get("cache"),
+                            "context_tokens": data.get("context_tokens"),
+                            "prompt_style": request.prompt_style,
+                            "top_k": settings.top_k,
+                            "use_mmr": settings.use_mmr,
+                            **_diagnostics_metadata(request, trace, profile_file)
+                        })
+        except Overloaded as e:
+            yield _sse_event("error", {"detail": str(e), "retry_after_seconds": math.ceil(e.retry_after)})
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Erro ao processar pergunta: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ask/batch", summary="Consultar agente com várias perguntas (NDJSON)")
+async def ask_batch(
+    request: BatchQuestionRequest,
+    vectorstore = Depends(get_vectorstore)
+):
+    """
+    **Responde uma lista de perguntas em uma única requisição**
+    
+    As perguntas são embedadas juntas, as buscas vetoriais rodam em paralelo e as chamadas
+    ao LLM ficam limitadas a `BATCH_LLM_CONCURRENCY`. A resposta é `application/x-ndjson`:
+    uma linha JSON por pergunta, na ordem em que terminam (use `index` para associá-las), com
+    `answer`, `latency_seconds`, `cache`, `context_tokens` e, se solicitado, `contexts`; perguntas
+    com falha trazem `error`. A última linha traz `summary` com totais e a latência do lote.
+    As perguntas do lote entram na fila de admissão com prioridade menor que `/ask` e com prazo
+    próprio (`deadline_seconds` ou `ADMISSION_BATCH_DEADLINE_SECONDS`), longo o bastante para
+    aguardar as cotas do provider; as recusadas por sobrecarga trazem também `retry_after_seconds`.
+    
+    **Exemplo de uso:**
+    ```bash
+    curl -N -X POST "http://127.0.0.1:8000/api/v1/ask/batch" \\
+      -H "Content-Type: application/json" \\
+      -d '{"questions": ["O que é DCR?", "O que é FAPI?"]}'
+    ```
+    """
+    questions = [q.strip() for q in request.questions]
+    if len(questions) > settings.batch_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {settings.batch_max_questions} perguntas por lote (recebidas {len(questions)})"
+        )
+    invalid = [i for i, q in enumerate(questions) if not 5 <= len(q) <= 500]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Perguntas devem ter entre 5 e 500 caracteres (índices {invalid})")
+
+    prompt_template = _select_prompt(request.prompt_style)
+
+    async def result_stream():
+        start = time.time()
+        failed = 0
+        providers = {}
+        deadline = request.deadline_seconds or settings.admission_batch_deadline_seconds
+        with request_options(PRIORITY_BATCH, deadline):
+            async for index, answer, metadata, error in aanswer_batch(
+                vectorstore=vectorstore,
+                questions=questions,
+                return_contexts=request.return_contexts,
+                prompt_template=prompt_template,
+                prompt_style=request.prompt_style
+            ):
+                line = {"index": index, "question": questions[index]}
+                if isinstance(error, Overloaded):
+                    failed += 1
+                    line["error"] = str(error)
+                    line["retry_after_seconds"] = math.ceil(error.retry_after)
+                elif error is not None:
+                    failed += 1
+                    line["error"] = f"Erro ao processar pergunta: {str(error)}"
+                else:
+                    served = metadata.get("llm_provider")
+                    if served:
+                        providers[served] = providers.get(served, 0) + 1
+                    provider, model = _provider_and_model(served)
+                    line.update({
+                        "answer": answer,
+                        "model": model,
+                        "provider": provider,
+                        "latency_seconds": metadata.get("latency"),
+                        "cache": metadata.get("cache"),
+                        "context_tokens": metadata.get("context_tokens"),
+                    })
+                    if request.return_contexts and metadata.get("contexts") is not None:
+                        line["contexts"] = [ctx.model_dump() for ctx in _to_contexts(metadata["contexts"])]
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+        yield json.dumps({"summary": {
+            "questions": len(questions),
+            "failed": failed,
+            "latency_seconds": round(time.time() - start, 3),
+            "providers": providers,
+            "prompt_style": request.prompt_style,
+        }}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/health", response_model=HealthResponse, summary="Health check da API")
 async def health_check():
     """
@@ -173,21 +446,23 @@ async def health_check():
     Retorna informações sobre a configuração atual e disponibilidade dos serviços.
     """
     try:
-        vectorstore = get_vectorstore()
+        vectorstore = await run_in_threadpool(get_vectorstore)
         vectorstore_ready = vectorstore is not None
+        provider, model = _provider_and_model()
         
         return HealthResponse(
             status="healthy",
-            provider=settings.llm_provider,
-            model=settings.llm_model,
+            provider=provider,
+            model=model,
             vectorstore_ready=vectorstore_ready,
             top_k=settings.top_k
         )
     except Exception as e:
+        provider, model = _provider_and_model()
         return HealthResponse(
             status="unhealthy",
-            provider=settings.llm_provider,
-            model=settings.llm_model,
+            provider=provider,
+            model=model,
             vectorstore_ready=False,
             top_k=settings.top_k
         )
@@ -199,10 +474,21 @@ async def get_metrics():
     **Retorna métricas e configurações do sistema**
     
     Informações sobre modelos, embeddings, configuração RAG e parâmetros de otimização.
+    Séries temporais (latência por etapa, cache, tokens, erros) ficam em `GET /metrics`,
+    no formato do Prometheus.
     """
+    from app.core import config
+    from app.core.llm_router import LLMRouter
+    from app.rag.embeddings import CachedEmbeddings
+
+    answer_cache = get_answer_cache()
+    admission = get_admission_controller()
+    llm = config._llm
+    embeddings = getattr(_vectorstore_cache, "embeddings", None)
+    provider, model = _provider_and_model()
     return MetricsResponse(
-        provider=settings.llm_provider,
-        model=settings.llm_model,
+        provider=provider,
+        model=model,
         embedding_model=settings.embedding_model,
         pinecone_index=settings.pinecone_index_name,
         top_k=settings.top_k,
@@ -210,30 +496,57 @@ async def get_metrics():
         chunk_overlap=settings.chunk_overlap,
         use_mmr=settings.use_mmr,
         temperature=settings.temperature,
-        max_tokens=settings.max_tokens
+        max_tokens=settings.max_tokens,
+        answer_cache=answer_cache.stats() if answer_cache is not None else None,
+        embedding_cache=embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None,
+        llm_router=llm.stats() if isinstance(llm, LLMRouter) else None,
+        admission=admission.stats() if admission is not None else None
     )
 
 
 # ==================== UPLOAD MODELS ====================
 
 class UploadResponse(BaseModel):
-    """Response do upload e ingestão"""
+    """Response do upload: o arquivo foi salvo e a ingestão foi enfileirada"""
     success: bool = Field(..., description="Status do upload")
+    job_id: str = Field(..., description="ID do job de ingestão")
+    status: str = Field(..., description="Status do job (queued, running, completed, failed)")
+    status_url: str = Field(..., description="Endpoint para acompanhar o progresso da ingestão")
     filename: str = Field(..., description="Nome do arquivo salvo")
     file_path: str = Field(..., description="Caminho completo do arquivo")
     file_size_bytes: int = Field(..., description="Tamanho do arquivo em bytes")
-    chunks_created: int = Field(..., description="Número de chunks gerados")
-    vectors_added: int = Field(..., description="Vetores adicionados ao Pinecone")
-    processing_time_seconds: float = Field(..., description="Tempo de processamento")
     message: str = Field(..., description="Mensagem descritiva")
 
 
+class JobProgress(BaseModel):
+    """Progresso de um job de ingestão"""
+    stage: Optional[str] = Field(None, description="Etapa atual (processing: leitura, chunking e embedding por página; done)")
+    pages_parsed: int = Field(..., description="Páginas lidas")
+    chunks_created: int = Field(..., description="Chunks gerados")
+    chunks_embedded: int = Field(..., description="Chunks com embedding calculado")
+    vectors_upserted: int = Field(..., description="Vetores enviados ao índice")
+
+
+class JobStatusResponse(BaseModel):
+    """Status de um job de ingestão"""
+    job_id: str = Field(..., description="ID do job")
+    filename: str = Field(..., description="Nome do arquivo")
+    file_path: str = Field(..., description="Caminho completo do arquivo")
+    file_size_bytes: int = Field(..., description="Tamanho do arquivo em bytes")
+    status: str = Field(..., description="Status do job (queued, running, completed, failed)")
+    progress: JobProgress = Field(..., description="Progresso da ingestão")
+    vectors_added: int = Field(..., description="Vetores novos adicionados ao índice")
+    error: Optional[str] = Field(None, description="Erro (se o job falhou)")
+    created_at: float = Field(..., description="Instante de criação (epoch)")
+    processing_time_seconds: Optional[float] = Field(None, description="Tempo de processamento")
+
+
 # ==================== UPLOAD ENDPOINT ====================
 
 ALLOWED_EXTENSIONS = {".pdf", ".txt", ".md"}
 UPLOAD_DIR = Path("data/oi")
 
-@router.post("/upload", response_model=UploadResponse, summary="Upload e ingestão de documentos")
+@router.post("/upload", response_model=UploadResponse, status_code=202, summary="Upload e ingestão de documentos")
 async def upload_document(
     file: UploadFile = File(..., description="Arquivo para upload (PDF, TXT ou MD)")
 ):
@@ -244,8 +557,10 @@ async def upload_document(
     O arquivo será:
     1. Validado (formato e tamanho)
     2. Salvo em `data/oi/`
-    3. Processado (chunking + embeddings)
-    4. Adicionado ao índice Pinecone
+    3. Enfileirado para processamento em segundo plano (chunking + embeddings + índice)
+    
+    A resposta é imediata (`202 Accepted`) e traz o `job_id`; acompanhe o progresso
+    em `GET /api/v1/jobs/{job_id}`.
     
     **Formatos aceitos:** PDF, TXT, MD
     
@@ -256,11 +571,7 @@ async def upload_document(
     curl -X POST "http://127.0.0.1:8000/api/v1/upload" \\
       -F "file=@circular_susep_123.pdf"
     ```
-    
-    **Nota:** O processo de ingestão pode levar alguns segundos dependendo do tamanho do arquivo.
     """
-    start_time = time.time()
-    
     try:
         # Validar extensão do arquivo
         file_ext = Path(file.filename).suffix.lower()
@@ -270,16 +581,14 @@ async def upload_document(
                 detail=f"Formato não suportado. Use: {', '.join(ALLOWED_EXTENSIONS)}"
             )
         
-        # Validar tamanho (máximo 50 MB)
-        content = await file.read()
-        file_size = len(content)
-        max_size = 50 * 1024 * 1024  # 50 MB
-        
-        if file_size > max_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Arquivo muito grande. Tamanho máximo: 50 MB"
-            )
+        # Rejeitar cedo quando o tamanho já é conhecido
+        max_size = settings.upload_max_bytes
+        too_large = HTTPException(
+            status_code=400,
+            detail=f"Arquivo muito grande. Tamanho máximo: {max_size // (1024 * 1024)} MB"
+        )
+        if file.size is not None and file.size > max_size:
+            raise too_large
         
         # Criar diretório se não existir
         UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -299,73 +608,36 @@ async def upload_document(
                 safe_filename = f"{safe_filename}_{timestamp}"
             file_path = UPLOAD_DIR / safe_filename
         
-        # Salvar arquivo
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        print(f"📄 Arquivo salvo: {file_path}")
-        
-        # Processar documento (ingestão) - carregar arquivo específico
-        print("📚 Carregando documento...")
-        docs = []
-        
+        # Salvar em blocos num arquivo temporário, validando o tamanho durante a cópia
+        # (o arquivo nunca fica inteiro em memória)
+        tmp_path = file_path.with_name(file_path.name + ".part")
+        file_size = 0
         try:
-            if file_ext == ".pdf":
-                from langchain_community.document_loaders import PyPDFLoader
-                print(f"🔍 Tentando carregar PDF: {file_path}")
-                loader = PyPDFLoader(str(file_path))
-                docs = loader.load()
-                print(f"✅ PDF carregado com {len(docs)} páginas")
-            elif file_ext == ".md":
-                from langchain_community.document_loaders import UnstructuredMarkdownLoader
-                docs = UnstructuredMarkdownLoader(str(file_path)).load()
-            elif file_ext == ".txt":
-                from langchain_community.document_loaders import TextLoader
-                docs = TextLoader(str(file_path), encoding="utf-8").load()
-        except Exception as e:
-            # Limpar arquivo em caso de erro
-            print(f"❌ Erro ao carregar: {str(e)}")
-            print(f"❌ Tipo do erro: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()
-            file_path.unlink()
-            raise HTTPException(
-                status_code=400,
-                detail=f"Erro ao carregar documento: {str(e)}"
-            )
-        
-        if not docs:
-            # Limpar arquivo se não foi possível carregar
-            file_path.unlink()
-            raise HTTPException(
-                status_code=400,
-                detail="Documento vazio ou formato não suportado."
-            )
-        
-        print(f"✂️ Criando chunks (docs carregados: {len(docs)})...")
-        chunks = chunk_documents(docs)
-        chunks_count = len(chunks)
-        
-        print(f"🔄 Adicionando {chunks_count} chunks ao Pinecone...")
-        vectorstore = build_or_load_vectorstore(chunks)
+            with open(tmp_path, "wb") as f:
+                while chunk := await file.read(settings.upload_chunk_size):
+                    file_size += len(chunk)
+                    if file_size > max_size:
+                        raise too_large
+                    await run_in_threadpool(f.write, chunk)
+            os.replace(tmp_path, file_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
         
-        # Limpar cache do vectorstore na API
-        global _vectorstore_cache
-        _vectorstore_cache = None
-        
-        processing_time = time.time() - start_time
+        print(f"📄 Arquivo salvo: {file_path}")
         
-        print(f"✅ Ingestão concluída em {processing_time:.2f}s")
+        # Enfileirar ingestão (parsing, embeddings e upsert rodam em segundo plano)
+        job = get_job_manager().submit(file_path, safe_filename, file_size)
         
         return UploadResponse(
             success=True,
+            job_id=job.id,
+            status=job.status,
+            status_url=f"{router.prefix}/jobs/{job.id}",
             filename=safe_filename,
             file_path=str(file_path),
             file_size_bytes=file_size,
-            chunks_created=chunks_count,
-            vectors_added=chunks_count,  # Cada chunk = 1 vetor
-            processing_time_seconds=round(processing_time, 2),
-            message="Obrigado. Você acaba de me deixar mais inteligente!"
+            message="Obrigado. Estou processando o documento para ficar mais inteligente!"
         )
         
     except HTTPException:
@@ -382,3 +654,16 @@ async def upload_document(
             status_code=500,
             detail=f"Erro ao processar upload: {str(e)}"
         )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse, summary="Status de um job de ingestão")
+async def get_job_status(job_id: str):
+    """
+    **Consulta o status e o progresso de uma ingestão enfileirada por `/upload`**
+    
+    O progresso informa páginas lidas, chunks gerados, chunks com embedding e vetores enviados ao índice.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return JobStatusResponse(**job.to_dict())
@@ -0,0 +1,280 @@
+"""Admissão das requisições que chegam ao LLM.
+
+Cada requisição espera numa fila de prioridade limitada até haver vaga
+(`ADMISSION_MAX_CONCURRENCY`) e cota no token bucket de algum provider
+(`LLM_RATE_LIMITS`, requisições e tokens por minuto). Se a espera estimada
+passa do prazo da requisição, ou a fila está cheia, ela é recusada na hora com
+`Overloaded` (503 + Retry-After na API) em vez de esperar e estourar o timeout.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_INFLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT
+
+# Prioridades: menor número é atendido primeiro
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Prioridade/prazo da requisição atual e provider reservado na admissão (lido pelo LLMRouter)
+_request_options: ContextVar[Optional[dict]] = ContextVar("admission_request_options", default=None)
+_admitted_provider: ContextVar[Optional[str]] = ContextVar("admitted_provider", default=None)
+
+
+class Overloaded(Exception):
+    """Requisição recusada pela admissão; `retry_after` em segundos."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Servidor sobrecarregado: {reason}")
+        self.reason = reason
+        self.retry_after = max(1.0, retry_after)
+
+
+class TokenBucket:
+    """Balde com `capacity` unidades, reabastecido a `rate` unidades/s (rate 0 = ilimitado)."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos até haver `amount` unidades disponíveis."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float):
+        if self.rate:
+            self._refill()
+            self.tokens -= amount
+
+
+class ProviderLimiter:
+    """Cotas de um provider: requisições e tokens por minuto."""
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self.requests = TokenBucket(rpm / 60, rpm)
+        self.tokens = TokenBucket(tpm / 60, tpm)
+
+    def _fit(self, tokens: int) -> int:
+        # Uma requisição maior que a cota inteira nunca caberia: consome a cota cheia
+        return min(tokens, self.tokens.capacity) if self.tokens.rate else tokens
+
+    def wait_time(self, requests: int = 1, tokens: int = 0) -> float:
+        """Segundos até caberem `requests` requisições de `tokens` tokens cada."""
+        return max(self.requests.wait_time(requests), self.tokens.wait_time(requests * self._fit(tokens)))
+
+    def take(self, tokens: int):
+        self.requests.take(1)
+        self.tokens.take(self._fit(tokens))
+
+
+def provider_names() -> List[str]:
+    """Nomes dos providers configurados, como no LLMRouter ("provider:modelo")."""
+    from app.core.llm_router import parse_providers
+
+    specs = parse_providers(settings.llm_providers) or [(settings.llm_provider, settings.llm_model)]
+    return [f"{provider}:{model}" if model else provider for provider, model in specs]
+
+
+def _limits_for(name: str) -> Dict[str, float]:
+    # Cota pelo nome completo ("groq:llama-3.3-70b-versatile") ou só pelo provider ("groq")
+    limits = settings.llm_rate_limits
+    return limits.get(name) or limits.get(name.split(":", 1)[0]) or {}
+
+
+def estimate_tokens() -> int:
+    """Tokens estimados de uma requisição: contexto + pergunta/instruções + resposta."""
+    context = settings.context_max_tokens if settings.context_compression and settings.context_max_tokens else 2000
+    return context + 300 + settings.max_tokens
+
+
+class _Waiter:
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """Fila de prioridade com prazos, limite de concorrência e token buckets por provider."""
+
+    def __init__(self, limiters: List[ProviderLimiter], max_concurrency: int, queue_size: int):
+        self.limiters = limiters
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.inflight = 0
+        self.service_time = 2.0  # média móvel do tempo de atendimento (s)
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, w in self._heap if not w.future.done())
+
+    def estimate_wait(self, priority: int, tokens: int) -> float:
+        """Espera estimada de uma requisição nova com a prioridade dada."""
+        ahead = sum(1 for p, _, w in self._heap if p <= priority and not w.future.done())
+        position = ahead + 1
+        free = self.max_concurrency - self.inflight
+        slot_wait = 0.0
+        if position > free:
+            slot_wait = -(-(position - free) // self.max_concurrency) * self.service_time
+        quota_wait = min(lim.wait_time(position, tokens) for lim in self.limiters)
+        return max(slot_wait, quota_wait)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None,
+                      tokens: Optional[int] = None) -> str:
+        """Aguarda a vez da requisição; retorna o provider cuja cota foi reservada."""
+        deadline = settings.admission_deadline_seconds if deadline is None else deadline
+        tokens = estimate_tokens() if tokens is None else tokens
+        with self._lock:
+            estimate = self.estimate_wait(priority, tokens)
+            if self.queue_depth() >= self.queue_size:
+                ADMISSION_REJECTED.labels("queue_full").inc()
+                raise Overloaded("fila de requisições cheia", estimate)
+            if estimate > deadline:
+                ADMISSION_REJECTED.labels("deadline").inc()
+                raise Overloaded(f"espera estimada de {estimate:.1f}s excede o prazo de {deadline:.1f}s", estimate)
+            waiter = _Waiter(tokens)
+            heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+            ADMISSION_QUEUE_DEPTH.inc()
+        self._dispatch()
+
+        try:
+            provider = await asyncio.wait_for(asyncio.shield(waiter.future), timeout=deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                granted = waiter.future.done() and not waiter.future.cancelled()
+                if not granted:
+                    waiter.future.cancel()
+                    ADMISSION_QUEUE_DEPTH.dec()
+            if granted:
+                self.release(0.0)  # vez concedida no mesmo instante do timeout/cancelamento
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            ADMISSION_REJECTED.labels("timeout").inc()
+            raise Overloaded("prazo esgotado na fila", self.estimate_wait(priority, tokens)) from None
+        ADMISSION_WAIT.observe(time.monotonic() - waiter.enqueued)
+        return provider
+
+    def _dispatch(self):
+        """Concede a vez às requisições da frente enquanto houver vaga e cota."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self._heap and self.inflight < self.max_concurrency:
+                _, _, waiter = self._heap[0]
+                if waiter.future.done():
+                    heapq.heappop(self._heap)
+                    continue
+                waits = [(lim.wait_time(1, waiter.tokens), lim) for lim in self.limiters]
+                wait, limiter = min(waits, key=lambda w: w[0])
+                if wait > 0:
+                    # Sem cota agora: tenta de novo quando o balde tiver reabastecido
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                    break
+                heapq.heappop(self._heap)
+                limiter.take(waiter.tokens)
+                self.inflight += 1
+                ADMISSION_QUEUE_DEPTH.dec()
+                ADMISSION_INFLIGHT.inc()
+                waiter.future.set_result(limiter.name)
+
+    def release(self, service_time: float):
+        with self._lock:
+            self.inflight -= 1
+            ADMISSION_INFLIGHT.dec()
+            if service_time:
+                self.service_time = 0.9 * self.service_time + 0.1 * service_time
+        self._dispatch()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "inflight": self.inflight,
+                "queue_depth": self.queue_depth(),
+                "service_time_seconds": round(self.service_time, 3),
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Controlador compartilhado do processo, ou None se a admissão estiver desabilitada."""
+    global _controller
+    if not settings.admission_enabled:
+        return None
+    with _controller_lock:
+        if _controller is None:
+            limiters = [
+                ProviderLimiter(name, _limits_for(name).get("rpm", 0), _limits_for(name).get("tpm", 0))
+                for name in provider_names()
+            ]
+            _controller = AdmissionController(
+                limiters, settings.admission_max_concurrency, settings.admission_queue_size
+            )
+        return _controller
+
+
+@contextmanager
+def request_options(priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None):
+    """Define a prioridade e o prazo usados pela admissão no restante da requisição.
+
+    Restaura com set() em vez de reset(): em geradores async (SSE/NDJSON) o
+    finally pode rodar em outro contexto.
+    """
+    previous = _request_options.get()
+    _request_options.set({"priority": priority, "deadline": deadline})
+    try:
+        yield
+    finally:
+        _request_options.set(previous)
+
+
+def current_request_options() -> Tuple[int, Optional[float]]:
+    """(prioridade, prazo) definidos por request_options para a requisição atual."""
+    options = _request_options.get() or {}
+    return options.get("priority", PRIORITY_INTERACTIVE), options.get("deadline")
+
+
+def admitted_provider() -> Optional[str]:
+    return _admitted_provider.get()
+
+
+@asynccontextmanager
+async def admit():
+    """Aguarda a admissão da requisição atual e libera a vaga ao final."""
+    controller = get_admission_controller()
+    if controller is None:
+        yield
+        return
+    priority, deadline = current_request_options()
+    provider = await controller.acquire(priority, deadline)
+    previous = _admitted_provider.get()
+    _admitted_provider.set(provider)
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        _admitted_provider.set(previous)
+        controller.release(time.monotonic() - start)
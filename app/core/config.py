@@ -1,5 +1,6 @@
+import threading
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # ---- LLM Provider ----
@@ -12,13 +13,47 @@ class Settings(BaseSettings):
     temperature: float = 0.3
     max_tokens: int = 300
 
+    # ---- Roteamento de LLM ----
+    llm_providers: str = ""  # "provider:modelo,..." em ordem de preferência; vazio = só llm_provider/llm_model
+    llm_router_window: int = 100  # chamadas consideradas na latência/taxa de erro de cada provider
+    llm_router_max_error_rate: float = 0.5
+    llm_router_cooldown_seconds: float = 30.0  # quarentena após rate limit ou erros seguidos
+    llm_hedge_enabled: bool = False  # dispara o próximo provider após o p95 do primeiro
+    llm_hedge_min_samples: int = 20
+    llm_hedge_delay_ms: float = 2000.0  # atraso do hedge até haver amostras suficientes
+    llm_request_timeout: float = 60.0
+    llm_http_max_connections: int = 100
+    llm_http_max_keepalive: int = 20
+
+    # ---- Admissão (fila e cotas) ----
+    admission_enabled: bool = True
+    admission_max_concurrency: int = 32  # requisições em recuperação/LLM ao mesmo tempo
+    admission_queue_size: int = 256  # além disso, 503 imediato
+    admission_deadline_seconds: float = 30.0  # prazo padrão na fila; 503 se a espera estimada passar disso
+    admission_batch_deadline_seconds: float = 600.0  # prazo das perguntas do /ask/batch (esperam as cotas do provider)
+    llm_rate_limits: Dict[str, Dict[str, float]] = {}  # {"groq": {"rpm": 30, "tpm": 6000}}; chave "provider" ou "provider:modelo"
+
     # ---- Embeddings ----
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_backend: str = "torch"  # "torch" (sentence-transformers) ou "onnx" (ONNX Runtime, sem PyTorch)
+    embedding_onnx_path: str = "data/models/all-MiniLM-L6-v2-onnx"  # gerado por scripts.export_onnx_embeddings
+    embedding_onnx_quantized: bool = True  # usa model_quantized.onnx (int8)
+    embedding_onnx_batch_size: int = 8  # com sequências longas, lotes menores rendem mais por texto na CPU
+    embedding_onnx_threads: int = 0  # threads do ONNX Runtime; 0 = padrão (núcleos físicos)
+    embedding_cache_size: int = 10000  # 0 desabilita o cache de embeddings
+    embedding_cache_path: Optional[str] = None  # ex.: "data/cache/embeddings.npz"
+
+    # ---- Vector store ----
+    vector_backend: str = "pinecone"  # "pinecone" ou "local" (índice NumPy em processo)
+    local_index_path: str = "data/index"
+    local_index_quantization: str = "none"  # "none", "int8" ou "binary" (primeira passada + rescoring em float32)
+    local_index_rescore_factor: int = 4  # candidatos rescored = top_k x fator
 
     # ---- Pinecone ----
-    pinecone_api_key: str
+    pinecone_api_key: Optional[str] = None  # obrigatório com vector_backend="pinecone"
     pinecone_environment: str = "us-east-1"
     pinecone_index_name: str = "open-insurance-index"
+    pinecone_pool_threads: int = 8  # conexões HTTP reutilizadas pelo cliente Pinecone
 
     # ---- RAG ----
     top_k: int = 7
@@ -26,6 +61,54 @@ class Settings(BaseSettings):
     chunk_overlap: int = 100
     use_mmr: bool = True
     mmr_diversity_score: float = 0.3
+    hybrid_search: bool = True  # funde BM25 (termos exatos: RDD, DCR, FAPI, nº de circulares) com a busca densa
+    hybrid_candidates: int = 20  # candidatos de cada busca antes da fusão
+    rrf_k: int = 60
+    sparse_index_path: str = "data/sparse_index.json"
+    context_compression: bool = True  # deduplica chunks e extrai frases relevantes antes do LLM
+    context_max_tokens: int = 1000  # orçamento de tokens do contexto (0 = sem limite)
+    context_dedup_threshold: float = 0.8  # similaridade (Jaccard) a partir da qual um chunk é descartado
+    context_sentence_extraction: bool = True
+    rerank_enabled: bool = False  # reordena os candidatos com um cross-encoder antes do prompt
+    rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # multilíngue (documentos em português)
+    rerank_candidates: int = 30  # candidatos recuperados para o rerank
+    rerank_top_n: int = 5  # chunks que seguem para o prompt após o rerank
+    rerank_batch_size: int = 16
+    rerank_max_length: int = 256
+    rerank_budget_ms: float = 150.0  # tempo máximo de inferência por requisição (0 = sem limite)
+    rerank_cache_size: int = 10000
+
+    # ---- Perguntas em lote (/ask/batch) ----
+    batch_max_questions: int = 200
+    batch_llm_concurrency: int = 16  # chamadas simultâneas ao LLM por lote
+
+    # ---- Ingestão ----
+    ingest_manifest_path: str = "data/.ingest_manifest.json"
+    ingest_workers: int = 4  # processos para leitura/chunking (1 = serial)
+    ingest_file_timeout: float = 300.0  # segundos por arquivo
+    embed_batch_size: int = 64
+    upsert_batch_size: int = 100
+    upsert_concurrency: int = 4
+    upsert_queue_size: int = 8  # lotes aguardando upsert antes de pausar o embedding
+    upsert_max_retries: int = 3
+    ingest_job_workers: int = 1  # uploads processados em paralelo em segundo plano
+    upload_max_bytes: int = 50 * 1024 * 1024
+    upload_chunk_size: int = 1024 * 1024  # bytes lidos/gravados por vez no upload
+
+    # ---- Cache de respostas ----
+    answer_cache_enabled: bool = True
+    answer_cache_backend: str = "memory"  # "memory" ou "redis" (compartilhado entre workers)
+    answer_cache_max_size: int = 512
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_similarity_threshold: float = 0.95
+    redis_url: str = "redis://localhost:6379/0"
+    coalesce_requests: bool = True  # perguntas idênticas em andamento compartilham uma única execução
+
+    # ---- Observabilidade ----
+    profiling_enabled: bool = False  # permite `profile: true` nas requisições de /ask
+    profile_dir: str = "data/profiles"
+    profile_interval_ms: float = 5.0
+    warmup_on_startup: bool = False  # carrega modelo, índice e LLM no startup da API (lifespan)
 
     class Config:
         env_file = ".env"
@@ -34,26 +117,27 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-# Inicializar LLM baseado no provider
+# Inicializar LLM baseado no provider (ou no roteador, com LLM_PROVIDERS)
 def _init_llm():
-    if settings.llm_provider == "groq":
-        from langchain_groq import ChatGroq
-        return ChatGroq(
-            model=settings.llm_model,
-            temperature=settings.temperature,
-            max_tokens=settings.max_tokens,
-            groq_api_key=settings.groq_api_key
-        )
-    elif settings.llm_provider == "google":
-        from langchain_google_genai import ChatGoogleGenerativeAI
-        return ChatGoogleGenerativeAI(
-            model=settings.llm_model,
-            temperature=settings.temperature,
-            max_output_tokens=settings.max_tokens,
-            google_api_key=settings.google_api_key
-        )
-    else:
-        raise ValueError(f"Provider não suportado: {settings.llm_provider}")
-
-# Instância do LLM
-llm = _init_llm()
+    from app.core.llm_router import build_llm
+    return build_llm()
+
+# Instância do LLM, criada no primeiro uso: importar a configuração não carrega o SDK do provider
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = _init_llm()
+    return _llm
+
+
+def __getattr__(name):
+    # Compatibilidade com `from app.core.config import llm`
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,416 @@
+"""Roteamento de chamadas ao LLM entre vários providers.
+
+`LLM_PROVIDERS` lista os providers em ordem de preferência, no formato
+`provider:modelo` separado por vírgulas (ex.: "groq:llama-3.3-70b-versatile,
+groq:llama-3.1-8b-instant,google:gemini-1.5-flash"). O provider `stub:latência`
+(ex.: "stub:0.2" ou "stub:0.2:0.1" para 10% de erros) responde localmente,
+sem rede, para testes e benchmarks.
+
+O LLMRouter expõe a mesma interface usada pelo pipeline (invoke, ainvoke,
+stream, astream) e, a cada chamada, escolhe o provider saudável mais rápido
+pela latência recente (janela deslizante). Erros passam para o próximo
+provider; rate limit, erros seguidos ou taxa de erro acima de
+`LLM_ROUTER_MAX_ERROR_RATE` deixam o provider em quarentena por
+`LLM_ROUTER_COOLDOWN_SECONDS`. Com `LLM_HEDGE_ENABLED`, `ainvoke` dispara o
+segundo provider se o primeiro não responder dentro do seu p95 e fica com a
+primeira resposta.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from time import perf_counter
+from typing import List, Optional
+
+from app.core.admission import admitted_provider
+from app.core.config import settings
+from app.core.metrics import LLM_HEDGES, LLM_PROVIDER_CALLS, LLM_PROVIDER_LATENCY
+
+# Erros seguidos que colocam o provider em quarentena
+_MAX_CONSECUTIVE_ERRORS = 3
+# Chamadas mínimas na janela antes de a taxa de erro valer como critério de quarentena
+_MIN_CALLS_FOR_ERROR_RATE = 10
+
+# Clientes HTTP compartilhados (keep-alive) entre todos os providers que aceitam httpx
+_http_clients = None
+_http_lock = threading.Lock()
+
+
+def get_http_clients():
+    """Par (httpx.Client, httpx.AsyncClient) com pool de conexões reaproveitadas."""
+    global _http_clients
+    with _http_lock:
+        if _http_clients is None:
+            import httpx
+
+            limits = httpx.Limits(
+                max_connections=settings.llm_http_max_connections,
+                max_keepalive_connections=settings.llm_http_max_keepalive,
+            )
+            timeout = httpx.Timeout(settings.llm_request_timeout)
+            _http_clients = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout),
+            )
+        return _http_clients
+
+
+async def aclose_http_clients():
+    global _http_clients
+    with _http_lock:
+        clients, _http_clients = _http_clients, None
+    if clients is not None:
+        clients[0].close()
+        await clients[1].aclose()
+
+
+class StubChatModel:
+    """Chat model local com latência e taxa de erro configuráveis (sem rede)."""
+
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.0, answer: str = "Resposta simulada."):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.answer = answer
+
+    def _check(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("erro simulado do provider stub")
+
+    def invoke(self, prompt, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        time.sleep(self.latency)
+        self._check()
+        return AIMessage(content=self.answer)
+
+    async def ainvoke(self, prompt, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        await asyncio.sleep(self.latency)
+        self._check()
+        return AIMessage(content=self.answer)
+
+    def stream(self, prompt, **kwargs):
+        from langchain_core.messages import AIMessageChunk
+
+        time.sleep(self.latency)
+        self._check()
+        for token in self.answer.split(" "):
+            yield AIMessageChunk(content=token + " ")
+
+    async def astream(self, prompt, **kwargs):
+        from langchain_core.messages import AIMessageChunk
+
+        await asyncio.sleep(self.latency)
+        self._check()
+        for token in self.answer.split(" "):
+            yield AIMessageChunk(content=token + " ")
+
+
+def create_chat_model(provider: str, model: Optional[str] = None, max_retries: Optional[int] = None):
+    """Cliente LangChain de um provider; Groq usa os clientes HTTP compartilhados."""
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+
+        http_client, http_async_client = get_http_clients()
+        kwargs = {} if max_retries is None else {"max_retries": max_retries}
+        return ChatGroq(
+            model=model or settings.llm_model,
+            temperature=settings.temperature,
+            max_tokens=settings.max_tokens,
+            groq_api_key=settings.groq_api_key,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            **kwargs,
+        )
+    elif provider == "google":
+        # O SDK do Google usa o próprio transporte (gRPC/REST), sem httpx injetável
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        kwargs = {} if max_retries is None else {"max_retries": max_retries}
+        return ChatGoogleGenerativeAI(
+            model=model or settings.llm_model,
+            temperature=settings.temperature,
+            max_output_tokens=settings.max_tokens,
+            google_api_key=settings.google_api_key,
+            **kwargs,
+        )
+    elif provider == "stub":
+        params = [float(p) for p in (model or "").split(":") if p]
+        return StubChatModel(*params)
+    else:
+        raise ValueError(f"Provider não suportado: {provider}")
+
+
+def parse_providers(spec: str) -> List[tuple]:
+    """"groq:modelo,stub:0.2" -> [("groq", "modelo"), ("stub", "0.2")]."""
+    providers = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if item:
+            provider, _, model = item.partition(":")
+            providers.append((provider.strip(), model.strip() or None))
+    return providers
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or "RateLimit" in type(error).__name__
+
+
+class ProviderStats:
+    """Latência e erros das últimas `window` chamadas de um provider."""
+
+    def __init__(self, window: int = 100):
+        self._samples = deque(maxlen=window)  # (latência, ok)
+        self._lock = threading.Lock()
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+
+    def record(self, latency: float, ok: bool, error: Optional[Exception] = None):
+        with self._lock:
+            self._samples.append((latency, ok))
+            if ok:
+                self.consecutive_errors = 0
+                return
+            self.consecutive_errors += 1
+            errors = sum(1 for _, success in self._samples if not success)
+            if (
+                (error is not None and _is_rate_limit(error))
+                or self.consecutive_errors >= _MAX_CONSECUTIVE_ERRORS
+                or (
+                    len(self._samples) >= _MIN_CALLS_FOR_ERROR_RATE
+                    and errors / len(self._samples) > settings.llm_router_max_error_rate
+                )
+            ):
+                # Ao fim da quarentena, a próxima chamada serve de teste
+                self.cooldown_until = time.monotonic() + settings.llm_router_cooldown_seconds
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            values = sorted(latency for latency, ok in self._samples if ok)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def successes(self) -> int:
+        with self._lock:
+            return sum(1 for _, ok in self._samples if ok)
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def snapshot(self) -> dict:
+        p50, p95 = self.latency_quantile(0.5), self.latency_quantile(0.95)
+        with self._lock:
+            calls = len(self._samples)
+        return {
+            "calls": calls,
+            "error_rate": round(self.error_rate(), 4),
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "healthy": self.healthy(),
+            "cooldown_seconds": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+        }
+
+
+class Provider:
+    def __init__(self, name: str, model, window: int = 100):
+        self.name = name
+        self.model = model
+        self.stats = ProviderStats(window)
+
+    def record(self, start: float, ok: bool, error: Optional[Exception] = None):
+        latency = perf_counter() - start
+        self.stats.record(latency, ok, error)
+        LLM_PROVIDER_CALLS.labels(self.name, "ok" if ok else "error").inc()
+        if ok:
+            LLM_PROVIDER_LATENCY.labels(self.name).observe(latency)
+
+
+def _tag(message, provider: Provider):
+    # O pipeline usa a marca para atribuir tokens e a resposta (API, métricas) ao provider que respondeu
+    metadata = getattr(message, "response_metadata", None)
+    if isinstance(metadata, dict):
+        metadata["llm_provider"] = provider.name
+    return message
+
+
+def _tag_error(error: Exception, provider: Provider):
+    # Idem para erros: as métricas atribuem a falha ao provider que a levantou
+    try:
+        error.llm_provider = provider.name
+    except AttributeError:
+        pass
+
+
+class LLMRouter:
+    """Distribui as chamadas entre providers pela latência recente, com failover e hedging opcional."""
+
+    def __init__(self, providers: List[Provider], hedge: bool = False):
+        if not providers:
+            raise ValueError("LLMRouter requer ao menos um provider")
+        self.providers = providers
+        self.hedge = hedge
+
+    def ranked(self) -> List[Provider]:
+        """Saudáveis primeiro (menor p50; sem histórico conta como 0), depois os em quarentena.
+
+        O provider cuja cota foi reservada na admissão da requisição vai à frente dos saudáveis.
+        """
+        reserved = admitted_provider()
+        healthy = [p for p in self.providers if p.stats.healthy()]
+        unhealthy = [p for p in self.providers if p not in healthy]
+        healthy.sort(key=lambda p: (p.name != reserved, p.stats.latency_quantile(0.5) or 0.0))
+        unhealthy.sort(key=lambda p: p.stats.cooldown_until)
+        return healthy + unhealthy
+
+    def hedge_delay(self, provider: Provider) -> float:
+        if provider.stats.successes() >= settings.llm_hedge_min_samples:
+            return provider.stats.latency_quantile(0.95)
+        return settings.llm_hedge_delay_ms / 1000
+
+    def invoke(self, prompt, **kwargs):
+        error = None
+        for provider in self.ranked():
+            start = perf_counter()
+            try:
+                message = provider.model.invoke(prompt, **kwargs)
+            except Exception as e:
+                provider.record(start, False, e)
+                _tag_error(e, provider)
+                error = e
+                continue
+            provider.record(start, True)
+            return _tag(message, provider)
+        raise error
+
+    async def _acall(self, provider: Provider, prompt, **kwargs):
+        start = perf_counter()
+        try:
+            message = await provider.model.ainvoke(prompt, **kwargs)
+        except asyncio.CancelledError:
+            LLM_PROVIDER_CALLS.labels(provider.name, "cancelled").inc()
+            raise
+        except Exception as e:
+            provider.record(start, False, e)
+            _tag_error(e, provider)
+            raise
+        provider.record(start, True)
+        return _tag(message, provider)
+
+    async def ainvoke(self, prompt, **kwargs):
+        ranked = self.ranked()
+        if not self.hedge or len(ranked) < 2:
+            error = None
+            for provider in ranked:
+                try:
+                    return await self._acall(provider, prompt, **kwargs)
+                except Exception as e:
+                    error = e
+            raise error
+        return await self._ahedged(ranked, prompt, **kwargs)
+
+    async def _ahedged(self, ranked: List[Provider], prompt, **kwargs):
+        """Primeiro provider; após o p95 dele sem resposta, dispara o próximo e usa a primeira resposta."""
+        backups = deque(ranked[1:])
+        delay = self.hedge_delay(ranked[0])
+        running = {asyncio.ensure_future(self._acall(ranked[0], prompt, **kwargs)): ranked[0]}
+        hedged = False
+        error = None
+        try:
+            while running:
+                timeout = delay if backups and not hedged else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primeiro provider acima do p95: dispara o hedge
+                    hedged = True
+                    LLM_HEDGES.labels("fired").inc()
+                    provider = backups.popleft()
+                    running[asyncio.ensure_future(self._acall(provider, prompt, **kwargs))] = provider
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        if hedged:
+                            LLM_HEDGES.labels("won" if provider is not ranked[0] else "lost").inc()
+                        return task.result()
+                    error = task.exception()
+                if not running and backups:
+                    provider = backups.popleft()
+                    running[asyncio.ensure_future(self._acall(provider, prompt, **kwargs))] = provider
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stream(self, prompt, **kwargs):
+        error = None
+        for provider in self.ranked():
+            start = perf_counter()
+            started = False
+            try:
+                for chunk in provider.model.stream(prompt, **kwargs):
+                    started = True
+                    yield _tag(chunk, provider)
+            except Exception as e:
+                provider.record(start, False, e)
+                _tag_error(e, provider)
+                if started:
+                    raise  # parte da resposta já foi entregue: não há como trocar de provider
+                error = e
+                continue
+            provider.record(start, True)
+            return
+        raise error
+
+    async def astream(self, prompt, **kwargs):
+        error = None
+        for provider in self.ranked():
+            start = perf_counter()
+            started = False
+            try:
+                async for chunk in provider.model.astream(prompt, **kwargs):
+                    started = True
+                    yield _tag(chunk, provider)
+            except Exception as e:
+                provider.record(start, False, e)
+                _tag_error(e, provider)
+                if started:
+                    raise
+                error = e
+                continue
+            provider.record(start, True)
+            return
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            "hedge": self.hedge,
+            "providers": {p.name: p.stats.snapshot() for p in self.providers},
+        }
+
+
+def build_llm():
+    """Cliente LLM conforme a configuração: um único provider ou um LLMRouter."""
+    specs = parse_providers(settings.llm_providers)
+    if not specs:
+        return create_chat_model(settings.llm_provider, settings.llm_model)
+    if len(specs) == 1:
+        return create_chat_model(*specs[0])
+    # Com vários providers, o failover do roteador substitui as retentativas de cada cliente
+    providers = [
+        Provider(
+            f"{provider}:{model}" if model else provider,
+            create_chat_model(provider, model, max_retries=0 if provider != "stub" else None),
+            window=settings.llm_router_window,
+        )
+        for provider, model in specs
+    ]
+    return LLMRouter(providers, hedge=settings.llm_hedge_enabled)
@@ -1,8 +1,74 @@
-from prometheus_client import Histogram, Counter
+import os
+from contextlib import contextmanager
+from time import perf_counter
 
-LATENCY = Histogram("oi_agent_latency_seconds", "Tempo de resposta do agente")
+from app.core.tracing import span
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+# Buckets de 5 ms a 30 s: cobrem do cache em memória até respostas lentas do LLM
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LATENCY = Histogram("oi_agent_latency_seconds", "Tempo de resposta do agente", buckets=_BUCKETS)
 FALLBACKS = Counter("oi_agent_fallback_total", "Respostas com fallback")
 
+# Etapas do fluxo RAG: embedding, vector_search, sparse_search, rerank, context_assembly, prompt_build, llm_ttft, llm_total
+STAGE_LATENCY = Histogram(
+    "oi_agent_stage_seconds", "Tempo por etapa do fluxo RAG", ["stage"], buckets=_BUCKETS
+)
+ANSWER_CACHE = Counter(
+    "oi_agent_answer_cache_total", "Consultas ao cache de respostas por resultado", ["result"]
+)
+COALESCED_REQUESTS = Counter(
+    "oi_agent_coalesced_requests_total", "Requisições atendidas por uma execução idêntica já em andamento"
+)
+EMBEDDING_CACHE = Counter(
+    "oi_agent_embedding_cache_total", "Consultas ao cache de embeddings por resultado", ["result"]
+)
+RERANK_CACHE = Counter(
+    "oi_agent_rerank_cache_total", "Scores do cross-encoder por resultado do cache", ["result"]
+)
+LLM_TOKENS = Counter(
+    "oi_agent_llm_tokens_total", "Tokens consumidos no LLM", ["provider", "type"]
+)
+LLM_ERRORS = Counter(
+    "oi_agent_llm_errors_total", "Erros nas chamadas ao LLM", ["provider", "error"]
+)
+LLM_PROVIDER_CALLS = Counter(
+    "oi_agent_llm_provider_calls_total", "Chamadas do roteador a cada provider por resultado", ["provider", "result"]
+)
+LLM_PROVIDER_LATENCY = Histogram(
+    "oi_agent_llm_provider_seconds", "Latência das chamadas bem-sucedidas por provider", ["provider"], buckets=_BUCKETS
+)
+LLM_HEDGES = Counter(
+    "oi_agent_llm_hedges_total", "Requisições hedged: disparadas e se o hedge venceu", ["result"]
+)
+CONTEXT_TOKENS = Histogram(
+    "oi_agent_context_tokens",
+    "Tokens do contexto por requisição, antes (raw) e depois (final) da compressão",
+    ["stage"],
+    buckets=(50, 100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000),
+)
+# Admissão: fila de prioridade com prazos e cotas por provider (app/core/admission.py)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "oi_agent_admission_queue_depth", "Requisições aguardando admissão", multiprocess_mode="livesum"
+)
+ADMISSION_INFLIGHT = Gauge(
+    "oi_agent_admission_inflight", "Requisições admitidas em andamento", multiprocess_mode="livesum"
+)
+ADMISSION_WAIT = Histogram(
+    "oi_agent_admission_wait_seconds", "Tempo de espera na fila de admissão", buckets=_BUCKETS
+)
+ADMISSION_REJECTED = Counter(
+    "oi_agent_admission_rejected_total", "Requisições recusadas pela admissão (503) por motivo", ["reason"]
+)
+INGEST_CHUNKS = Counter(
+    "oi_agent_ingest_chunks_total", "Chunks processados na ingestão", ["operation"]
+)
+INGEST_BATCH_LATENCY = Histogram(
+    "oi_agent_ingest_batch_seconds", "Tempo por lote na ingestão", ["stage"], buckets=_BUCKETS
+)
+
+
 def observe_latency(seconds: float):
     LATENCY.observe(seconds)
 
@@ -10,3 +76,59 @@ def count_fallbacks(answer: str):
     text = (answer or "").lower()
     if "não há informações suficientes" in text or "não tenho essa informação" in text:
         FALLBACKS.inc()
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Mede o bloco e registra em `oi_agent_stage_seconds{stage=...}` e no trace ativo."""
+    start = perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        observe_stage(stage, perf_counter() - start)
+
+
+def observe_context_tokens(raw: int, final: int):
+    CONTEXT_TOKENS.labels("raw").observe(raw)
+    CONTEXT_TOKENS.labels("final").observe(final)
+
+
+def count_coalesced():
+    COALESCED_REQUESTS.inc()
+
+
+def count_answer_cache(result):
+    if result is not None:
+        ANSWER_CACHE.labels(result).inc()
+
+
+def count_llm_usage(message, provider: str):
+    """Soma os tokens de `usage_metadata` (AIMessage/AIMessageChunk), quando o provider informa."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    for key, kind in (("input_tokens", "prompt"), ("output_tokens", "completion")):
+        if usage.get(key):
+            LLM_TOKENS.labels(provider, kind).inc(usage[key])
+
+
+def count_llm_error(error: Exception, provider: str):
+    LLM_ERRORS.labels(provider, type(error).__name__).inc()
+
+
+def render_metrics():
+    """Exposição no formato texto do Prometheus: (conteúdo, content-type).
+
+    Com vários workers (uvicorn/gunicorn), defina PROMETHEUS_MULTIPROC_DIR para
+    agregar as métricas de todos os processos.
+    """
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,65 @@
+"""Single-flight: chamadas simultâneas com a mesma chave compartilham uma única execução."""
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplica execuções em andamento por chave.
+
+    `do` (threads) e `ado` (asyncio) retornam (resultado, compartilhado): quem
+    chega enquanto a mesma chave está em execução espera e recebe o mesmo
+    resultado (ou a mesma exceção). Nada fica guardado depois que a execução
+    termina — isso é papel do cache de respostas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    async def ado(self, key, factory):
+        # A chave inclui o event loop: tasks não podem ser aguardadas de outro loop
+        key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None)
+        # shield: se quem iniciou a execução for cancelado (cliente desconectou), os demais seguem esperando
+        return await asyncio.shield(task), shared
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
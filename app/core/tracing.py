@@ -0,0 +1,118 @@
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+# Trace e span ativos na requisição atual. `asyncio.to_thread` copia o contexto,
+# então spans abertos em threads de trabalho também entram na árvore da requisição.
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("oi_agent_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("oi_agent_span", default=None)
+
+
+class Span:
+    """Intervalo nomeado dentro de um trace, com atributos e spans filhos."""
+
+    __slots__ = ("name", "start", "end", "attributes", "children")
+
+    def __init__(self, name: str, start: float, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.children: List["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round(self.duration * 1000, 2),
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class Trace:
+    """Árvore de spans de uma requisição."""
+
+    def __init__(self, name: str, **attributes):
+        self.id = uuid.uuid4().hex[:16]
+        self.root = Span(name, perf_counter(), attributes)
+
+    def _walk(self, span: Span):
+        yield span
+        for child in span.children:
+            yield from self._walk(child)
+
+    def stages(self) -> Dict[str, float]:
+        """Tempo total (ms) por nome de span, somando ocorrências repetidas."""
+        totals: Dict[str, float] = {}
+        for span in self._walk(self.root):
+            if span is not self.root:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration * 1000
+        return {name: round(ms, 2) for name, ms in totals.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.id,
+            "total_ms": round(self.root.duration * 1000, 2),
+            "stages": self.stages(),
+            "spans": [child.to_dict(self.root.start) for child in self.root.children],
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """Abre um trace para a requisição; spans abertos dentro do bloco ficam nele.
+
+    Restaura com set() em vez de reset(): em geradores async (SSE/NDJSON) o
+    finally pode rodar em outro contexto, como após a desconexão do cliente.
+    """
+    trace = Trace(name, **attributes)
+    previous_trace, previous_span = _current_trace.get(), _current_span.get()
+    _current_trace.set(trace)
+    _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        trace.root.end = perf_counter()
+        _current_span.set(previous_span)
+        _current_trace.set(previous_trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Span filho do span ativo. Sem trace ativo não registra nada (custo desprezível)."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, perf_counter(), attributes)
+    parent.children.append(child)
+    _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = perf_counter()
+        _current_span.set(parent)  # set(), não reset(): ver start_trace
+
+
+def record_span(name: str, start: float, end: float, **attributes):
+    """Registra um intervalo já medido (ex.: dentro de geradores, onde o span não pode ficar ativo)."""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = Span(name, start, attributes)
+    child.end = end
+    parent.children.append(child)
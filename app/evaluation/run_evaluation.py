@@ -1,59 +1,293 @@
+"""Avaliação do agente: qualidade da recuperação, latência e RAGAs, com registro no MLflow.
+
+Uso:
+    python -m app.evaluation.run_evaluation [--concurrency 4] [--k 7] [--refresh] [--skip-ragas]
+
+As perguntas rodam em paralelo (limitado por --concurrency) pela versão
+assíncrona do pipeline. As respostas e contextos ficam em cache por
+configuração (modelo, embeddings, índice, parâmetros de RAG e estilo de
+prompt): reavaliar a mesma configuração não chama o LLM de novo, e mudar um
+parâmetro gera um cache novo.
+"""
+import argparse
+import asyncio
+import hashlib
 import json
 import time
-import mlflow
-from datasets import Dataset
-from ragas import evaluate
-from ragas.metrics import faithfulness
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
 from app.core.config import settings
-from app.rag.vectorstore import build_or_load_vectorstore
-from app.rag.rag_pipeline import answer_question
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
 
-if __name__ == "__main__":
-    vs = build_or_load_vectorstore()  # usa índice existente
+DATASET_PATH = Path(__file__).parent / "evaluation.json"
+CACHE_DIR = Path("data/cache/eval")
+RAGAS_METRICS = ("faithfulness", "answer_relevancy", "context_precision", "context_recall")
+# O recall@k e o MRR usam as fontes ranqueadas pela recuperação, não os contextos
+# comprimidos enviados ao prompt (deduplicados e cortados em CONTEXT_MAX_TOKENS)
+RETRIEVAL_METRIC_SOURCE = "ranked_retrieval"
+
+
+def config_snapshot(prompt_style: str) -> dict:
+    """Parâmetros que alteram as respostas; definem a chave do cache de avaliação."""
+    return {
+        "llm_provider": settings.llm_provider,
+        "llm_model": settings.llm_model,
+        "temperature": settings.temperature,
+        "max_tokens": settings.max_tokens,
+        "embedding_model": settings.embedding_model,
+        "embedding_backend": settings.embedding_backend if settings.embedding_backend == "torch" else f"onnx{'-int8' if settings.embedding_onnx_quantized else ''}",
+        "vector_backend": settings.vector_backend,
+        "index": settings.local_index_path if settings.vector_backend == "local" else settings.pinecone_index_name,
+        "local_index_quantization": settings.local_index_quantization if settings.vector_backend == "local" else None,
+        "local_index_rescore_factor": settings.local_index_rescore_factor if settings.vector_backend == "local" else None,
+        "top_k": settings.top_k,
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+        "use_mmr": settings.use_mmr,
+        "mmr_diversity_score": settings.mmr_diversity_score,
+        "hybrid_search": settings.hybrid_search,
+        "hybrid_candidates": settings.hybrid_candidates,
+        "rrf_k": settings.rrf_k,
+        "context_compression": settings.context_compression,
+        "context_max_tokens": settings.context_max_tokens,
+        "context_dedup_threshold": settings.context_dedup_threshold,
+        "context_sentence_extraction": settings.context_sentence_extraction,
+        "rerank_enabled": settings.rerank_enabled,
+        "rerank_model": settings.rerank_model if settings.rerank_enabled else None,
+        "rerank_candidates": settings.rerank_candidates if settings.rerank_enabled else None,
+        "rerank_top_n": settings.rerank_top_n if settings.rerank_enabled else None,
+        "prompt_style": prompt_style,
+        # recall@k/MRR sobre o ranking da recuperação (antes da compressão do contexto)
+        "retrieval_metric_source": RETRIEVAL_METRIC_SOURCE,
+    }
+
+
+def config_fingerprint(config: dict) -> str:
+    raw = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def load_answer_cache(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_answer_cache(path: Path, cache: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1)
+    tmp_path.replace(path)
+
+
+def _nfc(text: str) -> str:
+    # Caminhos com acento podem vir decompostos (NFD), conforme o sistema de arquivos da ingestão
+    return unicodedata.normalize("NFC", text or "")
+
+
+def retrieval_scores(sources, labels, k: int) -> dict:
+    """recall@k (fração dos documentos rotulados entre os k primeiros) e reciprocal rank.
+
+    `labels` são trechos do caminho dos documentos esperados (ex.: o nome da pasta).
+    """
+    top = [_nfc(s) for s in sources[:k]]
+    labels = [_nfc(label) for label in labels]
+    found = {label for label in labels if any(label in s for s in top)}
+    rank = next((i + 1 for i, s in enumerate(top) if any(label in s for label in labels)), None)
+    return {
+        "recall_at_k": len(found) / len(labels),
+        "reciprocal_rank": 1.0 / rank if rank else 0.0,
+    }
+
+
+def latency_summary(latencies) -> dict:
+    if not latencies:
+        return {}
+    values = np.asarray(latencies, dtype=float)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "latency_mean": round(float(values.mean()), 3),
+        "latency_p50": round(float(p50), 3),
+        "latency_p95": round(float(p95), 3),
+        "latency_p99": round(float(p99), 3),
+        "latency_max": round(float(values.max()), 3),
+    }
+
 
-    with open("app/evaluation/evaluation.json", encoding="utf-8") as f:
+async def _answer_rows(vectorstore, rows, cached: dict, prompt_style: str, concurrency: int):
+    """Responde as perguntas fora do cache, no máximo `concurrency` ao mesmo tempo."""
+    from app.rag.prompts import PromptTemplates
+    from app.rag.rag_pipeline import aanswer_question, retrieve_documents
+
+    semaphore = asyncio.Semaphore(concurrency)
+    prompt_template = PromptTemplates.get_prompt_by_style(prompt_style)
+    done = 0
+
+    async def run(row):
+        nonlocal done
+        async with semaphore:
+            try:
+                answer, meta = await aanswer_question(
+                    vectorstore,
+                    row["question"],
+                    return_contexts=True,
+                    prompt_template=prompt_template,
+                    prompt_style=prompt_style,
+                )
+                retrieved = await asyncio.to_thread(retrieve_documents, vectorstore, row["question"])
+                result = {
+                    "answer": answer,
+                    "latency": meta["latency"],
+                    "context_tokens": meta.get("context_tokens"),
+                    "contexts": [
+                        {"text": d.page_content, "source": d.metadata.get("source", ""), "page": d.metadata.get("page")}
+                        for d in meta.get("contexts") or []
+                    ],
+                    "retrieved": [
+                        {"source": d.metadata.get("source", ""), "page": d.metadata.get("page")} for d in retrieved
+                    ],
+                }
+            except Exception as e:
+                result = {"error": f"{type(e).__name__}: {e}"}
+        done += 1
+        status = "❌" if "error" in result else "✅"
+        print(f"{status} [{done}/{len(rows)}] {row['question']}")
+        return row["question"], result
+
+    for question, result in await asyncio.gather(*(run(r) for r in rows)):
+        if "error" not in result:
+            cached[question] = result
+        else:
+            print(f"⚠️  {question}: {result['error']}")
+
+
+def run_ragas(records, metric_names, concurrency: int) -> dict:
+    """Avalia com RAGAs usando os contextos realmente recuperados."""
+    from datasets import Dataset
+    from langchain_groq import ChatGroq
+    from ragas import evaluate
+    from ragas import metrics as ragas_metrics
+    from ragas.run_config import RunConfig
+    from app.rag.vectorstore import get_embeddings
+
+    ds = Dataset.from_list([
+        {
+            "question": r["question"],
+            "answer": r["answer"],
+            "contexts": [c["text"] for c in r["contexts"]],
+            "ground_truth": r["ideal_answer"],
+        }
+        for r in records
+    ])
+    judge_llm = ChatGroq(api_key=settings.groq_api_key, model=settings.llm_model, temperature=0)
+    results = evaluate(
+        ds,
+        metrics=[getattr(ragas_metrics, name) for name in metric_names],
+        llm=judge_llm,
+        embeddings=get_embeddings(),
+        run_config=RunConfig(max_workers=concurrency),
+    )
+    scores = {}
+    for name in metric_names:
+        try:
+            values = np.asarray(results[name], dtype=float)
+            scores[name] = round(float(np.nanmean(values)), 4)
+        except Exception:
+            pass
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avaliação do agente (recuperação, latência e RAGAs)")
+    parser.add_argument("--dataset", default=str(DATASET_PATH))
+    parser.add_argument("--concurrency", type=int, default=4, help="Perguntas em paralelo (padrão: 4)")
+    parser.add_argument("--k", type=int, default=None, help="Corte do recall@k/MRR (padrão: TOP_K)")
+    parser.add_argument("--prompt-style", default="concise")
+    parser.add_argument("--refresh", action="store_true", help="Ignora as respostas em cache desta configuração")
+    parser.add_argument("--skip-ragas", action="store_true", help="Apenas recuperação e latência (sem LLM juiz)")
+    parser.add_argument("--ragas-metrics", default="faithfulness,context_precision,context_recall",
+                        help=f"Métricas RAGAs separadas por vírgula ({', '.join(RAGAS_METRICS)})")
+    parser.add_argument("--experiment", default="oi-agent-evaluation", help="Experimento no MLflow")
+    args = parser.parse_args()
+
+    k = args.k or settings.top_k
+    metric_names = [m.strip() for m in args.ragas_metrics.split(",") if m.strip()]
+    unknown = set(metric_names) - set(RAGAS_METRICS)
+    if unknown:
+        parser.error(f"Métricas RAGAs desconhecidas: {', '.join(sorted(unknown))}")
+
+    with open(args.dataset, encoding="utf-8") as f:
         eval_rows = json.load(f)
 
-    ragas_rows = []
-    total_latency = 0.0
+    # O cache de respostas da API mascararia a latência e reutilizaria respostas de outra configuração
+    settings.answer_cache_enabled = False
 
+    config = config_snapshot(args.prompt_style)
+    fingerprint = config_fingerprint(config)
+    cache_path = CACHE_DIR / f"answers-{fingerprint}.json"
+    cached = {} if args.refresh else load_answer_cache(cache_path)
+    pending = [r for r in eval_rows if r["question"] not in cached]
+
+    print(f"🔧 Configuração {fingerprint}: {len(eval_rows) - len(pending)} respostas em cache, {len(pending)} a gerar")
+    t0 = time.perf_counter()
+    if pending:
+        from app.rag.vectorstore import build_or_load_vectorstore
+
+        vs = build_or_load_vectorstore()  # usa índice existente
+        asyncio.run(_answer_rows(vs, pending, cached, args.prompt_style, args.concurrency))
+        save_answer_cache(cache_path, cached)
+    answer_duration = round(time.perf_counter() - t0, 2)
+
+    records = []
     for row in eval_rows:
-        q, ideal = row["question"], row["ideal_answer"]
-        ans, meta = answer_question(vs, q)
-        ragas_rows.append({
-            "question": q,
-            "answer": ans,
-            "contexts": [],           # opcionalmente, logue os textos aqui
-            "ground_truth": ideal
-        })
-        total_latency += meta["latency"]
-
-    ds = Dataset.from_list(ragas_rows)
-    avg_latency = round(total_latency / max(1, len(ragas_rows)), 3)
-
-    judge_llm = ChatGroq(api_key=settings.groq_api_key, model=settings.gen_model)
-    embedder = HuggingFaceEmbeddings(model_name=settings.embed_model)
+        result = cached.get(row["question"])
+        if result is None:
+            continue
+        record = {**row, **result}
+        labels = row.get("sources") or []
+        if labels:
+            record.update(retrieval_scores([c["source"] for c in result["retrieved"]], labels, k))
+        records.append(record)
+
+    labeled = [r for r in records if "recall_at_k" in r]
+    tokens = [r["context_tokens"] for r in records if r.get("context_tokens") is not None]
+    summary = {
+        "num_questions": len(eval_rows),
+        "num_answered": len(records),
+        "num_failed": len(eval_rows) - len(records),
+        "num_cached": len(eval_rows) - len(pending),
+        f"recall_at_{k}": round(float(np.mean([r["recall_at_k"] for r in labeled])), 4) if labeled else None,
+        "mrr": round(float(np.mean([r["reciprocal_rank"] for r in labeled])), 4) if labeled else None,
+        "retrieval_metric_source": RETRIEVAL_METRIC_SOURCE,
+        "context_tokens_mean": round(float(np.mean(tokens)), 1) if tokens else None,
+        **latency_summary([r["latency"] for r in records]),
+        "answer_duration_s": answer_duration,
+    }
+
+    if records and not args.skip_ragas:
+        print(f"🔎 Avaliando com RAGAs ({', '.join(metric_names)})...")
+        t1 = time.perf_counter()
+        summary.update(run_ragas(records, metric_names, args.concurrency))
+        summary["ragas_duration_s"] = round(time.perf_counter() - t1, 2)
 
+    import mlflow
+
+    mlflow.set_experiment(args.experiment)
     with mlflow.start_run():
-        mlflow.log_param("model", settings.gen_model)
-        mlflow.log_param("embeddings", settings.embed_model)
-        mlflow.log_param("top_k", settings.top_k)
-        mlflow.log_param("num_questions", len(ragas_rows))
-
-        print("🔎 Avaliando com RAGAs (faithfulness)...")
-        t0 = time.perf_counter()
-        results = evaluate(ds, metrics=[faithfulness], llm=judge_llm, embeddings=embedder)
-        duration = round(time.perf_counter() - t0, 2)
-
-        mlflow.log_metric("avg_latency", avg_latency)
-        mlflow.log_metric("eval_duration_s", duration)
-        for k, v in results.items():
-            try:
-                mlflow.log_metric(k, float(v))
-            except Exception:
-                pass
+        mlflow.log_params({**config, "config_fingerprint": fingerprint, "k": k, "concurrency": args.concurrency})
+        for name, value in summary.items():
+            if isinstance(value, (int, float)):
+                mlflow.log_metric(name, value)
+        mlflow.log_dict({"summary": summary, "records": records}, "evaluation_results.json")
+
+    print("✅ Resultados:")
+    for name, value in summary.items():
+        print(f"   {name}: {value}")
 
-        print("✅ Resultados:", results)
-        print(f"⏱️ Latência média: {avg_latency}s | ⌛ Duração avaliação: {duration}s")
+
+if __name__ == "__main__":
+    main()
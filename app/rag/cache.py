@@ -0,0 +1,362 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def normalize_question(question: str) -> str:
+    """Normaliza a pergunta para a chave do cache (caixa, pontuação e espaços)."""
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _serialize_docs(docs) -> List[Dict[str, Any]]:
+    return [{"page_content": d.page_content, "metadata": dict(d.metadata)} for d in docs or []]
+
+
+def _deserialize_docs(items) -> List["Document"]:
+    from langchain_core.documents import Document
+
+    return [Document(page_content=i["page_content"], metadata=i.get("metadata", {})) for i in items or []]
+
+
+def _unit(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+class VectorMatrix:
+    """Vetores normalizados das perguntas em cache numa matriz float32 contígua.
+
+    Uma linha por chave; linhas liberadas são reaproveitadas. A busca do mais
+    próximo é um único produto matriz-vetor, sem tocar nas respostas e
+    documentos guardados.
+    """
+
+    def __init__(self):
+        self._rows: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def put(self, key: str, vector):
+        v = _unit(vector)
+        row = self._rows.get(key)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._keys)
+                self._keys.append(None)
+                if self._matrix is None:
+                    self._matrix = np.zeros((16, v.shape[0]), dtype=np.float32)
+                elif row >= self._matrix.shape[0]:
+                    self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+            self._rows[key] = row
+            self._keys[row] = key
+        self._matrix[row] = v
+
+    def remove(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._keys[row] = None
+            self._matrix[row] = 0.0
+            self._free.append(row)
+
+    def nearest(self, vector) -> Optional[Tuple[str, float]]:
+        """(chave, cosseno) da pergunta mais próxima, ou None se vazia."""
+        if not self._rows:
+            return None
+        scores = self._matrix[:len(self._keys)] @ _unit(vector)
+        if self._free:
+            scores[self._free] = -np.inf
+        best = int(np.argmax(scores))
+        return self._keys[best], float(scores[best])
+
+
+class InMemoryCacheBackend:
+    """Backend em memória do processo, com expulsão LRU e TTL.
+
+    Os vetores das perguntas ficam à parte, numa VectorMatrix por namespace.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._vectors: Dict[str, VectorMatrix] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key: str):
+        _, entry = self._entries.pop(key)
+        vectors = self._vectors.get(entry["namespace"])
+        if vectors is not None:
+            vectors.remove(key)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict, vector=None):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, entry)
+            if vector is not None:
+                self._vectors.setdefault(entry["namespace"], VectorMatrix()).put(key, vector)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def nearest(self, namespace: str, vector) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            vectors = self._vectors.get(namespace)
+            return vectors.nearest(vector) if vectors is not None else None
+
+    def discard(self, namespace: str, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def get_version(self) -> int:
+        return self._version
+
+    def incr_version(self) -> int:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._vectors.clear()
+            return self._version
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Backend compartilhado entre workers via Redis.
+
+    Cada entrada é um JSON com TTL nativo do Redis; um sorted set por namespace
+    guarda o último acesso de cada chave para a expulsão LRU. Os vetores das
+    perguntas ficam num hash por namespace (float32 binário), separados das
+    respostas, e cada processo mantém uma cópia local deles em VectorMatrix,
+    recarregada só quando o contador de geração do namespace muda. Assim uma
+    falha do cache custa um GET; respostas e documentos são lidos só no acerto.
+    """
+
+    def __init__(self, url: str, max_size: int, ttl_seconds: float, prefix: str = "oi-agent:answer:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("Backend 'redis' do cache requer o pacote redis (pip install redis)") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.max_size = max_size
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+        self._replicas: "OrderedDict[str, Tuple[Optional[bytes], VectorMatrix]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+
+    def _ns_key(self, namespace: str) -> str:
+        return f"{self.prefix}ns:{namespace}"
+
+    def _vectors_key(self, namespace: str) -> str:
+        return f"{self.prefix}vectors:{namespace}"
+
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}generation:{namespace}"
+
+    def _remove(self, namespace: str, keys: List[str]):
+        pipe = self.client.pipeline()
+        pipe.delete(*[self._entry_key(k) for k in keys])
+        pipe.zrem(self._ns_key(namespace), *keys)
+        pipe.hdel(self._vectors_key(namespace), *keys)
+        pipe.incr(self._generation_key(namespace))
+        pipe.execute()
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get(self._entry_key(key))
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        self.client.zadd(self._ns_key(entry["namespace"]), {key: time.time()})
+        return entry
+
+    def set(self, key: str, entry: dict, vector=None):
+        namespace = entry["namespace"]
+        ns_key = self._ns_key(namespace)
+        pipe = self.client.pipeline()
+        pipe.set(self._entry_key(key), json.dumps(entry, ensure_ascii=False), ex=self.ttl_seconds)
+        pipe.zadd(ns_key, {key: time.time()})
+        if vector is not None:
+            pipe.hset(self._vectors_key(namespace), key, _unit(vector).tobytes())
+            pipe.incr(self._generation_key(namespace))
+        for k in (ns_key, self._vectors_key(namespace), self._generation_key(namespace)):
+            pipe.expire(k, self.ttl_seconds)
+        pipe.execute()
+
+        overflow = self.client.zcard(ns_key) - self.max_size
+        if overflow > 0:
+            evicted = [k.decode() for k, _ in self.client.zpopmin(ns_key, overflow)]
+            self._remove(namespace, evicted)
+
+    def nearest(self, namespace: str, vector) -> Optional[Tuple[str, float]]:
+        generation = self.client.get(self._generation_key(namespace))
+        if generation is None:
+            return None
+        with self._lock:
+            replica = self._replicas.get(namespace)
+            if replica is None or replica[0] != generation:
+                vectors = VectorMatrix()
+                for key, raw in self.client.hgetall(self._vectors_key(namespace)).items():
+                    vectors.put(key.decode(), np.frombuffer(raw, dtype=np.float32))
+                replica = self._replicas[namespace] = (generation, vectors)
+                while len(self._replicas) > 16:  # namespaces de versões/estilos antigos
+                    self._replicas.popitem(last=False)
+            self._replicas.move_to_end(namespace)
+            return replica[1].nearest(vector)
+
+    def discard(self, namespace: str, key: str):
+        """Remove o vetor de uma entrada que já expirou."""
+        self._remove(namespace, [key])
+
+    def get_version(self) -> int:
+        return int(self.client.get(f"{self.prefix}version") or 0)
+
+    def incr_version(self) -> int:
+        # Entradas antigas deixam de ser alcançáveis e expiram pelo TTL
+        return int(self.client.incr(f"{self.prefix}version"))
+
+    def __len__(self):
+        return sum(self.client.zcard(k) for k in self.client.scan_iter(f"{self.prefix}ns:*"))
+
+
+class AnswerCache:
+    """Cache semântico de respostas do pipeline RAG.
+
+    A chave exata combina a pergunta normalizada, o estilo de prompt e a versão
+    do índice. Em caso de falha exata, busca a pergunta já respondida mais
+    próxima pelo embedding (similaridade de cosseno >= similarity_threshold).
+    """
+
+    def __init__(self, backend, similarity_threshold: float = 0.95):
+        self.backend = backend
+        self.similarity_threshold = similarity_threshold
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+
+    def _namespace(self, prompt_key: str) -> str:
+        return f"v{self.backend.get_version()}:{prompt_key}"
+
+    @staticmethod
+    def _key(namespace: str, question: str) -> str:
+        raw = f"{namespace}|{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_exact(self, question: str, prompt_key: str):
+        """Busca pela pergunta normalizada. Retorna (answer, docs) ou None."""
+        entry = self.backend.get(self._key(self._namespace(prompt_key), question))
+        if entry is None:
+            return None
+        self.hits_exact += 1
+        return entry["answer"], _deserialize_docs(entry["docs"])
+
+    def get_similar(self, vector, prompt_key: str):
+        """Busca a pergunta mais próxima pelo embedding. Retorna (answer, docs) ou None."""
+        if vector is None:
+            self.misses += 1
+            return None
+
+        namespace = self._namespace(prompt_key)
+        best = self.backend.nearest(namespace, vector)
+        if best is None or best[1] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        key = best[0]
+        entry = self.backend.get(key)  # também atualiza a posição LRU
+        if entry is None:
+            self.backend.discard(namespace, key)
+            self.misses += 1
+            return None
+        self.hits_semantic += 1
+        return entry["answer"], _deserialize_docs(entry["docs"])
+
+    def set(self, question: str, prompt_key: str, answer: str, docs, vector=None):
+        namespace = self._namespace(prompt_key)
+        self.backend.set(self._key(namespace, question), {
+            "namespace": namespace,
+            "question": normalize_question(question),
+            "answer": answer,
+            "docs": _serialize_docs(docs),
+        }, vector)
+
+    def invalidate(self):
+        """Invalida todas as respostas (ex.: após adicionar documentos ao índice)."""
+        self.backend.incr_version()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits_exact + self.hits_semantic
+        total = hits + self.misses
+        return {
+            "size": len(self.backend),
+            "index_version": self.backend.get_version(),
+            "hits_exact": self.hits_exact,
+            "hits_semantic": self.hits_semantic,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+# Instância do cache (criada no primeiro uso)
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Retorna o cache de respostas configurado, ou None se desabilitado."""
+    global _answer_cache
+    if not settings.answer_cache_enabled:
+        return None
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                if settings.answer_cache_backend == "redis":
+                    backend = RedisCacheBackend(
+                        settings.redis_url,
+                        settings.answer_cache_max_size,
+                        settings.answer_cache_ttl_seconds,
+                    )
+                elif settings.answer_cache_backend == "memory":
+                    backend = InMemoryCacheBackend(
+                        settings.answer_cache_max_size,
+                        settings.answer_cache_ttl_seconds,
+                    )
+                else:
+                    raise ValueError(f"Backend de cache não suportado: {settings.answer_cache_backend}")
+                _answer_cache = AnswerCache(backend, settings.answer_cache_similarity_threshold)
+    return _answer_cache
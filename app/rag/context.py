@@ -0,0 +1,151 @@
+"""Montagem do contexto enviado ao LLM com orçamento de tokens.
+
+Os chunks recuperados passam por:
+1. remoção da sobreposição entre janelas vizinhas do splitter (chunk_overlap);
+2. descarte de chunks quase duplicados (Jaccard de 3-gramas de palavras);
+3. extração das frases que compartilham termos com a pergunta;
+4. corte pelo orçamento de tokens, respeitando a ordem da recuperação.
+"""
+import re
+import threading
+from typing import List, Tuple
+
+from app.core.config import settings
+from app.rag.sparse import tokenize
+
+# Sobreposições menores que isso são coincidência, não janela do splitter
+_MIN_OVERLAP_CHARS = 20
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Tokenizer cl100k do tiktoken; sem ele (ou sem rede para baixá-lo), usa a estimativa por caracteres."""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encoding = False
+        return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Estimativa de tokens do texto (o tokenizer exato varia por modelo)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def _overlap(left: str, right: str) -> int:
+    """Tamanho do maior sufixo de `left` que é prefixo de `right`."""
+    limit = min(len(left), len(right), max(settings.chunk_overlap * 2, _MIN_OVERLAP_CHARS))
+    for size in range(limit, _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _shingles(text: str) -> set:
+    words = tokenize(text)
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+def relevant_sentences(text: str, question: str) -> str:
+    """Mantém, na ordem original, as frases com termos da pergunta.
+
+    Chunks curtos (até duas frases) ou sem nenhuma frase relacionada ficam
+    inteiros: a busca os considerou relevantes mesmo sem termos em comum.
+    """
+    sentences = split_sentences(text)
+    if len(sentences) <= 2:
+        return text
+    terms = set(tokenize(question))
+    kept = [s for s in sentences if terms.intersection(tokenize(s))]
+    return " ".join(kept) if kept else text
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Corta o texto no limite de tokens, na última frase completa que couber."""
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+
+def compress_context(docs, question: str, max_tokens: int = None) -> Tuple[list, int]:
+    """Aplica deduplicação, extração de frases e orçamento de tokens.
+
+    Retorna (documentos com o texto efetivamente enviado ao LLM, tokens do contexto).
+    Os metadados originais são preservados; o Document original não é alterado.
+    """
+    from langchain_core.documents import Document
+
+    max_tokens = settings.context_max_tokens if max_tokens is None else max_tokens
+    kept = []  # (doc, texto, shingles)
+    for doc in docs:
+        text = doc.page_content or ""
+        source = (doc.metadata.get("source"), doc.metadata.get("page"))
+
+        # Janelas vizinhas do mesmo arquivo/página repetem até chunk_overlap caracteres
+        for prev_doc, prev_text, _ in kept:
+            if (prev_doc.metadata.get("source"), prev_doc.metadata.get("page")) != source:
+                continue
+            size = _overlap(prev_text, text)
+            if size:
+                text = text[size:].lstrip()
+                continue
+            size = _overlap(text, prev_text)
+            if size:
+                text = text[:-size].rstrip()
+
+        shingles = _shingles(text)
+        if not text.strip() or any(
+            _jaccard(shingles, other) >= settings.context_dedup_threshold or text in prev_text
+            for _, prev_text, other in kept
+        ):
+            continue
+        kept.append((doc, text, shingles))
+
+    result = []
+    total = 0
+    separator = count_tokens("\n\n---\n\n")
+    for doc, text, _ in kept:
+        if settings.context_sentence_extraction:
+            text = relevant_sentences(text, question)
+        tokens = count_tokens(text) + (separator if result else 0)
+        if max_tokens and total + tokens > max_tokens:
+            text = _truncate(text, max_tokens - total - (separator if result else 0))
+            if not text:
+                break
+            tokens = count_tokens(text) + (separator if result else 0)
+        result.append(Document(page_content=text, metadata=dict(doc.metadata), id=getattr(doc, "id", None)))
+        total += tokens
+        if max_tokens and total >= max_tokens:
+            break
+    return result, total
@@ -0,0 +1,132 @@
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.metrics import EMBEDDING_CACHE
+
+
+class CachedEmbeddings(Embeddings):
+    """Memoização LRU de embeddings, chaveada por modelo + texto.
+
+    Envolve qualquer `Embeddings` do LangChain: textos já vistos (perguntas
+    repetidas, chunks inalterados numa reingestão) não passam pelo modelo.
+    Opcionalmente persiste em disco (`.npz` com digests de 16 bytes e matriz float32).
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        max_size: int = 10000,
+        cache_path: Optional[str] = None,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_size = max_size
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        if self.cache_path is not None:
+            self.load()
+            atexit.register(self.save)
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def _get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def _put(self, key: bytes, vector):
+        with self._lock:
+            self._entries[key] = np.asarray(vector, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        vectors = [self._get(k) for k in keys]
+
+        # Apenas textos inéditos (e sem repetição) vão ao modelo, em um único lote
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        EMBEDDING_CACHE.labels("miss").inc(len(missing))
+        EMBEDDING_CACHE.labels("hit").inc(len(texts) - len(missing))
+
+        if missing:
+            computed = self.underlying.embed_documents(list(missing.values()))
+            for key, vector in zip(missing.keys(), computed):
+                self._put(key, vector)
+            fresh = {key: np.asarray(v, dtype=np.float32) for key, v in zip(missing.keys(), computed)}
+            vectors = [v if v is not None else fresh[k] for k, v in zip(keys, vectors)]
+
+        return [v.tolist() for v in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is not None:
+            self.hits += 1
+            EMBEDDING_CACHE.labels("hit").inc()
+            return vector.tolist()
+
+        self.misses += 1
+        EMBEDDING_CACHE.labels("miss").inc()
+        vector = self.underlying.embed_query(text)
+        self._put(key, vector)
+        return list(vector)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def load(self):
+        """Carrega o cache persistido em disco, se existir."""
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        with np.load(self.cache_path) as data:
+            keys, vectors = data["keys"], data["vectors"]
+        with self._lock:
+            for key, vector in zip(keys[-self.max_size:], vectors[-self.max_size:]):
+                self._entries[key.tobytes()] = vector
+
+    def save(self):
+        """Persiste o cache em disco (digests + matriz float32)."""
+        if self.cache_path is None or not self._dirty:
+            return
+        with self._lock:
+            if not self._entries:
+                return
+            keys = np.frombuffer(b"".join(self._entries.keys()), dtype=np.uint8).reshape(-1, 16)
+            vectors = np.stack(list(self._entries.values())).astype(np.float32)
+            self._dirty = False
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, keys=keys, vectors=vectors)
+        tmp_path.replace(self.cache_path)
@@ -1,25 +1,385 @@
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredMarkdownLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from pathlib import Path
+from collections import Counter, deque
+from multiprocessing import Pool
+from time import monotonic
+import queue
 from app.core.config import settings
+from app.rag.manifest import IngestManifest, chunk_id, content_hash, file_hash, manifest_lock
+from app.rag.sparse import get_sparse_index
+
+SUPPORTED_EXTENSIONS = {".pdf", ".md", ".txt"}
+
+
+def load_file(path):
+    """Carrega um único arquivo suportado em uma lista de Document."""
+    # Loaders importados sob demanda: langchain_community/unstructured pesam segundos no import
+    p = Path(path)
+    if p.suffix.lower() == ".pdf":
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(str(p)).load()
+    elif p.suffix.lower() == ".md":
+        from langchain_community.document_loaders import UnstructuredMarkdownLoader
+        return UnstructuredMarkdownLoader(str(p)).load()
+    elif p.suffix.lower() == ".txt":
+        from langchain_community.document_loaders import TextLoader
+        return TextLoader(str(p), encoding="utf-8").load()
+    return []
+
+
+def iter_file_pages(path):
+    """Gera os Document de um arquivo sob demanda: PDFs página a página, TXT/MD de uma vez."""
+    p = Path(path)
+    if p.suffix.lower() == ".pdf":
+        from langchain_community.document_loaders import PyPDFLoader
+        yield from PyPDFLoader(str(p)).lazy_load()
+    else:
+        yield from load_file(p)
+
+
+def iter_source_files(data_dir="data/oi"):
+    """Arquivos suportados sob data_dir, em ordem estável."""
+    return sorted(p for p in Path(data_dir).rglob("*") if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS)
+
 
 def load_documents(data_dir="data/oi"):
     docs = []
-    for p in Path(data_dir).rglob("*"):
+    for p in iter_source_files(data_dir):
         try:
-            if p.suffix.lower() == ".pdf":
-                docs.extend(PyPDFLoader(str(p)).load())
-            elif p.suffix.lower() == ".md":
-                docs.extend(UnstructuredMarkdownLoader(str(p)).load())
-            elif p.suffix.lower() == ".txt":
-                docs.extend(TextLoader(str(p), encoding="utf-8").load())
+            docs.extend(load_file(p))
         except Exception as e:
             print(f"⚠️  Erro ao carregar {p.name}: {e}")
     return docs
 
-def chunk_documents(docs):
-    splitter = RecursiveCharacterTextSplitter(
+def _splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
         chunk_size=settings.chunk_size,
         chunk_overlap=settings.chunk_overlap
     )
-    return splitter.split_documents(docs)
+
+
+def chunk_documents(docs):
+    return _splitter().split_documents(docs)
+
+
+def iter_file_chunks(path, on_page=None):
+    """Lê e divide um arquivo página a página, gerando a lista de chunks de cada página.
+
+    Como o splitter trata cada Document de forma independente, o resultado é o
+    mesmo de `chunk_documents(load_file(path))`, mas só uma página fica em memória.
+    `on_page(chunks)` é chamado a cada página, para acompanhamento de progresso.
+    """
+    splitter = _splitter()
+    for page in iter_file_pages(path):
+        chunks = splitter.split_documents([page])
+        if on_page is not None:
+            on_page(chunks)
+        yield chunks
+
+
+def assign_chunk_ids(chunks, source: str, occurrences=None):
+    """Calcula o hash de conteúdo e o ID determinístico de cada chunk (gravados em metadata).
+
+    Para IDs consistentes entre lotes do mesmo arquivo, passe o mesmo `occurrences`.
+    """
+    occurrences = Counter() if occurrences is None else occurrences
+    ids = []
+    for chunk in chunks:
+        h = content_hash(chunk.page_content)
+        cid = chunk_id(source, h, occurrences[h])
+        occurrences[h] += 1
+        chunk.metadata["chunk_hash"] = h
+        chunk.metadata["chunk_id"] = cid
+        ids.append(cid)
+    return ids
+
+
+def write_chunk_batches(source: str, batches, previous, vectorstore, sparse=None):
+    """Envia ao índice os chunks novos de cada lote e remove ao final os IDs que sumiram.
+
+    Os lotes são consumidos um a um (ex.: uma página por vez). Com `sparse`, o
+    índice BM25 recebe os chunks que ainda não tem (inclusive os que já estavam
+    no índice vetorial) e perde os removidos. Retorna (ids, adicionados, removidos).
+    """
+    occurrences = Counter()
+    ids = []
+    added = 0
+    for chunks in batches:
+        batch_ids = assign_chunk_ids(chunks, source, occurrences)
+        new_chunks = [(cid, c) for cid, c in zip(batch_ids, chunks) if cid not in previous]
+        if new_chunks:
+            vectorstore.add_documents([c for _, c in new_chunks], ids=[cid for cid, _ in new_chunks])
+        if sparse is not None:
+            missing = set(sparse.missing(batch_ids))
+            sparse_chunks = [(cid, c) for cid, c in zip(batch_ids, chunks) if cid in missing]
+            if sparse_chunks:
+                sparse.add(
+                    [cid for cid, _ in sparse_chunks],
+                    [c.page_content for _, c in sparse_chunks],
+                    [c.metadata for _, c in sparse_chunks],
+                )
+        ids.extend(batch_ids)
+        added += len(new_chunks)
+
+    stale_ids = list(set(previous) - set(ids))
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+        if sparse is not None:
+            sparse.delete(stale_ids)
+    return ids, added, len(stale_ids)
+
+
+def sync_file_chunks(manifest: IngestManifest, path, chunks, vectorstore, hash_=None, sparse=None):
+    """Aplica ao índice apenas a diferença entre os chunks atuais do arquivo e os do manifesto.
+
+    Retorna (adicionados, removidos).
+    """
+    source = Path(path).as_posix()
+    previous = set((manifest.get(source) or {}).get("ids", []))
+    ids, added, deleted = write_chunk_batches(source, [chunks], previous, vectorstore, sparse)
+    manifest.update(source, path, ids, hash_)
+    return added, deleted
+
+
+def _forget_failed_ids(manifest: IngestManifest, failed_ids):
+    """Retira do manifesto os IDs cujo upsert falhou e força a reanálise dos arquivos afetados."""
+    if not failed_ids:
+        return
+    for entry in manifest.files.values():
+        if failed_ids.intersection(entry.get("ids", [])):
+            entry["ids"] = [i for i in entry["ids"] if i not in failed_ids]
+            entry["hash"] = entry["mtime"] = None
+
+
+def _index_file_batches(path, batches, vectorstore=None, manifest_path=None):
+    from app.rag.vectorstore import UpsertPipeline
+
+    source = Path(path).as_posix()
+    manifest_path = manifest_path or settings.ingest_manifest_path
+    with manifest_lock:
+        previous = set((IngestManifest.load(manifest_path).get(source) or {}).get("ids", []))
+
+    # O manifesto só é bloqueado para ler e gravar: parsing e embedding rodam sem o lock
+    writer = vectorstore if vectorstore is not None else UpsertPipeline()
+    sparse = get_sparse_index()
+    try:
+        ids, added, deleted = write_chunk_batches(source, batches, previous, writer, sparse)
+    finally:
+        if isinstance(writer, UpsertPipeline):
+            writer.close()
+        if sparse is not None:
+            sparse.persist()
+
+    with manifest_lock:
+        manifest = IngestManifest.load(manifest_path)
+        if ids or previous:
+            manifest.update(source, path, ids)
+        if isinstance(writer, UpsertPipeline):
+            _forget_failed_ids(manifest, writer.failed_ids)
+        manifest.save()
+    return added, deleted
+
+
+def index_file_chunks(path, chunks, vectorstore=None, manifest_path=None):
+    """Indexa os chunks de um arquivo com IDs determinísticos e registra no manifesto."""
+    return _index_file_batches(path, [chunks], vectorstore, manifest_path)
+
+
+def index_file_stream(path, vectorstore=None, manifest_path=None, on_page=None):
+    """Como `index_file_chunks`, mas lendo o arquivo página a página.
+
+    Os chunks de cada página seguem para o embedding/upsert assim que são
+    gerados, então o pico de memória não cresce com o tamanho do documento.
+    """
+    return _index_file_batches(path, iter_file_chunks(path, on_page), vectorstore, manifest_path)
+
+
+def _load_and_chunk(path):
+    """Lê, faz hash e divide um arquivo (executado nos processos de trabalho)."""
+    return file_hash(path), chunk_documents(load_file(path))
+
+
+def iter_parsed_files(paths, workers=None, timeout=None):
+    """Lê e divide arquivos em paralelo, gerando (path, hash, chunks, erro) à medida que terminam.
+
+    Cada arquivo tem no máximo `timeout` segundos; se estourar, o pool é
+    reiniciado e os demais arquivos em andamento são reenfileirados, para que um
+    PDF patológico não trave a ingestão. Com workers <= 1 roda no processo atual.
+    """
+    paths = list(paths)
+    workers = settings.ingest_workers if workers is None else workers
+    timeout = settings.ingest_file_timeout if timeout is None else timeout
+
+    if workers <= 1 or len(paths) <= 1:
+        for p in paths:
+            try:
+                yield (p, *_load_and_chunk(p), None)
+            except Exception as e:
+                yield p, None, [], e
+        return
+
+    results = queue.Queue()
+    pending = deque(paths)
+    running = {}  # path -> instante de início
+    generation = 0
+    pool = Pool(min(workers, len(paths)))
+
+    def submit(p):
+        gen = generation
+        pool.apply_async(
+            _load_and_chunk, (p,),
+            callback=lambda r: results.put((gen, p, r, None)),
+            error_callback=lambda e: results.put((gen, p, None, e)),
+        )
+        running[p] = monotonic()
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                submit(pending.popleft())
+
+            wait = max(0.0, min(running.values()) + timeout - monotonic())
+            try:
+                gen, p, result, error = results.get(timeout=wait)
+            except queue.Empty:
+                # Arquivo(s) acima do timeout: descarta o pool e reenfileira os demais
+                now = monotonic()
+                expired = [p for p, started in running.items() if now - started >= timeout]
+                pool.terminate()
+                pool.join()
+                generation += 1
+                pool = Pool(min(workers, len(paths)))
+                for p in expired:
+                    del running[p]
+                    yield p, None, [], TimeoutError(f"tempo limite de {timeout}s excedido")
+                pending.extendleft(reversed(list(running)))
+                running.clear()
+                continue
+
+            if gen != generation or p not in running:
+                continue  # resultado de um pool já descartado
+            del running[p]
+            if error is not None:
+                yield p, None, [], error
+            else:
+                yield (p, *result, None)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class LegacyIndexError(RuntimeError):
+    """Índice com vetores que o manifesto não conhece (ex.: IDs aleatórios de antes da ingestão incremental)."""
+
+
+def _check_untracked_vectors(manifest: IngestManifest):
+    """Sem manifesto, vetores já existentes no índice não seriam substituídos, e sim duplicados."""
+    from app.rag.vectorstore import index_vector_count
+
+    count = index_vector_count()
+    if count:
+        raise LegacyIndexError(
+            f"O índice já tem {count} vetores, mas o manifesto {manifest.path} está vazio: reindexar "
+            "duplicaria os chunks. Execute uma vez `python -m scripts.ingest_local --rebuild` para "
+            "apagar o índice e reconstruí-lo com IDs determinísticos."
+        )
+
+
+def incremental_ingest(
+    data_dir="data/oi", vectorstore=None, manifest_path=None, workers=None, file_timeout=None, sparse=None,
+    rebuild=False,
+):
+    """Ingestão incremental guiada pelo manifesto de hashes.
+
+    Arquivos inalterados não são lidos nem reembedados; arquivos alterados têm
+    apenas os chunks novos enviados ao índice; vetores de chunks e arquivos
+    removidos são apagados. A leitura e o chunking rodam em `workers` processos
+    e cada arquivo segue para o índice assim que termina. O vectorstore (e o
+    modelo de embeddings) só é carregado se houver trabalho a fazer.
+
+    Sem `vectorstore` explícito, embedding e upsert passam pelo UpsertPipeline
+    (lotes + upsert concorrente); suas estatísticas, incluindo chunks/s, entram
+    no resultado.
+
+    O índice BM25 da busca híbrida (`sparse`, por padrão o de
+    settings.sparse_index_path) é mantido junto: arquivos inalterados cujos
+    chunks ainda não estão nele são relidos, sem novo embedding.
+
+    Com o índice padrão, um manifesto vazio diante de um índice não vazio
+    (ex.: criado antes dos IDs determinísticos) levanta `LegacyIndexError`;
+    `rebuild=True` apaga o índice, o BM25 e o manifesto e reindexa tudo.
+    """
+    stats = Counter()
+    pipeline = None
+    sparse = sparse if sparse is not None else get_sparse_index()
+
+    def get_vs():
+        nonlocal vectorstore, pipeline
+        if vectorstore is None:
+            from app.rag.vectorstore import UpsertPipeline
+            vectorstore = pipeline = UpsertPipeline()
+        return vectorstore
+
+    with manifest_lock:
+        manifest = IngestManifest.load(manifest_path or settings.ingest_manifest_path)
+        if rebuild:
+            if vectorstore is None:
+                from app.rag.vectorstore import purge_index
+                purge_index()
+            manifest.files.clear()
+            if sparse is not None:
+                sparse.clear()
+            manifest.save()
+        elif vectorstore is None and not manifest.files:
+            _check_untracked_vectors(manifest)
+        seen = set()
+        changed = []
+
+        for p in iter_source_files(data_dir):
+            seen.add(p.as_posix())
+            stats["files_total"] += 1
+            entry = manifest.get(p.as_posix()) or {}
+            if manifest.is_unchanged(p.as_posix(), p) and (
+                sparse is None or not sparse.missing(entry.get("ids", []))
+            ):
+                stats["files_unchanged"] += 1
+            else:
+                changed.append(p)
+
+        for p, hash_, chunks, error in iter_parsed_files(changed, workers, file_timeout):
+            if error is not None:
+                print(f"⚠️  Erro ao carregar {p.name}: {error}")
+                stats["files_failed"] += 1
+                continue
+
+            added, deleted = sync_file_chunks(manifest, p, chunks, get_vs(), hash_, sparse)
+            stats["files_changed"] += 1
+            stats["chunks_total"] += len(chunks)
+            stats["chunks_added"] += added
+            stats["chunks_deleted"] += deleted
+            manifest.save()  # progresso preservado em caso de falha
+
+        prefix = Path(data_dir).as_posix().rstrip("/") + "/"
+        for source in [s for s in manifest.files if s not in seen and s.startswith(prefix)]:
+            stale_ids = manifest.get(source).get("ids", [])
+            if stale_ids:
+                get_vs().delete(ids=stale_ids)
+                if sparse is not None:
+                    sparse.delete(stale_ids)
+            manifest.remove(source)
+            stats["files_removed"] += 1
+            stats["chunks_deleted"] += len(stale_ids)
+
+        if pipeline is not None:
+            pipeline.close()
+            _forget_failed_ids(manifest, pipeline.failed_ids)
+            stats.update(pipeline.stats())
+
+        manifest.save()
+        if sparse is not None:
+            sparse.persist()
+            stats["sparse_chunks"] = len(sparse)
+
+    return dict(stats)
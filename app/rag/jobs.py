@@ -0,0 +1,141 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class IngestionJob:
+    """Estado e progresso de uma ingestão em segundo plano."""
+
+    def __init__(self, file_path: Path, filename: str, file_size: int):
+        self.id = uuid.uuid4().hex
+        self.file_path = Path(file_path)
+        self.filename = filename
+        self.file_size = file_size
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.stage = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.pages_parsed = 0
+        self.chunks_created = 0
+        self.vectors_added = 0
+        self.pipeline = None
+
+    def progress(self) -> Dict[str, Any]:
+        pipeline = self.pipeline
+        return {
+            "stage": self.stage,
+            "pages_parsed": self.pages_parsed,
+            "chunks_created": self.chunks_created,
+            "chunks_embedded": pipeline.chunks_embedded if pipeline is not None else 0,
+            "vectors_upserted": pipeline.vectors_upserted if pipeline is not None else 0,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "file_path": str(self.file_path),
+            "file_size_bytes": self.file_size,
+            "status": self.status,
+            "progress": self.progress(),
+            "vectors_added": self.vectors_added,
+            "error": self.error,
+            "created_at": self.created_at,
+            "processing_time_seconds": round(end - self.started_at, 2) if self.started_at else None,
+        }
+
+
+class JobManager:
+    """Fila de ingestão com um pool limitado de workers.
+
+    O número de workers (`ingest_job_workers`) limita quanto CPU a ingestão
+    pode tomar das consultas em `/ask`; jobs excedentes aguardam na fila.
+    """
+
+    def __init__(self, max_workers: int, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_path: Path, filename: str, file_size: int) -> IngestionJob:
+        job = IngestionJob(file_path, filename, file_size)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Descarta os registros mais antigos já finalizados
+            while len(self._jobs) > self.max_jobs:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status not in ("completed", "failed"):
+                    break
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: IngestionJob):
+        from app.rag.cache import get_answer_cache
+        from app.rag.ingest import index_file_stream
+        from app.rag.vectorstore import UpsertPipeline
+
+        def on_page(chunks):
+            job.pages_parsed += 1
+            job.chunks_created += len(chunks)
+
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            # Parsing, chunking e embedding avançam juntos, página a página
+            job.stage = "processing"
+            job.pipeline = UpsertPipeline()
+            job.vectors_added, _ = index_file_stream(job.file_path, vectorstore=job.pipeline, on_page=on_page)
+            if job.pages_parsed == 0:
+                raise ValueError("Documento vazio ou formato não suportado.")
+            if job.pipeline.failed_ids:
+                raise RuntimeError(f"{len(job.pipeline.failed_ids)} vetores não puderam ser enviados ao índice")
+
+            # Invalidar respostas em cache (o índice mudou)
+            answer_cache = get_answer_cache()
+            if answer_cache is not None:
+                answer_cache.invalidate()
+
+            job.stage = "done"
+            job.status = "completed"
+            print(f"✅ Ingestão de {job.filename} concluída ({job.vectors_added} vetores)")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Erro na ingestão de {job.filename}: {e}")
+            # Sem nenhum vetor no índice, o arquivo salvo não tem utilidade
+            nothing_indexed = job.pipeline is None or job.pipeline.vectors_upserted == 0
+            if nothing_indexed and job.file_path.exists():
+                try:
+                    job.file_path.unlink()
+                except OSError:
+                    pass
+        finally:
+            job.finished_at = time.time()
+
+
+# Instância da fila de ingestão (criada no primeiro uso)
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager(max_workers=settings.ingest_job_workers)
+        return _job_manager
@@ -0,0 +1,361 @@
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.core.tracing import span
+from app.rag import quantization as quant
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Índices dos `k` maiores scores, em ordem decrescente."""
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """Maximal Marginal Relevance vetorizado sobre vetores já normalizados.
+
+    Retorna os índices (em `candidates`) escolhidos, na ordem de seleção.
+    """
+    if len(candidates) == 0 or k <= 0:
+        return []
+    relevance = candidates @ query
+    pairwise = candidates @ candidates.T
+    selected = [int(np.argmax(relevance))]
+    max_sim = pairwise[selected[0]].copy()
+
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(max_sim, pairwise[best], out=max_sim)
+    return selected
+
+
+class LocalVectorIndex:
+    """Índice vetorial em processo com a mesma interface de escrita do Index do Pinecone.
+
+    Os vetores (normalizados) ficam numa matriz float32 `vectors.npy`, aberta com
+    memory-map, e os metadados em `meta.json`, alinhados por linha. A busca é exata
+    (produto interno = cosseno). Remoções apenas mascaram linhas até o próximo `persist()`.
+
+    Com `quantization="int8"` ou `"binary"`, a primeira passada percorre códigos
+    quantizados em memória (`codes.<tipo>.npy`, 4x/32x menores que os vetores) e
+    só os `top_k * rescore_factor` melhores candidatos têm o cosseno exato
+    recalculado em float32, lendo do memory-map apenas essas linhas. Escolha
+    dos candidatos e rescoring usam a mesma matriz, sob o mesmo lock: uma
+    compactação no meio do caminho renumeraria as linhas.
+    """
+
+    def __init__(
+        self,
+        path,
+        dim: Optional[int] = None,
+        auto_reload: bool = True,
+        quantization: str = "none",
+        rescore_factor: int = 4,
+    ):
+        if quantization not in quant.QUANTIZATIONS:
+            raise ValueError(f"Quantização não suportada: {quantization} (use {', '.join(quant.QUANTIZATIONS)})")
+        self.path = Path(path)
+        self.dim = dim
+        self.auto_reload = auto_reload
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self._pending: List[np.ndarray] = []
+        self._records: List[Dict[str, Any]] = []  # {"id": ..., "metadata": {...}}
+        self._positions: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._codes: Optional[np.ndarray] = None  # alinhados às linhas de _vectors (+ _pending)
+        self._scale: Optional[np.ndarray] = None
+        self._loaded_mtime = None
+        self._dirty = False
+        self.load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.path / "meta.json"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.path / "vectors.npy"
+
+    @property
+    def _codes_path(self) -> Path:
+        return self.path / f"codes.{self.quantization}.npy"
+
+    def __len__(self):
+        with self._lock:
+            return int(self._alive.sum())
+
+    def load(self):
+        """Carrega (ou recarrega) o índice persistido em disco."""
+        with self._lock:
+            if not self._meta_path.exists():
+                return
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self._vectors = np.load(self._vectors_path, mmap_mode="r")
+            self._records = meta["records"]
+            self.dim = meta.get("dim") or self.dim
+            self._positions = {r["id"]: i for i, r in enumerate(self._records)}
+            self._alive = np.ones(len(self._records), dtype=bool)
+            self._pending = []
+            self._codes = self._scale = None
+            if self.quantization != "none" and meta.get("quantization") == self.quantization and self._codes_path.exists():
+                codes = np.load(self._codes_path)
+                if len(codes) == len(self._records):
+                    self._codes = codes
+                    self._scale = np.asarray(meta["int8_scale"], dtype=np.float32) if meta.get("int8_scale") else None
+            self._dirty = False
+            self._loaded_mtime = self._meta_path.stat().st_mtime
+
+    def _maybe_reload(self):
+        # Outro processo (ex.: scripts.ingest_local) pode ter persistido uma versão mais nova
+        if not self.auto_reload or self._dirty or not self._meta_path.exists():
+            return
+        if self._meta_path.stat().st_mtime != self._loaded_mtime:
+            self.load()
+
+    def _matrix(self) -> np.ndarray:
+        with self._lock:
+            if self._pending:
+                self._vectors = np.concatenate([np.asarray(self._vectors), *self._pending])
+                self._pending = []
+            return self._vectors
+
+    def _quantized(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Códigos de todas as linhas (calculados sob demanda para as que ainda não têm)."""
+        with self._lock:
+            matrix = self._matrix()
+            if self._codes is None:
+                self._codes, self._scale = quant.encode(self.quantization, matrix, self._scale)
+            elif len(self._codes) < len(matrix):
+                new_codes, _ = quant.encode(self.quantization, matrix[len(self._codes):], self._scale)
+                self._codes = np.concatenate([self._codes, new_codes])
+            return self._codes, self._scale
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Bytes dos vetores float32 e dos códigos quantizados (se houver)."""
+        with self._lock:
+            sizes = {"vectors": int(self._matrix().nbytes)}
+            if self.quantization != "none":
+                sizes["codes"] = int(self._quantized()[0].nbytes)
+            return sizes
+
+    def upsert(self, vectors: Iterable[Dict[str, Any]], **kwargs):
+        """Insere ou atualiza registros {"id", "values", "metadata"} (formato do Pinecone)."""
+        vectors = list({v["id"]: v for v in vectors}.values())  # último valor vence para IDs repetidos
+        if not vectors:
+            return {"upserted_count": 0}
+        values = _normalize(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+
+        with self._lock:
+            if not self._records:
+                self.dim = values.shape[1]
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            elif values.shape[1] != self.dim:
+                raise ValueError(f"Dimensão {values.shape[1]} incompatível com o índice ({self.dim})")
+            new_rows = []
+            for record, row in zip(vectors, values):
+                pos = self._positions.get(record["id"])
+                if pos is not None:
+                    matrix = self._matrix()
+                    if not matrix.flags.writeable:
+                        self._vectors = matrix = np.array(matrix)
+                    matrix[pos] = row
+                    if self._codes is not None and pos < len(self._codes):
+                        self._codes[pos] = quant.encode(self.quantization, row[None], self._scale)[0][0]
+                    self._records[pos] = {"id": record["id"], "metadata": record.get("metadata", {})}
+                    self._alive[pos] = True
+                else:
+                    self._positions[record["id"]] = len(self._records)
+                    self._records.append({"id": record["id"], "metadata": record.get("metadata", {})})
+                    new_rows.append(row)
+            if new_rows:
+                self._pending.append(np.asarray(new_rows, dtype=np.float32))
+                self._alive = np.concatenate([self._alive, np.ones(len(new_rows), dtype=bool)])
+            self._dirty = True
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: Iterable[str] = None, delete_all: bool = False, **kwargs):
+        with self._lock:
+            if delete_all:
+                ids = list(self._positions)
+            for id_ in ids or []:
+                pos = self._positions.pop(id_, None)
+                if pos is not None:
+                    self._alive[pos] = False
+                    self._dirty = True
+
+    def search(self, vector, top_k: int, return_vectors: bool = False) -> List[Dict[str, Any]]:
+        """Busca por cosseno. Retorna [{"id", "metadata", "score"}] em ordem decrescente.
+
+        Sem quantização a busca é exata; com quantização, os candidatos saem dos
+        códigos e os scores retornados são os cossenos exatos após o rescoring.
+        Tudo é resolvido sob o lock, sobre a mesma matriz: um persist() ou
+        reload concorrente compacta e renumera as linhas. Com `return_vectors`,
+        cada resultado traz também o vetor float32 (usado pelo MMR).
+        """
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        with self._lock:
+            self._maybe_reload()
+            matrix = self._matrix()
+            alive = self._alive
+            k = min(top_k, int(alive.sum()))
+            if len(matrix) == 0 or k <= 0:
+                return []
+
+            if self.quantization == "none":
+                scores = np.where(alive, matrix @ query, -np.inf)
+                positions = _top(scores, k)
+                vectors = np.asarray(matrix[positions], dtype=np.float32) if return_vectors else None
+                exact = scores[positions]
+            else:
+                codes, scale = self._quantized()
+                approx = np.where(alive, quant.approximate_scores(self.quantization, codes, query, scale), -np.inf)
+                n = min(k * self.rescore_factor, int(alive.sum()))
+                candidates = np.sort(np.argpartition(-approx, n - 1)[:n])  # ordem de disco: leitura sequencial do memory-map
+                candidate_vectors = np.asarray(matrix[candidates], dtype=np.float32)
+                rescored = candidate_vectors @ query
+                best = _top(rescored, k)
+                positions, exact = candidates[best], rescored[best]
+                vectors = candidate_vectors[best] if return_vectors else None
+
+            results = []
+            for i, pos in enumerate(positions):
+                record = self._records[pos]
+                hit = {"id": record["id"], "metadata": dict(record["metadata"]), "score": float(exact[i])}
+                if vectors is not None:
+                    hit["vector"] = vectors[i]
+                results.append(hit)
+            return results
+
+    def persist(self):
+        """Grava o índice compactado (sem linhas removidas) e o reabre com memory-map."""
+        with self._lock:
+            if not self._dirty:
+                return
+            matrix = self._matrix()
+            keep = np.flatnonzero(self._alive)
+            self.path.mkdir(parents=True, exist_ok=True)
+
+            compacted = np.asarray(matrix[keep], dtype=np.float32)
+            meta = {"dim": self.dim, "quantization": self.quantization, "records": [self._records[i] for i in keep]}
+            tmp_vectors = self.path / "vectors.tmp.npy"
+            np.save(tmp_vectors, compacted)
+            if self.quantization != "none":
+                # Recalibra a escala int8 com o índice compactado
+                codes, scale = quant.encode(self.quantization, compacted)
+                tmp_codes = self.path / f"codes.{self.quantization}.tmp.npy"
+                np.save(tmp_codes, codes)
+                if scale is not None:
+                    meta["int8_scale"] = scale.tolist()
+            tmp_meta = self.path / "meta.tmp.json"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            os.replace(tmp_vectors, self._vectors_path)
+            if self.quantization != "none":
+                os.replace(tmp_codes, self._codes_path)
+            os.replace(tmp_meta, self._meta_path)
+            self.load()
+
+
+class LocalVectorStore(VectorStore):
+    """Adaptador LangChain para o LocalVectorIndex (substitui o PineconeVectorStore)."""
+
+    def __init__(self, index: LocalVectorIndex, embedding: Embeddings, text_key: str = "text"):
+        self.index = index
+        self._embedding = embedding
+        self.text_key = text_key
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _to_document(self, hit: Dict[str, Any]) -> Document:
+        metadata = dict(hit["metadata"])
+        text = metadata.pop(self.text_key, "")
+        return Document(page_content=text, metadata=metadata, id=hit["id"])
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.index.upsert([
+            {"id": id_, "values": vector, "metadata": {**metadata, self.text_key: text}}
+            for id_, vector, metadata, text in zip(ids, vectors, metadatas, texts)
+        ])
+        self.index.persist()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> Optional[bool]:
+        self.index.delete(ids=ids)
+        self.index.persist()
+        return True
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        with span("local_index.search", k=k):
+            results = self.index.search(embedding, k)
+        return [(self._to_document(hit), hit["score"]) for hit in results]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def max_marginal_relevance_search_by_vector(
+        self, embedding: List[float], k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs
+    ) -> List[Document]:
+        with span("local_index.search", k=max(fetch_k, k)):
+            candidates = self.index.search(embedding, max(fetch_k, k), return_vectors=True)
+        if not candidates:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        with span("mmr", candidates=len(candidates), k=k):
+            chosen = mmr_select(query, np.stack([hit["vector"] for hit in candidates]), k, lambda_mult)
+        return [self._to_document(candidates[i]) for i in chosen]
+
+    def max_marginal_relevance_search(
+        self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+        )
+
+    # A busca é local e sub-milissegundo: executá-la direto no event loop evita o custo do executor
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(embedding, k, **kwargs)
+
+    async def amax_marginal_relevance_search_by_vector(
+        self, embedding: List[float], k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, path: str = "data/index", **kwargs) -> "LocalVectorStore":
+        store = cls(LocalVectorIndex(path), embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=kwargs.get("ids"))
+        return store
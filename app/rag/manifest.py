@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Serializa leitura/escrita do manifesto entre threads do mesmo processo
+manifest_lock = threading.Lock()
+
+
+def content_hash(text: str) -> str:
+    """Hash do conteúdo de um chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path, block_size: int = 1024 * 1024) -> str:
+    """Hash SHA-256 do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(source: str, chunk_hash: str, occurrence: int = 0) -> str:
+    """ID determinístico do vetor: mesmo arquivo + mesmo conteúdo => mesmo ID."""
+    raw = f"{source}|{chunk_hash}|{occurrence}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class IngestManifest:
+    """Manifesto local da ingestão incremental.
+
+    Para cada arquivo guarda tamanho, mtime, hash do conteúdo e os IDs dos
+    vetores gerados a partir dele, permitindo reindexar apenas o que mudou.
+    """
+
+    def __init__(self, path, files: Optional[Dict[str, dict]] = None):
+        self.path = Path(path)
+        self.files: Dict[str, dict] = files or {}
+
+    @classmethod
+    def load(cls, path) -> "IngestManifest":
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(path, data.get("files", {}))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def get(self, source: str) -> Optional[dict]:
+        return self.files.get(source)
+
+    def is_unchanged(self, source: str, path) -> bool:
+        """Compara tamanho/mtime e, se necessário, o hash do arquivo com o manifesto."""
+        entry = self.files.get(source)
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        if entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return True
+        if entry.get("size") != stat.st_size:
+            return False
+        if entry.get("hash") == file_hash(path):
+            # Conteúdo igual com mtime diferente (ex.: cópia); atualiza o mtime
+            entry["mtime"] = stat.st_mtime
+            return True
+        return False
+
+    def update(self, source: str, path, ids: List[str], hash_: Optional[str] = None):
+        stat = os.stat(path)
+        self.files[source] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": hash_ or file_hash(path),
+            "ids": ids,
+        }
+
+    def remove(self, source: str):
+        self.files.pop(source, None)
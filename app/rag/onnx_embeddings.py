@@ -0,0 +1,103 @@
+import json
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Gerado por scripts.export_onnx_embeddings ao lado do model.onnx / model_quantized.onnx
+CONFIG_FILE = "onnx_config.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Embeddings do mesmo modelo sentence-transformers, executado pelo ONNX Runtime na CPU.
+
+    Carrega o modelo exportado por `scripts.export_onnx_embeddings` (opcionalmente
+    quantizado em int8) e o `tokenizer.json` com a biblioteca `tokenizers`, sem
+    importar PyTorch. Aplica o mesmo pooling do all-MiniLM-L6-v2 (média dos tokens
+    pela attention mask) e normalização L2, então os vetores são comparáveis aos
+    já indexados com o HuggingFaceEmbeddings.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        model_name: Optional[str] = None,
+        quantized: bool = True,
+        batch_size: int = 32,
+        threads: int = 0,
+    ):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=onnx requer os pacotes onnxruntime e tokenizers (pip install onnxruntime tokenizers)"
+            ) from e
+
+        self.model_dir = Path(model_dir)
+        config_path = self.model_dir / CONFIG_FILE
+        if not config_path.exists():
+            raise FileNotFoundError(
+                f"Modelo ONNX não encontrado em {self.model_dir} (gere com python -m scripts.export_onnx_embeddings)"
+            )
+        with open(config_path, encoding="utf-8") as f:
+            self.config = json.load(f)
+        # Vetores de outro modelo não seriam comparáveis aos do índice
+        if model_name and self.config["model_name"] != model_name:
+            raise ValueError(
+                f"Modelo ONNX em {self.model_dir} foi exportado de {self.config['model_name']}, "
+                f"mas EMBEDDING_MODEL={model_name}"
+            )
+
+        self.model_name = self.config["model_name"]
+        self.quantized = quantized
+        self.batch_size = batch_size
+        self.model_file = self.model_dir / ("model_quantized.onnx" if quantized else "model.onnx")
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.config["max_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(self.model_file), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self._lock = threading.Lock()
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        # Tokenizer com padding/truncation habilitados não é thread-safe
+        with self._lock:
+            encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self.session.run(None, feeds)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Matriz (len(texts), dim) float32, em lotes de textos de tamanho parecido."""
+        if not texts:
+            return np.zeros((0, self.config["dim"]), dtype=np.float32)
+        # Ordenar por tamanho reduz o padding de cada lote; a ordem original é restaurada no fim
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        result = np.empty((len(texts), self.config["dim"]), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            result[batch] = self._embed_batch([texts[i] for i in batch])
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
@@ -73,3 +73,14 @@ class PromptTemplates:
                 "Resposta:"
             ),
         )
+    
+    @staticmethod
+    def get_prompt_by_style(prompt_style: str = None) -> PromptTemplate:
+        """Template pelo nome do estilo (concise, detailed, bullet_points, yes_no); concise por padrão."""
+        prompt_map = {
+            "concise": PromptTemplates.get_concise_rag_prompt,
+            "detailed": PromptTemplates.get_detailed_rag_prompt,
+            "bullet_points": PromptTemplates.get_bullet_points_prompt,
+            "yes_no": PromptTemplates.get_yes_no_prompt,
+        }
+        return prompt_map.get(prompt_style, PromptTemplates.get_concise_rag_prompt)()
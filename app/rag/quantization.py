@@ -0,0 +1,67 @@
+"""Quantização dos vetores do índice local para a primeira passada da busca.
+
+- int8: quantização escalar por dimensão (escala = máximo absoluto / 127),
+  4x menor que float32; o score aproximado é o produto interno com a consulta
+  reescalada.
+- binary: um bit por dimensão (sinal), 32x menor; o score aproximado é o
+  número de bits iguais (dimensões menos a distância de Hamming).
+
+Os scores aproximados só escolhem candidatos: o LocalVectorIndex recalcula o
+cosseno exato em float32 dos melhores antes de ordenar o resultado.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Linhas por bloco ao converter códigos int8 para float32 na busca (limita a memória temporária)
+_BLOCK_ROWS = 65536
+
+# Bits ligados em cada byte (fallback para NumPy sem np.bitwise_count)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def int8_scale(matrix: np.ndarray) -> np.ndarray:
+    """Escala por dimensão calibrada nos vetores (máximo absoluto / 127)."""
+    if len(matrix) == 0:
+        return np.ones(matrix.shape[1], dtype=np.float32)
+    peak = np.abs(np.asarray(matrix, dtype=np.float32)).max(axis=0)
+    return (np.where(peak == 0, 1.0, peak) / 127).astype(np.float32)
+
+
+def encode_int8(matrix: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(np.asarray(matrix, dtype=np.float32) / scale), -127, 127).astype(np.int8)
+
+
+def encode_binary(matrix: np.ndarray) -> np.ndarray:
+    return np.packbits(np.asarray(matrix) > 0, axis=-1)
+
+
+def encode(kind: str, matrix: np.ndarray, scale: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Códigos de `matrix` (e a escala usada, no int8; calibrada se não informada)."""
+    if kind == "int8":
+        scale = int8_scale(matrix) if scale is None else scale
+        return encode_int8(matrix, scale), scale
+    if kind == "binary":
+        return encode_binary(matrix), None
+    raise ValueError(f"Quantização não suportada: {kind} (use {', '.join(QUANTIZATIONS)})")
+
+
+def approximate_scores(kind: str, codes: np.ndarray, query: np.ndarray, scale: Optional[np.ndarray] = None) -> np.ndarray:
+    """Score aproximado de cada linha de `codes` para a consulta (float32 normalizada)."""
+    if kind == "int8":
+        scaled = (query * scale).astype(np.float32)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[start:start + _BLOCK_ROWS]
+            np.matmul(block.astype(np.float32), scaled, out=scores[start:start + len(block)])
+        return scores
+    if kind == "binary":
+        differing = np.bitwise_xor(codes, encode_binary(query))
+        if hasattr(np, "bitwise_count"):
+            distance = np.bitwise_count(differing).sum(axis=1, dtype=np.int32)
+        else:
+            distance = _POPCOUNT[differing].sum(axis=1, dtype=np.int32)
+        return (codes.shape[1] * 8 - distance).astype(np.float32)
+    raise ValueError(f"Quantização não suportada: {kind} (use {', '.join(QUANTIZATIONS)})")
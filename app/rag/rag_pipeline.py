@@ -1,6 +1,341 @@
+import asyncio
+import hashlib
+from contextlib import nullcontext
 from time import perf_counter
-from app.core.config import settings, llm
-from app.rag.prompts import PromptTemplates
+from typing import Optional
+from app.core.admission import admit, current_request_options, provider_names
+from app.core.config import settings, get_llm
+from app.core.metrics import (
+    count_answer_cache, count_coalesced, count_fallbacks, count_llm_error, count_llm_usage,
+    observe_context_tokens, observe_latency, observe_stage, stage_timer,
+)
+from app.core.singleflight import SingleFlight
+from app.core.tracing import current_trace, record_span, span
+from app.rag.cache import get_answer_cache, normalize_question
+from app.rag.context import compress_context, count_tokens
+from app.rag.rerank import get_reranker
+from app.rag.sparse import get_sparse_index, reciprocal_rank_fusion
+
+
+# Resposta de identidade/manual para perguntas do tipo "quem é você"
+IDENTITY_TRIGGERS = [
+    "quem é você", "quem é vc", "quem é voce", "quem é o agente", "quem é o bot",
+    "o que você é", "o que vc é", "o que voce é", "o que você faz", "sobre você",
+    "qual seu nome", "quem é este sistema", "quem é esse sistema"
+]
+
+IDENTITY_ANSWER = (
+    "Sou um assistente de IA modular e auditável para análise normativa do Open Insurance Brasil. "
+    "Posso te ajudar a: responder dúvidas sobre normas e guias da SUSEP/OPIN, explicar requisitos técnicos "
+    "(como FAPI, DCR e certificados), recuperar trechos e referências dos documentos oficiais e resumir conteúdos."
+)
+
+
+# LLM usado pelo pipeline; None usa o cliente compartilhado de get_llm() (os benchmarks o substituem)
+llm = None
+
+
+def _llm():
+    return llm if llm is not None else get_llm()
+
+
+def _is_identity_question(question: str) -> bool:
+    ql = (question or "").strip().lower()
+    return any(trigger in ql for trigger in IDENTITY_TRIGGERS)
+
+
+def _prompt_key(prompt_style: Optional[str], prompt_template) -> str:
+    """Identifica o estilo de prompt na chave do cache de respostas."""
+    if prompt_style:
+        return prompt_style
+    if prompt_template is None:
+        return "concise"
+    return hashlib.sha1(prompt_template.template.encode("utf-8")).hexdigest()[:12]
+
+
+def _embed_query(vectorstore, question: str):
+    """Embedding da pergunta pelo modelo do vectorstore (None se indisponível)."""
+    embeddings = getattr(vectorstore, "embeddings", None)
+    if embeddings is None:
+        return None
+    with stage_timer("embedding"):
+        return embeddings.embed_query(question)
+
+
+def _embed_questions(vectorstore, questions):
+    """Embeddings de várias perguntas em uma única passada do modelo (None se indisponível)."""
+    embeddings = getattr(vectorstore, "embeddings", None)
+    if embeddings is None:
+        return [None] * len(questions)
+    with stage_timer("embedding"):
+        return embeddings.embed_documents(list(questions))
+
+
+def _candidate_count() -> int:
+    """Chunks que saem da recuperação: top_k, ou o conjunto maior que vai para o rerank."""
+    if settings.rerank_enabled:
+        return max(settings.rerank_candidates, settings.top_k)
+    return settings.top_k
+
+
+def _dense_k():
+    """Quantidade de candidatos da busca densa, maior quando haverá fusão com o BM25."""
+    limit = _candidate_count()
+    sparse = get_sparse_index()
+    if sparse is None or not len(sparse):
+        return limit, None
+    return max(settings.hybrid_candidates, limit), sparse
+
+
+def _fuse(question: str, dense_docs, sparse):
+    """Funde a busca densa com o BM25 por reciprocal rank fusion e corta nos candidatos."""
+    limit = _candidate_count()
+    if sparse is None:
+        return dense_docs[:limit]
+    with stage_timer("sparse_search"):
+        hits = sparse.search(question, max(settings.hybrid_candidates, limit))
+        sparse_docs = [sparse.document(id_) for id_, _ in hits]
+    return reciprocal_rank_fusion([dense_docs, sparse_docs], k=settings.rrf_k, limit=limit)
+
+
+def _rerank(question: str, docs):
+    """Rerank opcional com cross-encoder: mantém só os rerank_top_n melhores candidatos."""
+    reranker = get_reranker()
+    if reranker is None:
+        return docs
+    with stage_timer("rerank"):
+        return reranker.rerank(question, docs, settings.rerank_top_n)
+
+
+def _retrieve(vectorstore, question: str, vector=None):
+    """Recuperação de documentos (MMR opcional), reaproveitando o embedding da pergunta se disponível.
+
+    Com a busca híbrida ativa e o índice BM25 populado, os candidatos densos
+    são fundidos aos do BM25 antes do corte em top_k; com o rerank ativo, um
+    conjunto maior de candidatos passa pelo cross-encoder.
+    """
+    mmr = getattr(settings, "use_mmr", False)
+    lambda_mult = getattr(settings, "mmr_diversity_score", 0.3)
+    k, sparse = _dense_k()
+    fetch_k = max(20, 2 * k)
+
+    with stage_timer("vector_search"):
+        if vector is None:
+            if mmr:
+                docs = vectorstore.max_marginal_relevance_search(question, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)
+            else:
+                docs = vectorstore.similarity_search(question, k=k)
+        elif mmr:
+            docs = vectorstore.max_marginal_relevance_search_by_vector(
+                vector, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+            )
+        else:
+            docs = vectorstore.similarity_search_by_vector(vector, k=k)
+    return _rerank(question, _fuse(question, docs, sparse))
+
+
+def retrieve_documents(vectorstore, question: str):
+    """Documentos ranqueados pela recuperação (busca, fusão e rerank), antes da compressão do contexto."""
+    return _retrieve(vectorstore, question, _embed_query(vectorstore, question))
+
+
+async def _aretrieve(vectorstore, question: str, vector=None):
+    """Recuperação assíncrona: a busca usa a API async do vectorstore."""
+    if vector is None:
+        return await asyncio.to_thread(_retrieve, vectorstore, question)
+
+    k, sparse = _dense_k()
+    with stage_timer("vector_search"):
+        if getattr(settings, "use_mmr", False):
+            docs = await vectorstore.amax_marginal_relevance_search_by_vector(
+                vector,
+                k=k,
+                fetch_k=max(20, 2 * k),
+                lambda_mult=getattr(settings, "mmr_diversity_score", 0.3),
+            )
+        else:
+            docs = await vectorstore.asimilarity_search_by_vector(vector, k=k)
+    if sparse is None and not settings.rerank_enabled:
+        return docs[:_candidate_count()]
+    # BM25 e cross-encoder são CPU: fora do event loop, numa única ida à thread
+    return await asyncio.to_thread(lambda: _rerank(question, _fuse(question, docs, sparse)))
+
+
+def _assemble_context(docs, question: str):
+    """Compressão do contexto antes do LLM: (documentos enviados ao prompt, tokens do contexto)."""
+    with stage_timer("context_assembly"):
+        raw_tokens = count_tokens("\n\n---\n\n".join(d.page_content for d in docs))
+        if settings.context_compression:
+            docs, tokens = compress_context(docs, question)
+        else:
+            tokens = raw_tokens
+    observe_context_tokens(raw_tokens, tokens)
+    return docs, tokens
+
+
+def _build_prompt(docs, question: str, prompt_template=None) -> str:
+    with stage_timer("prompt_build"):
+        context_text = "\n\n---\n\n".join([d.page_content for d in docs])
+
+        # Seleciona template padrão se não fornecido
+        if prompt_template is None:
+            from app.rag.prompts import PromptTemplates
+            prompt_template = PromptTemplates.get_concise_rag_prompt()
+        return prompt_template.format(context=context_text, question=question)
+
+
+def _build_metadata(
+    start: float, docs, return_contexts: bool, cache_status: Optional[str] = None,
+    context_tokens: Optional[int] = None, llm_provider: Optional[str] = None,
+) -> dict:
+    metadata = {"latency": round(perf_counter() - start, 3)}
+    if cache_status is not None:
+        metadata["cache"] = cache_status
+    if context_tokens is not None:
+        metadata["context_tokens"] = context_tokens
+    if llm_provider is not None:
+        metadata["llm_provider"] = llm_provider
+    if return_contexts:
+        metadata["contexts"] = docs
+    return metadata
+
+
+def _chunk_text(chunk) -> str:
+    """Extrai o texto de um chunk de streaming do LLM (AIMessageChunk ou str)."""
+    if isinstance(chunk, str):
+        return chunk
+    return getattr(chunk, "content", "") or ""
+
+
+def _identity_metadata(start: float, return_contexts: bool) -> dict:
+    latency = round(perf_counter() - start, 3)
+    return {"latency": latency, "contexts": [] if return_contexts else None}
+
+
+# Execuções em andamento de answer_question/aanswer_question, por pergunta normalizada
+_inflight = SingleFlight()
+
+
+def _should_coalesce() -> bool:
+    """Com trace ativo (include_timings/profile) a execução precisa ser da própria requisição."""
+    return settings.coalesce_requests and current_trace() is None
+
+
+def _coalesce_key(vectorstore, question: str, return_contexts: bool, prompt_template, prompt_style) -> tuple:
+    # A execução compartilhada roda no contexto de quem a iniciou: prioridade e
+    # prazo da admissão entram na chave para não valerem para as demais
+    return (
+        id(vectorstore), normalize_question(question), _prompt_key(prompt_style, prompt_template),
+        bool(return_contexts), current_request_options(),
+    )
+
+
+def _coalesced_result(start: float, result, shared: bool):
+    """Resultado para cada requisição; as que aproveitaram outra execução têm latência própria e `coalesced`."""
+    answer, metadata = result
+    if not shared:
+        return answer, metadata
+    count_coalesced()
+    observe_latency(perf_counter() - start)
+    count_fallbacks(answer)
+    return answer, {**metadata, "latency": round(perf_counter() - start, 3), "coalesced": True}
+
+
+def _record_answer(start: float, answer: str, cache_status: Optional[str] = None):
+    """Registra nas métricas a latência total, o resultado do cache e eventuais fallbacks."""
+    observe_latency(perf_counter() - start)
+    count_answer_cache(cache_status)
+    count_fallbacks(answer)
+
+
+def _served_by(obj, provider: str) -> str:
+    """Provider marcado pelo LLMRouter (na resposta ou no erro) ou o configurado."""
+    metadata = getattr(obj, "response_metadata", None) or {}
+    return metadata.get("llm_provider") or getattr(obj, "llm_provider", None) or provider
+
+
+def _configured_provider() -> str:
+    """Provider preferido da configuração ("provider:modelo"), quando a resposta não vem marcada."""
+    return provider_names()[0]
+
+
+def _invoke_llm(prompt: str):
+    """Chama o LLM e retorna (resposta, provider que respondeu)."""
+    provider = _configured_provider()
+    try:
+        with stage_timer("llm_total"):
+            resp = _llm().invoke(prompt)
+    except Exception as e:
+        count_llm_error(e, _served_by(e, provider))
+        raise
+    provider = _served_by(resp, provider)
+    count_llm_usage(resp, provider)
+    return (getattr(resp, "content", "") or "").strip(), provider
+
+
+async def _ainvoke_llm(prompt: str):
+    provider = _configured_provider()
+    try:
+        with stage_timer("llm_total"):
+            resp = await _llm().ainvoke(prompt)
+    except Exception as e:
+        count_llm_error(e, _served_by(e, provider))
+        raise
+    provider = _served_by(resp, provider)
+    count_llm_usage(resp, provider)
+    return (getattr(resp, "content", "") or "").strip(), provider
+
+
+def _stream_llm(prompt: str):
+    """Gera (fragmento, provider) do LLM, registrando TTFT, tempo total, tokens e erros."""
+    provider = _configured_provider()
+    start = perf_counter()
+    first = True
+    try:
+        for chunk in _llm().stream(prompt):
+            served = _served_by(chunk, provider)
+            count_llm_usage(chunk, served)
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            if first:
+                now = perf_counter()
+                observe_stage("llm_ttft", now - start)
+                record_span("llm_ttft", start, now)
+                first = False
+            yield text, served
+    except Exception as e:
+        count_llm_error(e, _served_by(e, provider))
+        raise
+    end = perf_counter()
+    observe_stage("llm_total", end - start)
+    record_span("llm_total", start, end)
+
+
+async def _astream_llm(prompt: str):
+    """Versão assíncrona de _stream_llm (usa `llm.astream`)."""
+    provider = _configured_provider()
+    start = perf_counter()
+    first = True
+    try:
+        async for chunk in _llm().astream(prompt):
+            served = _served_by(chunk, provider)
+            count_llm_usage(chunk, served)
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            if first:
+                now = perf_counter()
+                observe_stage("llm_ttft", now - start)
+                record_span("llm_ttft", start, now)
+                first = False
+            yield text, served
+    except Exception as e:
+        count_llm_error(e, _served_by(e, provider))
+        raise
+    end = perf_counter()
+    observe_stage("llm_total", end - start)
+    record_span("llm_total", start, end)
 
 
 def answer_question(
@@ -8,57 +343,348 @@ def answer_question(
     question: str,
     return_contexts: bool = False,
     prompt_template=None,
+    prompt_style: Optional[str] = None,
 ):
     """Executa o fluxo RAG e retorna a resposta e metadados.
 
     Parâmetros:
     - vectorstore: VectorStore para recuperação
     - question: pergunta do usuário
-    - return_contexts: se True, devolve a lista de Document recuperados
+    - return_contexts: se True, devolve a lista de Document enviados ao LLM (após a compressão do contexto)
     - prompt_template: langchain PromptTemplate opcional; usa template conciso por padrão
+    - prompt_style: nome do estilo de prompt, usado na chave do cache de respostas
+
+    Chamadas simultâneas com a mesma pergunta normalizada, estilo de prompt e
+    return_contexts compartilham uma única execução (settings.coalesce_requests),
+    desde que tenham a mesma prioridade e prazo de admissão e nenhum trace ativo.
     """
+    if not _should_coalesce():
+        return _answer_question(vectorstore, question, return_contexts, prompt_template, prompt_style)
     start = perf_counter()
+    key = _coalesce_key(vectorstore, question, return_contexts, prompt_template, prompt_style)
+    result, shared = _inflight.do(
+        key, lambda: _answer_question(vectorstore, question, return_contexts, prompt_template, prompt_style)
+    )
+    return _coalesced_result(start, result, shared)
 
-    # Resposta de identidade/manual para perguntas do tipo "quem é você"
-    ql = (question or "").strip().lower()
-    identity_triggers = [
-        "quem é você", "quem é vc", "quem é voce", "quem é o agente", "quem é o bot",
-        "o que você é", "o que vc é", "o que voce é", "o que você faz", "sobre você",
-        "qual seu nome", "quem é este sistema", "quem é esse sistema"
-    ]
-    if any(trigger in ql for trigger in identity_triggers):
-        intro = (
-            "Sou um assistente de IA modular e auditável para análise normativa do Open Insurance Brasil. "
-            "Posso te ajudar a: responder dúvidas sobre normas e guias da SUSEP/OPIN, explicar requisitos técnicos "
-            "(como FAPI, DCR e certificados), recuperar trechos e referências dos documentos oficiais e resumir conteúdos."
-        )
-        latency = round(perf_counter() - start, 3)
-        metadata = {"latency": latency, "contexts": [] if return_contexts else None}
-        return intro, metadata
-
-    # Recuperação de documentos (MMR opcional)
-    if getattr(settings, "use_mmr", False):
-        docs = vectorstore.max_marginal_relevance_search(
-            question,
-            k=settings.top_k,
-            lambda_mult=getattr(settings, "mmr_diversity_score", 0.3),
-        )
-    else:
-        docs = vectorstore.similarity_search(question, k=settings.top_k)
-
-    context_text = "\n\n---\n\n".join([d.page_content for d in docs])
-
-    # Seleciona template padrão se não fornecido
-    prompt_template = prompt_template or PromptTemplates.get_concise_rag_prompt()
-    final_prompt = prompt_template.format(context=context_text, question=question)
-
-    resp = llm.invoke(final_prompt)
-    answer = (getattr(resp, "content", "") or "").strip()
 
-    latency = round(perf_counter() - start, 3)
+def _answer_question(vectorstore, question, return_contexts, prompt_template, prompt_style):
+    start = perf_counter()
 
-    metadata = {"latency": latency}
-    if return_contexts:
-        metadata["contexts"] = docs
+    if _is_identity_question(question):
+        _record_answer(start, IDENTITY_ANSWER)
+        return IDENTITY_ANSWER, _identity_metadata(start, return_contexts)
+
+    cache = get_answer_cache()
+    key = _prompt_key(prompt_style, prompt_template)
+    if cache is not None:
+        with span("answer_cache.exact"):
+            hit = cache.get_exact(question, key)
+        if hit is not None:
+            _record_answer(start, hit[0], "exact")
+            return hit[0], _build_metadata(start, hit[1], return_contexts, "exact")
+
+    vector = _embed_query(vectorstore, question)
+    if cache is not None:
+        with span("answer_cache.semantic"):
+            hit = cache.get_similar(vector, key)
+        if hit is not None:
+            _record_answer(start, hit[0], "semantic")
+            return hit[0], _build_metadata(start, hit[1], return_contexts, "semantic")
+
+    docs, context_tokens = _assemble_context(_retrieve(vectorstore, question, vector), question)
+    final_prompt = _build_prompt(docs, question, prompt_template)
+
+    answer, served = _invoke_llm(final_prompt)
+
+    if cache is not None:
+        cache.set(question, key, answer, docs, vector)
+
+    cache_status = "miss" if cache is not None else None
+    _record_answer(start, answer, cache_status)
+    return answer, _build_metadata(start, docs, return_contexts, cache_status, context_tokens, served)
+
+
+async def _acache_lookup(cache, vectorstore, question: str, key: str):
+    """Consulta o cache (exato e semântico) sem bloquear o event loop.
+
+    Retorna (hit, status, vector); o embedding calculado é reaproveitado na recuperação.
+    """
+    if cache is not None:
+        with span("answer_cache.exact"):
+            hit = await asyncio.to_thread(cache.get_exact, question, key)
+        if hit is not None:
+            return hit, "exact", None
+
+    vector = await asyncio.to_thread(_embed_query, vectorstore, question)
+    if cache is not None:
+        with span("answer_cache.semantic"):
+            hit = await asyncio.to_thread(cache.get_similar, vector, key)
+        if hit is not None:
+            return hit, "semantic", vector
+    return None, ("miss" if cache is not None else None), vector
+
+
+async def aanswer_question(
+    vectorstore,
+    question: str,
+    return_contexts: bool = False,
+    prompt_template=None,
+    prompt_style: Optional[str] = None,
+):
+    """Versão assíncrona de answer_question.
+
+    Não bloqueia o event loop: o embedding da pergunta é executado em thread,
+    a busca vetorial usa a API async do vectorstore e o LLM é chamado via `ainvoke`.
+    Mesmos parâmetros e retorno de answer_question, inclusive o compartilhamento
+    de execuções idênticas em andamento.
+    """
+    if not _should_coalesce():
+        return await _aanswer_question(vectorstore, question, return_contexts, prompt_template, prompt_style)
+    start = perf_counter()
+    key = _coalesce_key(vectorstore, question, return_contexts, prompt_template, prompt_style)
+    result, shared = await _inflight.ado(
+        key, lambda: _aanswer_question(vectorstore, question, return_contexts, prompt_template, prompt_style)
+    )
+    return _coalesced_result(start, result, shared)
+
+
+async def _aanswer_question(vectorstore, question, return_contexts, prompt_template, prompt_style):
+    start = perf_counter()
+
+    if _is_identity_question(question):
+        _record_answer(start, IDENTITY_ANSWER)
+        return IDENTITY_ANSWER, _identity_metadata(start, return_contexts)
+
+    cache = get_answer_cache()
+    key = _prompt_key(prompt_style, prompt_template)
+    hit, cache_status, vector = await _acache_lookup(cache, vectorstore, question, key)
+    if hit is not None:
+        _record_answer(start, hit[0], cache_status)
+        return hit[0], _build_metadata(start, hit[1], return_contexts, cache_status)
+
+    return await _agenerate(
+        vectorstore, question, vector, start, cache, key, cache_status, return_contexts, prompt_template
+    )
+
+
+async def _agenerate(
+    vectorstore, question: str, vector, start: float, cache, key: str, cache_status,
+    return_contexts: bool, prompt_template=None, llm_semaphore: Optional[asyncio.Semaphore] = None,
+):
+    """Recuperação, compressão do contexto e LLM para uma pergunta fora do cache.
+
+    Passa antes pela admissão (fila com prazo e cotas do provider): sob
+    sobrecarga, levanta `Overloaded` sem chegar a consultar o índice. No lote,
+    o semáforo local vem antes da admissão: só as perguntas que já têm a vez
+    ocupam vaga e cota, sem disputar com o tráfego interativo enquanto esperam.
+    """
+    async with llm_semaphore or nullcontext(), admit():
+        docs = await _aretrieve(vectorstore, question, vector)
+        docs, context_tokens = await asyncio.to_thread(_assemble_context, docs, question)
+        final_prompt = _build_prompt(docs, question, prompt_template)
+        answer, served = await _ainvoke_llm(final_prompt)
+
+    if cache is not None:
+        await asyncio.to_thread(cache.set, question, key, answer, docs, vector)
+
+    _record_answer(start, answer, cache_status)
+    return answer, _build_metadata(start, docs, return_contexts, cache_status, context_tokens, served)
+
+
+async def aanswer_batch(
+    vectorstore,
+    questions,
+    return_contexts: bool = False,
+    prompt_template=None,
+    prompt_style: Optional[str] = None,
+    llm_concurrency: Optional[int] = None,
+):
+    """Responde uma lista de perguntas, gerando (índice, resposta, metadata, erro) à medida que terminam.
+
+    As perguntas fora do cache exato são embedadas juntas, em uma única passada
+    do modelo; as buscas vetoriais rodam concorrentemente e as chamadas ao LLM
+    ficam limitadas a `llm_concurrency` (padrão settings.batch_llm_concurrency).
+    Uma pergunta com erro não interrompe as demais: chega com `erro` preenchido.
+    """
+    start = perf_counter()
+    cache = get_answer_cache()
+    key = _prompt_key(prompt_style, prompt_template)
+    llm_semaphore = asyncio.Semaphore(llm_concurrency or settings.batch_llm_concurrency)
+
+    async def exact(i, question):
+        if _is_identity_question(question):
+            _record_answer(start, IDENTITY_ANSWER)
+            return i, IDENTITY_ANSWER, _identity_metadata(start, return_contexts), None
+        if cache is not None:
+            with span("answer_cache.exact"):
+                hit = await asyncio.to_thread(cache.get_exact, question, key)
+            if hit is not None:
+                _record_answer(start, hit[0], "exact")
+                return i, hit[0], _build_metadata(start, hit[1], return_contexts, "exact"), None
+        return None
+
+    async def answer(i, question, vector):
+        try:
+            if cache is not None:
+                with span("answer_cache.semantic"):
+                    hit = await asyncio.to_thread(cache.get_similar, vector, key)
+                if hit is not None:
+                    _record_answer(start, hit[0], "semantic")
+                    return i, hit[0], _build_metadata(start, hit[1], return_contexts, "semantic"), None
+            result, metadata = await _agenerate(
+                vectorstore, question, vector, start, cache, key, "miss" if cache is not None else None,
+                return_contexts, prompt_template, llm_semaphore,
+            )
+            return i, result, metadata, None
+        except Exception as e:
+            return i, None, None, e
+
+    pending = []
+    hits = await asyncio.gather(*(exact(i, q) for i, q in enumerate(questions)))
+    for (i, question), result in zip(enumerate(questions), hits):
+        if result is not None:
+            yield result
+        else:
+            pending.append((i, question))
+    if not pending:
+        return
+
+    try:
+        vectors = await asyncio.to_thread(_embed_questions, vectorstore, [q for _, q in pending])
+    except Exception as e:
+        for i, _ in pending:
+            yield i, None, None, e
+        return
+
+    tasks = [asyncio.create_task(answer(i, q, v)) for (i, q), v in zip(pending, vectors)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def stream_answer_question(
+    vectorstore,
+    question: str,
+    return_contexts: bool = False,
+    prompt_template=None,
+    prompt_style: Optional[str] = None,
+):
+    """Modo streaming de answer_question.
+
+    Gera tuplas (evento, dados) na ordem:
+    - ("sources", docs): documentos recuperados, antes de chamar o LLM
+    - ("token", texto): cada fragmento da resposta assim que chega do LLM
+    - ("done", metadata): metadados finais, com `latency`, `ttft` (tempo até o primeiro token)
+      e `llm_provider` ("provider:modelo" que gerou a resposta)
+
+    Respostas vindas do cache são emitidas como um único token.
+    """
+    start = perf_counter()
+
+    if _is_identity_question(question):
+        yield "sources", []
+        yield "token", IDENTITY_ANSWER
+        _record_answer(start, IDENTITY_ANSWER)
+        metadata = _identity_metadata(start, return_contexts)
+        metadata["ttft"] = metadata["latency"]
+        yield "done", metadata
+        return
+
+    cache = get_answer_cache()
+    key = _prompt_key(prompt_style, prompt_template)
+    hit, cache_status, vector = None, None, None
+    if cache is not None:
+        with span("answer_cache.exact"):
+            hit, cache_status = cache.get_exact(question, key), "exact"
+    if hit is None:
+        vector = _embed_query(vectorstore, question)
+        if cache is not None:
+            with span("answer_cache.semantic"):
+                hit, cache_status = cache.get_similar(vector, key), "semantic"
+    if hit is not None:
+        yield "sources", hit[1]
+        yield "token", hit[0]
+        _record_answer(start, hit[0], cache_status)
+        metadata = _build_metadata(start, hit[1], return_contexts, cache_status)
+        metadata["ttft"] = metadata["latency"]
+        yield "done", metadata
+        return
+    cache_status = "miss" if cache is not None else None
+
+    docs, context_tokens = _assemble_context(_retrieve(vectorstore, question, vector), question)
+    yield "sources", docs
+
+    ttft = None
+    served = None
+    parts = []
+    for text, served in _stream_llm(_build_prompt(docs, question, prompt_template)):
+        if ttft is None:
+            ttft = round(perf_counter() - start, 3)
+        parts.append(text)
+        yield "token", text
+
+    if cache is not None:
+        cache.set(question, key, "".join(parts).strip(), docs, vector)
+
+    _record_answer(start, "".join(parts), cache_status)
+    metadata = _build_metadata(start, docs, return_contexts, cache_status, context_tokens, served)
+    metadata["ttft"] = ttft
+    yield "done", metadata
+
+
+async def astream_answer_question(
+    vectorstore,
+    question: str,
+    return_contexts: bool = False,
+    prompt_template=None,
+    prompt_style: Optional[str] = None,
+):
+    """Versão assíncrona de stream_answer_question (usa `llm.astream`)."""
+    start = perf_counter()
+
+    if _is_identity_question(question):
+        yield "sources", []
+        yield "token", IDENTITY_ANSWER
+        _record_answer(start, IDENTITY_ANSWER)
+        metadata = _identity_metadata(start, return_contexts)
+        metadata["ttft"] = metadata["latency"]
+        yield "done", metadata
+        return
+
+    cache = get_answer_cache()
+    key = _prompt_key(prompt_style, prompt_template)
+    hit, cache_status, vector = await _acache_lookup(cache, vectorstore, question, key)
+    if hit is not None:
+        yield "sources", hit[1]
+        yield "token", hit[0]
+        _record_answer(start, hit[0], cache_status)
+        metadata = _build_metadata(start, hit[1], return_contexts, cache_status)
+        metadata["ttft"] = metadata["latency"]
+        yield "done", metadata
+        return
+
+    ttft = None
+    served = None
+    parts = []
+    async with admit():
+        docs = await _aretrieve(vectorstore, question, vector)
+        docs, context_tokens = await asyncio.to_thread(_assemble_context, docs, question)
+        yield "sources", docs
+
+        async for text, served in _astream_llm(_build_prompt(docs, question, prompt_template)):
+            if ttft is None:
+                ttft = round(perf_counter() - start, 3)
+            parts.append(text)
+            yield "token", text
+
+    if cache is not None:
+        await asyncio.to_thread(cache.set, question, key, "".join(parts).strip(), docs, vector)
 
-    return answer, metadata
+    _record_answer(start, "".join(parts), cache_status)
+    metadata = _build_metadata(start, docs, return_contexts, cache_status, context_tokens, served)
+    metadata["ttft"] = ttft
+    yield "done", metadata
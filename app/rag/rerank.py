@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from time import perf_counter
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import RERANK_CACHE
+
+
+class CrossEncoderReranker:
+    """Reordena candidatos da recuperação com um cross-encoder pequeno (CPU).
+
+    Os pares (pergunta, chunk) são pontuados em lotes de `batch_size`, na ordem
+    da recuperação, até estourar `budget_ms`; candidatos não pontuados a tempo
+    ficam depois dos pontuados, na ordem original. Os scores ficam num cache LRU
+    chaveado por modelo + pergunta normalizada + chunk, então perguntas
+    repetidas (ou parecidas com os mesmos candidatos) não passam pelo modelo.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 16,
+        max_length: int = 256,
+        budget_ms: float = 0,
+        cache_size: int = 10000,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._scores: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as e:
+                    raise ImportError(
+                        "Rerank requer o pacote sentence-transformers (pip install sentence-transformers)"
+                    ) from e
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+            return self._model
+
+    def _key(self, query: str, doc) -> bytes:
+        chunk = doc.metadata.get("chunk_id") or doc.page_content
+        raw = f"{self.model_name}\0{' '.join(query.lower().split())}\0{chunk}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+
+    def _cached(self, key: bytes) -> Optional[float]:
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def _store(self, key: bytes, score: float):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    def score(self, query: str, docs) -> List[Optional[float]]:
+        """Score de cada documento (None para os que não couberam no orçamento de latência)."""
+        keys = [self._key(query, d) for d in docs]
+        scores = [self._cached(k) for k in keys]
+        pending = [i for i, s in enumerate(scores) if s is None]
+        RERANK_CACHE.labels("hit").inc(len(docs) - len(pending))
+        if not pending:
+            return scores
+
+        model = self.model  # carga do modelo fora do orçamento
+        start = perf_counter()
+        for offset in range(0, len(pending), self.batch_size):
+            if self.budget_ms and (perf_counter() - start) * 1000 >= self.budget_ms:
+                break
+            batch = pending[offset:offset + self.batch_size]
+            predicted = model.predict(
+                [(query, docs[i].page_content) for i in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            for i, value in zip(batch, predicted):
+                scores[i] = float(value)
+                self._store(keys[i], scores[i])
+            RERANK_CACHE.labels("miss").inc(len(batch))
+        return scores
+
+    def rerank(self, query: str, docs, top_n: int):
+        """Os `top_n` melhores documentos segundo o cross-encoder."""
+        scores = self.score(query, docs)
+        scored = sorted(
+            (i for i, s in enumerate(scores) if s is not None), key=lambda i: scores[i], reverse=True
+        )
+        unscored = [i for i, s in enumerate(scores) if s is None]
+        return [docs[i] for i in (scored + unscored)[:top_n]]
+
+
+# Reranker do processo (modelo carregado no primeiro uso)
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Reranker compartilhado, ou None se o rerank estiver desabilitado."""
+    global _reranker
+    if not settings.rerank_enabled:
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker(
+                settings.rerank_model,
+                batch_size=settings.rerank_batch_size,
+                max_length=settings.rerank_max_length,
+                budget_ms=settings.rerank_budget_ms,
+                cache_size=settings.rerank_cache_size,
+            )
+        return _reranker
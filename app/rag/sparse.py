@@ -0,0 +1,202 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Palavras muito frequentes em português que não ajudam a distinguir chunks
+STOPWORDS = frozenset(
+    "a ao aos as com como da das de do dos e em entre na nas no nos o os ou para pela pelas pelo pelos "
+    "por qual quais que se sem sobre sua suas seu seus um uma umas uns e o a the of and to in is for".split()
+)
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Termos normalizados (minúsculas, sem acentos), preservando siglas e números como "rdd" e "635"."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in _TOKEN.findall(text) if t not in STOPWORDS]
+
+
+def document_key(doc) -> str:
+    """Identidade de um chunk para a fusão: ID determinístico da ingestão, ID do vetor ou o texto."""
+    return doc.metadata.get("chunk_id") or getattr(doc, "id", None) or doc.page_content
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List], k: int = 60, limit: Optional[int] = None) -> List:
+    """Funde listas ordenadas de Document por RRF: score = Σ 1 / (k + posição)."""
+    scores: Dict[str, float] = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ordered[:limit]]
+
+
+class BM25Index:
+    """Índice invertido BM25 sobre os chunks, persistido em JSON.
+
+    Guarda, por chunk, o texto, os metadados e a contagem de termos; as listas
+    invertidas são montadas em memória ao carregar. Como o LocalVectorIndex,
+    recarrega sozinho quando outro processo (ex.: scripts.ingest_local) grava
+    uma versão nova.
+    """
+
+    def __init__(self, path, k1: float = 1.5, b: float = 0.75, auto_reload: bool = True):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.auto_reload = auto_reload
+        self._lock = threading.RLock()
+        self._docs: Dict[str, dict] = {}  # id -> {"text", "metadata", "tf": {termo: n}, "len"}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_len = 0
+        self._loaded_mtime = None
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        with self._lock:
+            self._maybe_reload()
+            return len(self._docs)
+
+    def __contains__(self, id_: str):
+        with self._lock:
+            self._maybe_reload()
+            return id_ in self._docs
+
+    def load(self):
+        with self._lock:
+            if not self.path.exists():
+                return
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self._docs = {}
+            self._postings = {}
+            self._total_len = 0
+            for id_, doc in data.get("docs", {}).items():
+                self._index(id_, doc)
+            self._dirty = False
+            self._loaded_mtime = self.path.stat().st_mtime
+
+    def _maybe_reload(self):
+        if not self.auto_reload or self._dirty or not self.path.exists():
+            return
+        if self.path.stat().st_mtime != self._loaded_mtime:
+            self.load()
+
+    def _index(self, id_: str, doc: dict):
+        self._docs[id_] = doc
+        self._total_len += doc["len"]
+        for term, count in doc["tf"].items():
+            self._postings.setdefault(term, {})[id_] = count
+
+    def _unindex(self, id_: str):
+        doc = self._docs.pop(id_, None)
+        if doc is None:
+            return
+        self._total_len -= doc["len"]
+        for term in doc["tf"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(id_, None)
+                if not postings:
+                    del self._postings[term]
+
+    def add(self, ids: List[str], texts: List[str], metadatas: Optional[List[dict]] = None):
+        """Insere ou substitui chunks."""
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            for id_, text, metadata in zip(ids, texts, metadatas):
+                terms = tokenize(text)
+                self._unindex(id_)
+                self._index(id_, {"text": text, "metadata": metadata, "tf": dict(Counter(terms)), "len": len(terms)})
+            self._dirty = True
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            for id_ in ids:
+                if id_ in self._docs:
+                    self._unindex(id_)
+                    self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._docs = {}
+            self._postings = {}
+            self._total_len = 0
+            self._dirty = True
+
+    def missing(self, ids: Iterable[str]) -> List[str]:
+        with self._lock:
+            self._maybe_reload()
+            return [id_ for id_ in ids if id_ not in self._docs]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k chunks por BM25: [(id, score)] em ordem decrescente."""
+        with self._lock:
+            self._maybe_reload()
+            n = len(self._docs)
+            if n == 0:
+                return []
+            avg_len = self._total_len / n or 1.0
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for id_, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._docs[id_]["len"] / avg_len)
+                    scores[id_] = scores.get(id_, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def document(self, id_: str):
+        from langchain_core.documents import Document
+
+        with self._lock:
+            doc = self._docs[id_]
+            return Document(page_content=doc["text"], metadata=dict(doc["metadata"]), id=id_)
+
+    def similarity_search(self, query: str, k: int = 4):
+        return [self.document(id_) for id_, _ in self.search(query, k)]
+
+    def persist(self):
+        """Gravação atômica do índice (só se houve mudanças)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "docs": self._docs}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._loaded_mtime = self.path.stat().st_mtime
+
+
+# Índice esparso do processo (carregado no primeiro uso)
+_sparse_index = None
+_sparse_index_lock = threading.Lock()
+
+
+def get_sparse_index() -> Optional[BM25Index]:
+    """Índice BM25 compartilhado, ou None se a busca híbrida estiver desabilitada."""
+    global _sparse_index
+    if not settings.hybrid_search:
+        return None
+    with _sparse_index_lock:
+        if _sparse_index is None:
+            _sparse_index = BM25Index(settings.sparse_index_path)
+        return _sparse_index
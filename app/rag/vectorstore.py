@@ -1,11 +1,26 @@
 import os
+import queue
+import threading
+import time
+from time import perf_counter
 from app.core.config import settings
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
+from app.core.metrics import INGEST_BATCH_LATENCY, INGEST_CHUNKS
+from app.core.tracing import span
 
-def _ensure_index(pc: Pinecone):
+# Recursos compartilhados por processo: carregados uma única vez e reutilizados
+# por todas as requisições (modelo de embeddings, cliente Pinecone e seus pools HTTP).
+# Os SDKs (sentence-transformers, Pinecone) só são importados no primeiro uso.
+_lock = threading.RLock()
+_embeddings = None
+_pinecone_client = None
+_index = None
+_vectorstore = None
+
+
+def _ensure_index(pc):
     """Cria o índice Pinecone se ele ainda não existir."""
+    from pinecone import ServerlessSpec
+
     names = [i["name"] for i in pc.list_indexes()]
     if settings.pinecone_index_name not in names:
         print(f"Criando índice '{settings.pinecone_index_name}' no Pinecone...")
@@ -18,32 +33,295 @@ def _ensure_index(pc: Pinecone):
     else:
         print(f"ℹÍndice '{settings.pinecone_index_name}' já existe.")
 
-def build_or_load_vectorstore(chunks=None):
-    """Cria ou carrega o vetorstore do Pinecone."""
-    print("Conectando ao Pinecone...")
 
-    os.environ["PINECONE_API_KEY"] = settings.pinecone_api_key
-    os.environ["PINECONE_ENVIRONMENT"] = settings.pinecone_environment
+def _backend_tag() -> str:
+    return "onnx-int8" if settings.embedding_onnx_quantized else "onnx"
 
-    pc = Pinecone(api_key=settings.pinecone_api_key)
-    _ensure_index(pc)
 
-    print("Carregando modelo de embeddings...")
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+def _load_embeddings(model_name: str):
+    if settings.embedding_backend == "onnx":
+        from app.rag.onnx_embeddings import OnnxEmbeddings
 
-    if chunks:
-        print("Inserindo chunks no índice Pinecone...")
-        vs = PineconeVectorStore.from_documents(
-            chunks,
-            embedding=embeddings,
-            index_name=settings.pinecone_index_name
+        return OnnxEmbeddings(
+            settings.embedding_onnx_path,
+            model_name=model_name,
+            quantized=settings.embedding_onnx_quantized,
+            batch_size=settings.embedding_onnx_batch_size,
+            threads=settings.embedding_onnx_threads,
         )
+    if settings.embedding_backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=model_name)
+    raise ValueError(f"Backend de embeddings não suportado: {settings.embedding_backend}")
+
+
+def get_embeddings():
+    """Modelo de embeddings do processo (carregado no primeiro uso)."""
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            print("Carregando modelo de embeddings...")
+            from app.rag.embeddings import CachedEmbeddings
+
+            model_name = settings.embedding_model
+            with span("load_embeddings", model=model_name, backend=settings.embedding_backend):
+                embeddings = _load_embeddings(model_name)
+            if settings.embedding_cache_size > 0:
+                # Backends diferem em ~1e-3 de cosseno: cada um tem suas próprias entradas no cache
+                cache_model = model_name if settings.embedding_backend == "torch" else f"{model_name}@{_backend_tag()}"
+                embeddings = CachedEmbeddings(
+                    embeddings,
+                    model_name=cache_model,
+                    max_size=settings.embedding_cache_size,
+                    cache_path=settings.embedding_cache_path,
+                )
+            _embeddings = embeddings
+        return _embeddings
+
+
+def get_pinecone_client():
+    """Cliente Pinecone do processo; mantém o pool de conexões HTTP entre chamadas."""
+    global _pinecone_client
+    with _lock:
+        if _pinecone_client is None:
+            if not settings.pinecone_api_key:
+                raise ValueError("PINECONE_API_KEY não configurada (necessária com VECTOR_BACKEND=pinecone)")
+            from pinecone import Pinecone
+
+            print("Conectando ao Pinecone...")
+            os.environ["PINECONE_API_KEY"] = settings.pinecone_api_key
+            os.environ["PINECONE_ENVIRONMENT"] = settings.pinecone_environment
+            _pinecone_client = Pinecone(
+                api_key=settings.pinecone_api_key,
+                pool_threads=settings.pinecone_pool_threads,
+            )
+        return _pinecone_client
+
+
+def get_index():
+    """Handle do índice configurado (verifica/cria o índice apenas uma vez).
+
+    Com `vector_backend="local"` retorna o LocalVectorIndex persistido em `local_index_path`.
+    """
+    global _index
+    with _lock:
+        if _index is None:
+            with span("open_index", backend=settings.vector_backend):
+                if settings.vector_backend == "local":
+                    from app.rag.local_index import LocalVectorIndex
+                    _index = LocalVectorIndex(
+                        settings.local_index_path,
+                        dim=384,
+                        quantization=settings.local_index_quantization,
+                        rescore_factor=settings.local_index_rescore_factor,
+                    )
+                elif settings.vector_backend == "pinecone":
+                    pc = get_pinecone_client()
+                    _ensure_index(pc)
+                    _index = pc.Index(settings.pinecone_index_name, pool_threads=settings.pinecone_pool_threads)
+                else:
+                    raise ValueError(f"Backend vetorial não suportado: {settings.vector_backend}")
+        return _index
+
+
+def get_vectorstore():
+    """Vectorstore compartilhado, montado sobre o modelo e o índice já carregados."""
+    global _vectorstore
+    with _lock:
+        if _vectorstore is None:
+            if settings.vector_backend == "local":
+                from app.rag.local_index import LocalVectorStore
+                _vectorstore = LocalVectorStore(get_index(), get_embeddings(), text_key="text")
+            else:
+                from langchain_pinecone import PineconeVectorStore
+
+                _vectorstore = PineconeVectorStore(
+                    index=get_index(),
+                    embedding=get_embeddings(),
+                    text_key="text",
+                )
+        return _vectorstore
+
+
+def index_vector_count() -> int:
+    """Total de vetores no índice configurado (local ou Pinecone)."""
+    index = get_index()
+    if settings.vector_backend == "local":
+        return len(index)
+    return int(index.describe_index_stats().total_vector_count)
+
+
+def purge_index():
+    """Apaga todos os vetores do índice configurado (usado por `ingest_local --rebuild`)."""
+    index = get_index()
+    index.delete(delete_all=True)
+    persist = getattr(index, "persist", None)  # backend local grava o índice em disco
+    if persist is not None:
+        persist()
+
+
+def build_or_load_vectorstore(chunks=None):
+    """Cria ou carrega o vetorstore (Pinecone ou índice local, conforme `vector_backend`).
+
+    Reutiliza os recursos do processo; se `chunks` for informado, adiciona-os ao índice.
+    """
+    vs = get_vectorstore()
+
+    if chunks:
+        print("Inserindo chunks no índice vetorial...")
+        vs.add_documents(chunks)
     else:
-        print("Carregando índice existente do Pinecone...")
-        vs = PineconeVectorStore.from_existing_index(
-            embedding=embeddings,
-            index_name=settings.pinecone_index_name
-        )
+        print("Carregando índice vetorial existente...")
 
     print("Vetorstore pronto.")
     return vs
+
+
+class UpsertPipeline:
+    """Estágio de ingestão: embedding em lotes sobreposto ao upsert no índice.
+
+    O embedding (CPU) roda na thread chamadora em lotes de `embed_batch_size`;
+    os vetores seguem em lotes de `upsert_batch_size` por uma fila limitada para
+    `upsert_concurrency` threads de upsert (rede). Com a fila cheia, o embedding
+    espera (backpressure). Cada lote com falha é repetido até `max_retries` vezes
+    sem refazer os lotes já concluídos; os IDs que falharem definitivamente ficam
+    em `failed_ids`.
+
+    Expõe `add_documents(docs, ids=...)` e `delete(ids=...)`, como um vectorstore.
+    """
+
+    def __init__(
+        self,
+        index=None,
+        embeddings=None,
+        embed_batch_size: int = None,
+        upsert_batch_size: int = None,
+        upsert_concurrency: int = None,
+        queue_size: int = None,
+        max_retries: int = None,
+        text_key: str = "text",
+    ):
+        self.index = index if index is not None else get_index()
+        self.embeddings = embeddings if embeddings is not None else get_embeddings()
+        self.embed_batch_size = embed_batch_size or settings.embed_batch_size
+        self.upsert_batch_size = upsert_batch_size or settings.upsert_batch_size
+        self.max_retries = settings.upsert_max_retries if max_retries is None else max_retries
+        self.text_key = text_key
+
+        self.chunks_embedded = 0
+        self.vectors_upserted = 0
+        self.vectors_deleted = 0
+        self.retries = 0
+        self.failed_ids = set()
+        self.embed_seconds = 0.0
+        self._started = perf_counter()
+        self._elapsed = None
+        self._buffer = []
+        self._stats_lock = threading.Lock()
+
+        self._queue = queue.Queue(maxsize=queue_size or settings.upsert_queue_size)
+        self._workers = [
+            threading.Thread(target=self._upsert_worker, name=f"upsert-{i}", daemon=True)
+            for i in range(upsert_concurrency or settings.upsert_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _with_retries(self, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._stats_lock:
+                    self.retries += 1
+                print(f"⚠️  Falha no lote ({e}); nova tentativa {attempt + 1}/{self.max_retries}...")
+                time.sleep(min(2 ** attempt, 30))
+
+    def _upsert_worker(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                try:
+                    t0 = perf_counter()
+                    self._with_retries(self.index.upsert, vectors=batch)
+                    INGEST_BATCH_LATENCY.labels("upsert").observe(perf_counter() - t0)
+                    INGEST_CHUNKS.labels("upserted").inc(len(batch))
+                    with self._stats_lock:
+                        self.vectors_upserted += len(batch)
+                except Exception as e:
+                    print(f"❌ Lote de {len(batch)} vetores descartado após {self.max_retries} tentativas: {e}")
+                    INGEST_CHUNKS.labels("failed").inc(len(batch))
+                    with self._stats_lock:
+                        self.failed_ids.update(v["id"] for v in batch)
+            finally:
+                self._queue.task_done()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+
+        t0 = perf_counter()
+        vectors = self.embeddings.embed_documents([doc.page_content for _, doc in batch])
+        elapsed = perf_counter() - t0
+        self.embed_seconds += elapsed
+        self.chunks_embedded += len(batch)
+        INGEST_BATCH_LATENCY.labels("embed").observe(elapsed)
+        INGEST_CHUNKS.labels("embedded").inc(len(batch))
+
+        records = [
+            {"id": cid, "values": vector, "metadata": {**doc.metadata, self.text_key: doc.page_content}}
+            for (cid, doc), vector in zip(batch, vectors)
+        ]
+        for i in range(0, len(records), self.upsert_batch_size):
+            self._queue.put(records[i:i + self.upsert_batch_size])  # bloqueia com a fila cheia
+
+    def add_documents(self, documents, ids):
+        for cid, doc in zip(ids, documents):
+            self._buffer.append((cid, doc))
+            if len(self._buffer) >= self.embed_batch_size:
+                self._flush()
+        return list(ids)
+
+    def delete(self, ids):
+        self._with_retries(self.index.delete, ids=list(ids))
+        self.vectors_deleted += len(ids)
+        INGEST_CHUNKS.labels("deleted").inc(len(ids))
+
+    def close(self):
+        """Envia o lote parcial, aguarda os upserts pendentes e encerra as threads."""
+        if self._elapsed is not None:
+            return
+        self._flush()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        persist = getattr(self.index, "persist", None)  # backend local grava o índice em disco
+        if persist is not None:
+            persist()
+        self._elapsed = perf_counter() - self._started
+
+    def stats(self) -> dict:
+        elapsed = self._elapsed if self._elapsed is not None else perf_counter() - self._started
+        return {
+            "chunks_embedded": self.chunks_embedded,
+            "vectors_upserted": self.vectors_upserted,
+            "vectors_deleted": self.vectors_deleted,
+            "failed_vectors": len(self.failed_ids),
+            "retries": self.retries,
+            "embed_seconds": round(self.embed_seconds, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(self.vectors_upserted / elapsed, 1) if elapsed > 0 else 0.0,
+        }
@@ -1,11 +1,10 @@
 import streamlit as st
-import time
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredMarkdownLoader
 from app.rag.vectorstore import build_or_load_vectorstore
-from app.rag.rag_pipeline import answer_question
+from app.rag.rag_pipeline import stream_answer_question
 from app.rag.prompts import PromptTemplates
-from app.rag.ingest import chunk_documents
+from app.rag.ingest import chunk_documents, index_file_chunks, load_file
+from app.rag.cache import get_answer_cache
 from app.core.config import settings
 
 # ==================== CONFIGURAÇÃO DA PÁGINA ====================
@@ -83,15 +82,7 @@ with st.sidebar:
                     st.info(f"Conhecimento adquirido: {uploaded_file.name}")
                     
                     # Carregar documento
-                    docs = []
-                    file_ext = Path(uploaded_file.name).suffix.lower()
-                    
-                    if file_ext == ".pdf":
-                        docs = PyPDFLoader(str(file_path)).load()
-                    elif file_ext == ".md":
-                        docs = UnstructuredMarkdownLoader(str(file_path)).load()
-                    elif file_ext == ".txt":
-                        docs = TextLoader(str(file_path), encoding="utf-8").load()
+                    docs = load_file(file_path)
                     
                     if not docs:
                         st.error("Não foi possível carregar o documento")
@@ -102,10 +93,12 @@ with st.sidebar:
                         
                         # Adicionar ao Pinecone
                         st.info(f"Adicionando {len(chunks)} chunks ao Pinecone...")
-                        build_or_load_vectorstore(chunks)
+                        index_file_chunks(file_path, chunks)
                         
-                        # Limpar cache
-                        st.cache_resource.clear()
+                        # Invalidar respostas em cache (o modelo e o índice carregados são mantidos)
+                        answer_cache = get_answer_cache()
+                        if answer_cache is not None:
+                            answer_cache.invalidate()
                         
                         st.success(f"Obrigado. Você acaba de me deixar mais inteligente!")
                         st.balloons()
@@ -157,53 +150,65 @@ if question := st.chat_input("Faça sua pergunta sobre Open Insurance..."):
 
     # Gerar resposta
     with st.chat_message("assistant"):
-        with st.spinner("Pensando..."):
-            try:
+        try:
+            with st.spinner("Pensando..."):
                 # Carregar vectorstore
                 vectorstore = get_vectorstore()
-                
-                # Selecionar prompt
-                prompt_map = {
-                    "concise": PromptTemplates.get_concise_rag_prompt(),
-                    "detailed": PromptTemplates.get_detailed_rag_prompt(),
-                    "bullet_points": PromptTemplates.get_bullet_points_prompt(),
-                    "yes_no": PromptTemplates.get_yes_no_prompt()
-                }
-                prompt_template = prompt_map[prompt_style]
-                
-                # Executar RAG
-                start_time = time.time()
-                answer, metadata = answer_question(
+            
+            # Selecionar prompt
+            prompt_map = {
+                "concise": PromptTemplates.get_concise_rag_prompt(),
+                "detailed": PromptTemplates.get_detailed_rag_prompt(),
+                "bullet_points": PromptTemplates.get_bullet_points_prompt(),
+                "yes_no": PromptTemplates.get_yes_no_prompt()
+            }
+            prompt_template = prompt_map[prompt_style]
+            
+            # Executar RAG em streaming: os tokens são exibidos assim que chegam
+            contexts = []
+            metadata = {}
+            
+            def token_stream():
+                for event, data in stream_answer_question(
                     vectorstore=vectorstore,
                     question=question,
                     return_contexts=show_contexts,
-                    prompt_template=prompt_template
-                )
-                latency = time.time() - start_time
-                
-                # Exibir resposta
-                st.markdown(answer)
-                st.caption(f"Latência: {latency:.2f}s | {settings.llm_model}")
-                
-                # Mostrar contextos se solicitado
-                contexts = metadata.get("contexts", [])
-                if show_contexts and contexts:
-                    with st.expander("Ver contextos recuperados"):
-                        for i, ctx in enumerate(contexts, 1):
-                            st.markdown(f"**Contexto {i}:**")
-                            st.text(ctx.page_content[:300] + "...")
-                            st.caption(f"Fonte: {ctx.metadata.get('source', 'N/A')}")
-                            st.markdown("---")
-                
-                # Adicionar resposta ao histórico
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": answer,
-                    "contexts": contexts if show_contexts else []
-                })
-                
-            except Exception as e:
-                st.error(f"Erro ao processar pergunta: {str(e)}")
+                    prompt_template=prompt_template,
+                    prompt_style=prompt_style
+                ):
+                    if event == "sources":
+                        contexts.extend(data)
+                    elif event == "token":
+                        yield data
+                    elif event == "done":
+                        metadata.update(data)
+            
+            answer = st.write_stream(token_stream())
+            
+            # Exibir métricas de latência
+            st.caption(
+                f"Latência: {metadata.get('latency', 0):.2f}s | "
+                f"Primeiro token: {metadata.get('ttft') or 0:.2f}s | {settings.llm_model}"
+            )
+            
+            # Mostrar contextos se solicitado
+            if show_contexts and contexts:
+                with st.expander("Ver contextos recuperados"):
+                    for i, ctx in enumerate(contexts, 1):
+                        st.markdown(f"**Contexto {i}:**")
+                        st.text(ctx.page_content[:300] + "...")
+                        st.caption(f"Fonte: {ctx.metadata.get('source', 'N/A')}")
+                        st.markdown("---")
+            
+            # Adicionar resposta ao histórico
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer,
+                "contexts": contexts if show_contexts else []
+            })
+            
+        except Exception as e:
+            st.error(f"Erro ao processar pergunta: {str(e)}")
 
 # Footer
 st.markdown("---")
@@ -1,8 +1,44 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from app.api.routes import router as api_router
 from app.core.config import settings
+from app.core.metrics import render_metrics
+from app.core.logger import logger
+from starlette.concurrency import run_in_threadpool
+
+# ==================== STARTUP ====================
+
+def warm_up():
+    """Carrega modelo de embeddings, índice e cliente LLM antes da primeira requisição."""
+    from app.core.config import get_llm
+    from app.rag.cache import get_answer_cache
+    from app.rag.rerank import get_reranker
+    from app.rag.sparse import get_sparse_index
+    from app.rag.vectorstore import get_vectorstore
+
+    start = time.perf_counter()
+    vectorstore = get_vectorstore()
+    vectorstore.embeddings.embed_query("warm-up")  # primeira inferência inicializa o modelo
+    get_llm()
+    get_answer_cache()
+    get_sparse_index()
+    reranker = get_reranker()
+    if reranker is not None:
+        reranker.model.predict([("warm-up", "warm-up")], show_progress_bar=False)
+    logger.info(f"Warm-up concluído em {time.perf_counter() - start:.2f}s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sem warm-up, os recursos são criados na primeira requisição que precisar deles
+    if settings.warmup_on_startup:
+        await run_in_threadpool(warm_up)
+    yield
+    from app.core.llm_router import aclose_http_clients
+    await aclose_http_clients()
 
 # ==================== CONFIGURAÇÃO DA API ====================
 
@@ -14,6 +50,7 @@ app = FastAPI(
     Repositório: https://github.com/luciano-coelho/OpenInsuranceAgent
     """,
     version="1.0.0",
+    lifespan=lifespan,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_tags=[
@@ -46,5 +83,11 @@ async def root():
     """Redireciona para documentação Swagger"""
     return RedirectResponse(url="/docs")
 
+@app.get("/metrics", tags=["System"], summary="Métricas Prometheus")
+async def prometheus_metrics():
+    """Endpoint de scrape no formato texto do Prometheus (latência por etapa, cache, tokens, erros, ingestão)"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 # Incluir rotas da API
 app.include_router(api_router)
@@ -0,0 +1,102 @@
+"""Benchmark da admissão sob sobrecarga (sem rede nem índice).
+
+Simula um backend com capacidade fixa (`--capacity` chamadas simultâneas de
+`--service` segundos) recebendo requisições a uma taxa acima dessa capacidade.
+Cada cliente desiste após `--timeout` segundos, mas o trabalho já iniciado
+segue até o fim (como uma chamada ao LLM cujo cliente desconectou). Compara,
+sem e com admissão:
+- goodput: respostas entregues dentro do timeout por segundo;
+- p50/p99 das respostas entregues e quantas foram recusadas com 503.
+
+Uso:
+    python -m scripts.bench_admission --rate 40 --capacity 8 --service 0.5 --duration 20
+"""
+import argparse
+import asyncio
+import random
+from time import perf_counter
+
+import scripts.bench_common  # noqa: F401  (chaves fictícias para carregar a configuração)
+
+import numpy as np
+
+from app.core.admission import AdmissionController, Overloaded, ProviderLimiter
+
+
+async def _run(args, controller) -> dict:
+    backend = asyncio.Semaphore(args.capacity)
+    latencies, shed, timed_out = [], 0, 0
+    pending = []
+
+    async def service():
+        async with backend:
+            await asyncio.sleep(random.expovariate(1 / args.service))
+
+    async def one():
+        nonlocal shed, timed_out
+        t0 = perf_counter()
+        try:
+            if controller is None:
+                work = service()
+            else:
+                async def admitted():
+                    await controller.acquire(deadline=args.deadline)
+                    start = perf_counter()
+                    try:
+                        await service()
+                    finally:
+                        controller.release(perf_counter() - start)
+                work = admitted()
+            pending.append(asyncio.ensure_future(work))
+            await asyncio.wait_for(asyncio.shield(pending[-1]), timeout=args.timeout)
+            latencies.append(perf_counter() - t0)
+        except Overloaded:
+            shed += 1
+        except asyncio.TimeoutError:
+            timed_out += 1
+
+    tasks = []
+    start = perf_counter()
+    while perf_counter() - start < args.duration:
+        tasks.append(asyncio.ensure_future(one()))
+        await asyncio.sleep(random.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    await asyncio.gather(*pending, return_exceptions=True)
+    p50, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 99]) if latencies else (0, 0)
+    return {
+        "requests": len(tasks),
+        "ok": len(latencies),
+        "shed": shed,
+        "timeout": timed_out,
+        "goodput": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(p50, 1),
+        "p99_ms": round(p99, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=40.0, help="Requisições por segundo")
+    parser.add_argument("--capacity", type=int, default=8, help="Chamadas simultâneas que o backend atende")
+    parser.add_argument("--service", type=float, default=0.5, help="Tempo médio de atendimento (s)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Duração da carga (s)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Timeout do cliente (s)")
+    parser.add_argument("--deadline", type=float, default=3.0, help="Prazo na fila de admissão (s)")
+    parser.add_argument("--queue-size", type=int, default=256)
+    args = parser.parse_args()
+
+    scenarios = {
+        "sem_admissao": lambda: None,
+        "admissao": lambda: AdmissionController([ProviderLimiter("stub")], args.capacity, args.queue_size),
+    }
+    print(f"{'cenário':<13} | {'req':>5} | {'ok':>5} | {'503':>5} | {'timeout':>7} | {'goodput/s':>9} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    for name, factory in scenarios.items():
+        r = asyncio.run(_run(args, factory()))
+        print(
+            f"{name:<13} | {r['requests']:>5} | {r['ok']:>5} | {r['shed']:>5} | {r['timeout']:>7} | "
+            f"{r['goodput']:>9} | {r['p50_ms']:>9} | {r['p99_ms']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
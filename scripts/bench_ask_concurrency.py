@@ -0,0 +1,95 @@
+"""Benchmark de carga do endpoint /api/v1/ask com LLM e vectorstore simulados.
+
+Compara o pipeline síncrono (answer_question chamado dentro do event loop, como
+antes) com o assíncrono (aanswer_question) para vários níveis de concorrência,
+disparando as requisições contra a aplicação FastAPI via httpx (ASGI, sem rede).
+
+Todas as requisições usam a mesma pergunta, então o agrupamento de perguntas
+idênticas (COALESCE_REQUESTS) é desligado: o benchmark mede o pipeline, não o
+SingleFlight.
+
+Uso:
+    python -m scripts.bench_ask_concurrency --llm-latency 0.5 --concurrency 1 8 32 64
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from scripts.bench_common import StubVectorStore, disable_answer_cache, install_stub_llm
+
+import httpx
+from main import app
+from app.api import routes
+from app.core.config import settings
+from app.rag.rag_pipeline import answer_question
+
+
+async def _blocking_aanswer_question(*args, **kwargs):
+    """Reproduz o comportamento antigo: pipeline síncrono executado no event loop."""
+    return answer_question(*args, **kwargs)
+
+
+async def _run_level(concurrency: int, requests_per_level: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    payload = {"question": "Quais são os requisitos de certificados?", "prompt_style": "concise"}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one():
+            async with semaphore:
+                t0 = perf_counter()
+                resp = await client.post("/api/v1/ask", json=payload)
+                resp.raise_for_status()
+                latencies.append(perf_counter() - t0)
+
+        t0 = perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests_per_level)))
+        elapsed = perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput_rps": round(requests_per_level / elapsed, 2),
+        "p50_s": round(latencies[len(latencies) // 2], 3),
+        "max_s": round(latencies[-1], 3),
+    }
+
+
+async def _run_mode(mode: str, levels, requests_multiplier: int):
+    original = routes.aanswer_question
+    if mode == "sync":
+        routes.aanswer_question = _blocking_aanswer_question
+    try:
+        results = []
+        for c in levels:
+            results.append(await _run_level(c, max(c * requests_multiplier, requests_multiplier)))
+        return results
+    finally:
+        routes.aanswer_question = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Latência simulada do LLM (s)")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="Latência simulada da busca vetorial (s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests-multiplier", type=int, default=2, help="Requisições por nível = concorrência x N")
+    args = parser.parse_args()
+
+    install_stub_llm(args.llm_latency)
+    disable_answer_cache()
+    settings.coalesce_requests = False
+    print("COALESCE_REQUESTS=false: cada requisição executa o pipeline completo (pergunta repetida)")
+    vectorstore = StubVectorStore(search_latency=args.search_latency)
+    app.dependency_overrides[routes.get_vectorstore] = lambda: vectorstore
+
+    for mode in ("sync", "async"):
+        print(f"\n=== Pipeline {mode} ===")
+        print(f"{'concorrência':>12} | {'req/s':>8} | {'p50 (s)':>8} | {'max (s)':>8}")
+        for r in asyncio.run(_run_mode(mode, args.concurrency, args.requests_multiplier)):
+            print(f"{r['concurrency']:>12} | {r['throughput_rps']:>8} | {r['p50_s']:>8} | {r['max_s']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Stubs compartilhados pelos benchmarks (LLM, embeddings e vectorstore falsos).
+
+Permitem medir o pipeline sem chaves de API: as latências simuladas substituem
+as chamadas de rede ao provedor LLM e ao Pinecone.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from types import SimpleNamespace
+
+# Valores fictícios para que app.core.config carregue sem .env
+os.environ.setdefault("PINECONE_API_KEY", "offline")
+os.environ.setdefault("GROQ_API_KEY", "offline")
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+class StubLLM:
+    """LLM falso com latência configurável (invoke bloqueia, ainvoke não).
+
+    No streaming, o primeiro token chega após `ttft` segundos (metade da latência
+    por padrão) e o restante da resposta é distribuído até completar `latency`.
+    """
+
+    def __init__(self, latency: float = 0.5, answer: str = "Resposta simulada.", ttft: float = None):
+        self.latency = latency
+        self.answer = answer
+        self.ttft = latency / 2 if ttft is None else ttft
+
+    def _tokens(self):
+        tokens = re.findall(r"\S+\s*", self.answer) or [self.answer]
+        gap = max(self.latency - self.ttft, 0.0) / max(len(tokens) - 1, 1)
+        return tokens, gap
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return SimpleNamespace(content=self.answer)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(content=self.answer)
+
+    def stream(self, prompt):
+        tokens, gap = self._tokens()
+        time.sleep(self.ttft)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(gap)
+            yield SimpleNamespace(content=token)
+
+    async def astream(self, prompt):
+        tokens, gap = self._tokens()
+        await asyncio.sleep(self.ttft)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(gap)
+            yield SimpleNamespace(content=token)
+
+
+class StubEmbeddings:
+    """Embeddings falsos: simula o custo de CPU do MiniLM com um sleep curto."""
+
+    def __init__(self, latency: float = 0.005, dim: int = 384):
+        self.latency = latency
+        self.dim = dim
+
+    def embed_query(self, text: str):
+        time.sleep(self.latency)
+        return [0.0] * self.dim
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+class HashEmbeddings(Embeddings):
+    """Embeddings determinísticos por hashing de palavras (sem modelo nem download).
+
+    Textos com palavras em comum ficam próximos, o suficiente para exercitar o
+    índice local com dados reais de `data/oi` sem depender do MiniLM.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str):
+        return self._embed(text)
+
+
+class StubVectorStore:
+    """Vectorstore falso com latência de busca configurável."""
+
+    def __init__(self, search_latency: float = 0.02, embed_latency: float = 0.005, k: int = 7):
+        self.search_latency = search_latency
+        self.embeddings = StubEmbeddings(embed_latency)
+        self.docs = [
+            Document(page_content=f"Trecho {i} sobre Open Insurance.", metadata={"source": "stub", "page": i})
+            for i in range(k)
+        ]
+
+    def _search(self, k):
+        time.sleep(self.search_latency)
+        return self.docs[:k]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        self.embeddings.embed_query(query)
+        return self._search(k)
+
+    def max_marginal_relevance_search(self, query, k=4, **kwargs):
+        self.embeddings.embed_query(query)
+        return self._search(k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return self._search(k)
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k=4, **kwargs):
+        return self._search(k)
+
+    async def asimilarity_search_by_vector(self, embedding, k=4, **kwargs):
+        await asyncio.sleep(self.search_latency)
+        return self.docs[:k]
+
+    async def amax_marginal_relevance_search_by_vector(self, embedding, k=4, **kwargs):
+        await asyncio.sleep(self.search_latency)
+        return self.docs[:k]
+
+
+def disable_answer_cache():
+    """Desabilita o cache de respostas para medir o pipeline completo."""
+    from app.core.config import settings
+
+    settings.answer_cache_enabled = False
+
+
+def install_stub_llm(latency: float, ttft: float = None):
+    """Substitui o LLM do pipeline por um StubLLM e o devolve."""
+    from app.rag import rag_pipeline
+
+    stub = StubLLM(latency, ttft=ttft)
+    rag_pipeline.llm = stub
+    return stub
@@ -0,0 +1,177 @@
+"""Benchmark dos backends de embeddings: sentence-transformers (torch) vs ONNX Runtime.
+
+Cada backend roda num processo Python novo, para que memória e tempo de carga
+não se misturem. Para cada um mede:
+- carga: tempo de import + carga do modelo e RSS do processo após a carga;
+- consulta: latência p50/p99 de `embed_query` (perguntas da avaliação);
+- lote: throughput de `embed_documents` sobre chunks de `data/oi` (textos/s)
+  e pico de RSS;
+- compatibilidade: cosseno mínimo/médio contra os vetores do torch.
+
+Os backends ONNX exigem o modelo exportado (python -m scripts.export_onnx_embeddings).
+
+Uso:
+    python -m scripts.bench_embeddings [--backends torch onnx onnx-int8] [--chunks 500] [--queries 200]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+QUESTIONS_PATH = Path("app/evaluation/evaluation.json")
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _texts(data_dir: str, count: int):
+    from app.rag.ingest import chunk_documents, iter_source_files, load_file
+
+    chunks = []
+    for path in iter_source_files(data_dir):
+        try:
+            chunks.extend(c.page_content for c in chunk_documents(load_file(path)))
+        except Exception as e:
+            print(f"⚠️  Erro ao carregar {path.name}: {e}", file=sys.stderr)
+    return random.Random(42).sample(chunks, min(count, len(chunks)))
+
+
+def _load(backend: str):
+    from app.core.config import settings
+
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=settings.embedding_model)
+    from app.rag.onnx_embeddings import OnnxEmbeddings
+
+    return OnnxEmbeddings(
+        settings.embedding_onnx_path,
+        model_name=settings.embedding_model,
+        quantized=backend == "onnx-int8",
+        batch_size=settings.embedding_onnx_batch_size,
+        threads=settings.embedding_onnx_threads,
+    )
+
+
+def worker(backend: str, texts_path: str, vectors_path: str, queries: int) -> dict:
+    """Executado no processo filho: carga, consultas isoladas e lote."""
+    with open(texts_path, encoding="utf-8") as f:
+        data = json.load(f)
+    questions, chunks = data["questions"], data["chunks"]
+
+    t0 = perf_counter()
+    embeddings = _load(backend)
+    embeddings.embed_query("aquecimento")
+    load_seconds = perf_counter() - t0
+    rss_load_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    samples = []
+    for i in range(queries):
+        t1 = perf_counter()
+        embeddings.embed_query(questions[i % len(questions)])
+        samples.append(perf_counter() - t1)
+
+    t2 = perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    batch_seconds = perf_counter() - t2
+    np.save(vectors_path, vectors)
+
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "rss_after_load_mb": round(rss_load_mb, 1),
+        "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "query_p50_ms": round(float(p50), 2),
+        "query_p99_ms": round(float(p99), 2),
+        "batch_texts_per_second": round(len(chunks) / batch_seconds, 1),
+    }
+
+
+def _run_backend(backend: str, texts_path: str, vectors_path: str, queries: int) -> dict:
+    env = dict(os.environ)
+    # Valores fictícios para que app.core.config carregue sem .env
+    env.setdefault("PINECONE_API_KEY", "offline")
+    env.setdefault("GROQ_API_KEY", "offline")
+    proc = subprocess.run(
+        [sys.executable, "-m", "scripts.bench_embeddings", "--worker", backend,
+         "--texts-file", texts_path, "--vectors-file", vectors_path, "--queries", str(queries)],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["falhou"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--data-dir", default="data/oi")
+    parser.add_argument("--chunks", type=int, default=500, help="Chunks no teste de lote")
+    parser.add_argument("--queries", type=int, default=200, help="Chamadas a embed_query")
+    parser.add_argument("--output", default=None, help="Arquivo JSON de resultados")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--texts-file", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.texts_file, args.vectors_file, args.queries)))
+        return
+
+    import scripts.bench_common  # noqa: F401  (chaves fictícias para carregar a configuração)
+
+    with open(QUESTIONS_PATH, encoding="utf-8") as f:
+        questions = [row["question"] for row in json.load(f)]
+    chunks = _texts(args.data_dir, args.chunks)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="oi-bench-emb-") as tmp:
+        texts_path = str(Path(tmp) / "texts.json")
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump({"questions": questions, "chunks": chunks}, f, ensure_ascii=False)
+
+        vectors = {}
+        for backend in args.backends:
+            print(f"Medindo {backend}...")
+            vectors_path = str(Path(tmp) / f"{backend}.npy")
+            results[backend] = _run_backend(backend, texts_path, vectors_path, args.queries)
+            if "error" not in results[backend]:
+                vectors[backend] = np.load(vectors_path)
+
+        if "torch" in vectors:
+            for backend, matrix in vectors.items():
+                if backend != "torch":
+                    cosines = np.sum(matrix * vectors["torch"], axis=1)
+                    results[backend]["cosine_min"] = round(float(cosines.min()), 5)
+                    results[backend]["cosine_mean"] = round(float(cosines.mean()), 5)
+
+    print(f"\n{len(chunks)} chunks, {args.queries} consultas")
+    print(
+        f"{'backend':<10} | {'carga (s)':>9} | {'RSS carga':>9} | {'RSS pico':>8} | {'p50 (ms)':>8} | "
+        f"{'p99 (ms)':>8} | {'lote (txt/s)':>12} | {'cos mín':>7}"
+    )
+    for backend, r in results.items():
+        if "error" in r:
+            print(f"{backend:<10} | erro: {r['error']}")
+            continue
+        print(
+            f"{backend:<10} | {r['load_seconds']:>9} | {r['rss_after_load_mb']:>9} | {r['rss_peak_mb']:>8} | {r['query_p50_ms']:>8} | "
+            f"{r['query_p99_ms']:>8} | {r['batch_texts_per_second']:>12} | {r.get('cosine_min', '-'):>7}"
+        )
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark do roteador de LLM com providers simulados (sem rede).
+
+Cada provider é um StubChatModel com latência base, cauda (uma fração das
+chamadas demora `--tail-latency`) e taxa de erro. Compara p50/p95/p99 e erros
+de um único provider, do roteador sem hedge e do roteador com hedge.
+
+Uso:
+    python -m scripts.bench_llm_router --requests 400 --concurrency 16
+"""
+import argparse
+import asyncio
+import random
+from time import perf_counter
+
+import scripts.bench_common  # noqa: F401  (chaves fictícias para carregar a configuração)
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.llm_router import LLMRouter, Provider, StubChatModel
+
+
+class TailStubChatModel(StubChatModel):
+    """Stub com cauda longa: `tail_rate` das chamadas levam `tail_latency`."""
+
+    def __init__(self, latency, error_rate, tail_rate, tail_latency):
+        super().__init__(latency, error_rate)
+        self.base = latency
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+
+    async def ainvoke(self, prompt, **kwargs):
+        self.latency = self.tail_latency if random.random() < self.tail_rate else self.base
+        return await super().ainvoke(prompt, **kwargs)
+
+
+def _providers(args):
+    return [
+        Provider("primary", TailStubChatModel(args.latency, args.error_rate, args.tail_rate, args.tail_latency)),
+        Provider("secondary", TailStubChatModel(args.latency * 1.5, args.error_rate, args.tail_rate, args.tail_latency)),
+    ]
+
+
+async def _run(llm, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            t0 = perf_counter()
+            try:
+                await llm.ainvoke("pergunta")
+                latencies.append(perf_counter() - t0)
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99]) if latencies else (0, 0, 0)
+    return {"errors": errors, "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latência base do provider principal (s)")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="Fração de chamadas lentas")
+    parser.add_argument("--tail-latency", type=float, default=2.0, help="Latência das chamadas lentas (s)")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    settings.llm_hedge_min_samples = min(settings.llm_hedge_min_samples, args.requests // 10)
+    scenarios = {
+        "single": lambda: _providers(args)[0].model,
+        "router": lambda: LLMRouter(_providers(args)),
+        "router_hedge": lambda: LLMRouter(_providers(args), hedge=True),
+    }
+    print(f"{'cenário':<14} | {'erros':>5} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'p99 (ms)':>9}")
+    for name, factory in scenarios.items():
+        r = asyncio.run(_run(factory(), args.requests, args.concurrency))
+        print(f"{name:<14} | {r['errors']:>5} | {r['p50_ms']:>9} | {r['p95_ms']:>9} | {r['p99_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark da quantização do índice local (int8 / binary) sobre `data/oi`.
+
+Embeda os chunks de `data/oi`, monta um LocalVectorIndex por quantização e
+compara com a busca exata em float32:
+- memória: bytes percorridos na primeira passada (vetores float32 ou códigos);
+- recall@k: fração do top-k exato recuperada, para cada fator de rescoring
+  (candidatos rescored = k x fator);
+- latência p50/p99 por busca.
+
+As consultas são as perguntas de `app/evaluation/evaluation.json` mais o
+início de chunks sorteados. Por padrão usa o modelo de embeddings da
+configuração; `--embeddings hash` roda sem modelo (HashEmbeddings).
+
+Uso:
+    python -m scripts.bench_quantization --k 7 --factors 1 2 4 10
+"""
+import argparse
+import json
+import random
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from scripts.bench_common import HashEmbeddings
+
+import numpy as np
+
+from app.core.config import settings
+from app.rag.ingest import chunk_documents, iter_source_files, load_file
+from app.rag.local_index import LocalVectorIndex
+from app.rag.quantization import QUANTIZATIONS
+
+QUESTIONS_PATH = Path("app/evaluation/evaluation.json")
+
+
+def _chunks(data_dir: str):
+    texts = []
+    for path in iter_source_files(data_dir):
+        try:
+            texts.extend(c.page_content for c in chunk_documents(load_file(path)))
+        except Exception as e:
+            print(f"⚠️  Erro ao carregar {path.name}: {e}")
+    return texts
+
+
+def _queries(texts, count: int, seed: int):
+    with open(QUESTIONS_PATH, encoding="utf-8") as f:
+        questions = [row["question"] for row in json.load(f)]
+    rng = random.Random(seed)
+    sampled = rng.sample(texts, min(count, len(texts)))
+    return questions + [" ".join(t.split()[:12]) for t in sampled]
+
+
+def _embeddings(kind: str):
+    if kind == "hash":
+        return HashEmbeddings()
+    from app.rag.vectorstore import get_embeddings
+
+    return get_embeddings()
+
+
+def _build(workdir: Path, kind: str, ids, vectors) -> LocalVectorIndex:
+    index = LocalVectorIndex(workdir / kind, quantization=kind)
+    index.upsert([{"id": id_, "values": v, "metadata": {}} for id_, v in zip(ids, vectors)])
+    index.persist()
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data/oi")
+    parser.add_argument("--embeddings", choices=["model", "hash"], default="model")
+    parser.add_argument("--k", type=int, default=settings.top_k)
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2, 4, 10], help="Fatores de rescoring")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas extraídas de chunks sorteados")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    texts = _chunks(args.data_dir)
+    if not texts:
+        raise SystemExit(f"Nenhum chunk em {args.data_dir}")
+    embeddings = _embeddings(args.embeddings)
+    t0 = perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    queries = [np.asarray(v, dtype=np.float32) for v in embeddings.embed_documents(_queries(texts, args.queries, args.seed))]
+    print(f"{len(texts)} chunks, {len(queries)} consultas, embeddings em {perf_counter() - t0:.1f}s ({args.embeddings})")
+
+    ids = [str(i) for i in range(len(texts))]
+    results = {"chunks": len(texts), "queries": len(queries), "k": args.k, "embeddings": args.embeddings}
+    with tempfile.TemporaryDirectory(prefix="oi-bench-quant-") as tmp:
+        indexes = {kind: _build(Path(tmp), kind, ids, vectors) for kind in QUANTIZATIONS}
+        baseline = [[hit["id"] for hit in indexes["none"].search(q, args.k)] for q in queries]
+        float_bytes = indexes["none"].memory_bytes()["vectors"]
+
+        print(f"\n{'índice':<8} | {'fator':>5} | {'memória (KB)':>12} | {'redução':>7} | {'recall@k':>8} | {'p50 (ms)':>8} | {'p99 (ms)':>8}")
+        for kind, index in indexes.items():
+            scanned = index.memory_bytes().get("codes", float_bytes)
+            results[kind] = {"scan_bytes": scanned, "disk_bytes": sum(p.stat().st_size for p in (Path(tmp) / kind).glob("*.npy"))}
+            for factor in ([1] if kind == "none" else args.factors):
+                index.rescore_factor = factor
+                index.search(queries[0], args.k)  # aquecimento
+                samples, recalls = [], []
+                for q, expected in zip(queries, baseline):
+                    t1 = perf_counter()
+                    found = [hit["id"] for hit in index.search(q, args.k)]
+                    samples.append(perf_counter() - t1)
+                    recalls.append(len(set(found) & set(expected)) / max(len(expected), 1))
+                p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+                row = {"recall_at_k": round(float(np.mean(recalls)), 4), "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+                results[kind][f"factor_{factor}"] = row
+                print(
+                    f"{kind:<8} | {factor:>5} | {scanned / 1024:>12.1f} | {float_bytes / scanned:>6.1f}x | "
+                    f"{row['recall_at_k']:>8.3f} | {row['p50_ms']:>8.3f} | {row['p99_ms']:>8.3f}"
+                )
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""Suíte de benchmarks offline para acompanhar regressões de desempenho entre commits.
+
+Roda sem rede e sem chaves de API: o LLM é simulado (latência configurável), os
+embeddings são calculados por hashing (`HashEmbeddings`) e o índice é um
+LocalVectorIndex construído a partir de `data/oi` em um diretório temporário.
+
+Etapas (todas por padrão, ou as escolhidas com --only):
+- chunking:  leitura e divisão dos documentos (páginas/s, chunks/s, MB/s)
+- ingestion: ingestão completa com workers + UpsertPipeline (chunks/s)
+- retrieval: latência da busca vetorial, do MMR e do BM25 no índice local (p50/p95/p99)
+- ask:       throughput do /api/v1/ask sob concorrência (req/s, p50/p95/p99), com COALESCE_REQUESTS=false
+- batch:     /api/v1/ask/batch com N perguntas comparado a uma chamada isolada ao /api/v1/ask
+- memória:   pico de RSS após cada etapa e tamanho do índice
+
+Uso:
+    python -m scripts.bench_suite [--only chunking retrieval] [--output results.json]
+    python -m scripts.bench_suite --compare data/bench/<anterior>.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from scripts.bench_common import HashEmbeddings, disable_answer_cache, install_stub_llm
+
+from app.core.config import settings
+from app.rag.ingest import chunk_documents, incremental_ingest, iter_source_files, load_file
+from app.rag.local_index import LocalVectorIndex, LocalVectorStore
+from app.rag.sparse import BM25Index
+
+STAGES = ("chunking", "ingestion", "retrieval", "ask", "batch")
+QUESTIONS_PATH = Path("app/evaluation/evaluation.json")
+
+
+def _percentiles_ms(samples) -> dict:
+    values = np.asarray(samples, dtype=float) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+
+def _rss_peak_mb() -> dict:
+    # ru_maxrss em KB no Linux (pico do processo principal; os workers de parsing não entram)
+    return {"rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _questions():
+    with open(QUESTIONS_PATH, encoding="utf-8") as f:
+        return [row["question"] for row in json.load(f)]
+
+
+def bench_chunking(data_dir: str) -> dict:
+    """Leitura e chunking serial de cada arquivo, medidos separadamente."""
+    files = iter_source_files(data_dir)
+    parse_s = chunk_s = 0.0
+    pages = chunks = size = failed = 0
+    for path in files:
+        t0 = perf_counter()
+        try:
+            docs = load_file(path)
+        except Exception as e:
+            print(f"⚠️  Erro ao carregar {path.name}: {e}")
+            failed += 1
+            continue
+        t1 = perf_counter()
+        chunks += len(chunk_documents(docs))
+        chunk_s += perf_counter() - t1
+        parse_s += t1 - t0
+        pages += len(docs)
+        size += path.stat().st_size
+
+    return {
+        "files": len(files) - failed,
+        "files_failed": failed,
+        "pages": pages,
+        "chunks": chunks,
+        "parse_seconds": round(parse_s, 3),
+        "chunk_seconds": round(chunk_s, 3),
+        "pages_per_second": round(pages / parse_s, 1) if parse_s else None,
+        "parse_mb_per_second": round(size / 1024 / 1024 / parse_s, 2) if parse_s else None,
+        "chunks_per_second": round(chunks / chunk_s, 1) if chunk_s else None,
+    }
+
+
+def bench_ingestion(data_dir: str, workdir: Path, workers: int) -> dict:
+    """Ingestão completa (parsing paralelo + embedding + upsert) para um índice local novo."""
+    from app.rag.vectorstore import UpsertPipeline
+
+    index = LocalVectorIndex(workdir / "index", dim=384)
+    pipeline = UpsertPipeline(index=index, embeddings=HashEmbeddings())
+    t0 = perf_counter()
+    stats = incremental_ingest(
+        data_dir, vectorstore=pipeline, manifest_path=workdir / "manifest.json", workers=workers,
+        sparse=BM25Index(workdir / "sparse_index.json"),
+    )
+    pipeline.close()
+    elapsed = perf_counter() - t0
+
+    pipeline_stats = pipeline.stats()
+    return {
+        "workers": workers,
+        "files": stats.get("files_changed", 0),
+        "files_failed": stats.get("files_failed", 0),
+        "chunks": pipeline_stats["vectors_upserted"],
+        "elapsed_seconds": round(elapsed, 3),
+        "chunks_per_second": round(pipeline_stats["vectors_upserted"] / elapsed, 1) if elapsed else None,
+        "embed_seconds": pipeline_stats["embed_seconds"],
+        "index_vectors_mb": round((workdir / "index" / "vectors.npy").stat().st_size / 1024 / 1024, 2),
+        "index_meta_mb": round((workdir / "index" / "meta.json").stat().st_size / 1024 / 1024, 2),
+    }
+
+
+def _open_store(workdir: Path) -> LocalVectorStore:
+    return LocalVectorStore(LocalVectorIndex(workdir / "index"), HashEmbeddings())
+
+
+def _use_bench_sparse_index(workdir: Path):
+    """Aponta a busca híbrida para o BM25 construído na ingestão do benchmark."""
+    from app.rag import sparse
+
+    if settings.hybrid_search:
+        sparse._sparse_index = BM25Index(workdir / "sparse_index.json")
+
+
+def bench_retrieval(workdir: Path, queries: int) -> dict:
+    """Latência da busca exata e do MMR no índice local, por vetor de consulta."""
+    store = _open_store(workdir)
+    questions = _questions()
+    vectors = [store.embeddings.embed_query(q) for q in questions]
+    k = settings.top_k
+
+    results = {"index_size": len(store.index), "queries": queries, "top_k": k}
+    for name, search in (
+        ("similarity", lambda v: store.similarity_search_by_vector(v, k=k)),
+        ("mmr", lambda v: store.max_marginal_relevance_search_by_vector(
+            v, k=k, lambda_mult=settings.mmr_diversity_score)),
+    ):
+        search(vectors[0])  # aquecimento (carrega o memory-map)
+        samples = []
+        t0 = perf_counter()
+        for i in range(queries):
+            t1 = perf_counter()
+            search(vectors[i % len(vectors)])
+            samples.append(perf_counter() - t1)
+        elapsed = perf_counter() - t0
+        results[name] = {**_percentiles_ms(samples), "qps": round(queries / elapsed, 1)}
+
+    sparse = BM25Index(workdir / "sparse_index.json")
+    if len(sparse):
+        samples = []
+        t0 = perf_counter()
+        for i in range(queries):
+            t1 = perf_counter()
+            sparse.search(questions[i % len(questions)], settings.hybrid_candidates)
+            samples.append(perf_counter() - t1)
+        elapsed = perf_counter() - t0
+        results["bm25"] = {**_percentiles_ms(samples), "qps": round(queries / elapsed, 1), "index_size": len(sparse)}
+    return results
+
+
+async def _ask_level(app, concurrency: int, total: int) -> dict:
+    import httpx
+
+    questions = _questions()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            async with semaphore:
+                t0 = perf_counter()
+                resp = await client.post("/api/v1/ask", json={"question": questions[i % len(questions)]})
+                resp.raise_for_status()
+                latencies.append(perf_counter() - t0)
+
+        t0 = perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = perf_counter() - t0
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        **_percentiles_ms(latencies),
+    }
+
+
+def bench_ask(workdir: Path, levels, multiplier: int, llm_latency: float) -> dict:
+    """/api/v1/ask ponta a ponta (ASGI, sem rede) sobre o índice local e o LLM simulado."""
+    from main import app
+    from app.api import routes
+
+    install_stub_llm(llm_latency)
+    _use_bench_sparse_index(workdir)
+    disable_answer_cache()
+    # As perguntas da avaliação se repetem entre as requisições: com o agrupamento
+    # ligado, a maioria seria atendida pelo SingleFlight e não pelo pipeline
+    settings.coalesce_requests = False
+    store = _open_store(workdir)
+    app.dependency_overrides[routes.get_vectorstore] = lambda: store
+    try:
+        return {
+            "llm_latency_s": llm_latency,
+            "coalesce_requests": settings.coalesce_requests,
+            "levels": [asyncio.run(_ask_level(app, c, max(c * multiplier, multiplier))) for c in levels],
+        }
+    finally:
+        app.dependency_overrides.pop(routes.get_vectorstore, None)
+
+
+async def _batch_run(app, size: int) -> dict:
+    import httpx
+
+    base = _questions()
+    questions = [f"{base[i % len(base)]} (item {i + 1})" for i in range(size)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        t0 = perf_counter()
+        resp = await client.post("/api/v1/ask", json={"question": base[0]})
+        resp.raise_for_status()
+        single = perf_counter() - t0
+
+        t0 = perf_counter()
+        lines = []
+        async with client.stream("POST", "/api/v1/ask/batch", json={"questions": questions}) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line:
+                    lines.append(json.loads(line))
+        elapsed = perf_counter() - t0
+
+    return {
+        "questions": size,
+        "failed": sum(1 for line in lines if "error" in line),
+        "single_ask_seconds": round(single, 3),
+        "batch_seconds": round(elapsed, 3),
+        "batch_vs_single": round(elapsed / single, 2) if single else None,
+        "questions_per_second": round(size / elapsed, 1) if elapsed else None,
+    }
+
+
+def bench_batch(workdir: Path, size: int, llm_latency: float) -> dict:
+    """/api/v1/ask/batch com `size` perguntas (LLM limitado por BATCH_LLM_CONCURRENCY)."""
+    from main import app
+    from app.api import routes
+
+    install_stub_llm(llm_latency)
+    _use_bench_sparse_index(workdir)
+    disable_answer_cache()
+    store = _open_store(workdir)
+    app.dependency_overrides[routes.get_vectorstore] = lambda: store
+    try:
+        return {
+            "llm_latency_s": llm_latency,
+            "llm_concurrency": settings.batch_llm_concurrency,
+            **asyncio.run(_batch_run(app, size)),
+        }
+    finally:
+        app.dependency_overrides.pop(routes.get_vectorstore, None)
+
+
+def _flatten(data, prefix=""):
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _flatten(value, f"{prefix}{key}.")
+    elif isinstance(data, list):
+        for i, value in enumerate(data):
+            label = value.get("concurrency", i) if isinstance(value, dict) else i
+            yield from _flatten(value, f"{prefix}{label}.")
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix.rstrip("."), data
+
+
+def compare(previous: dict, current: dict):
+    """Imprime a variação de cada métrica numérica em relação a um resultado anterior."""
+    def metrics(report):
+        return _flatten({**report.get("results", {}), "memory": report.get("memory", {})})
+
+    old = dict(metrics(previous))
+    print(f"\n=== {previous.get('commit')} -> {current.get('commit')} ===")
+    for name, value in metrics(current):
+        if name in old and old[name]:
+            delta = (value - old[name]) / abs(old[name]) * 100
+            print(f"{name:<50} {old[name]:>12} {value:>12} {delta:>+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data/oi")
+    parser.add_argument("--only", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--workers", type=int, default=settings.ingest_workers, help="Processos de parsing na ingestão")
+    parser.add_argument("--queries", type=int, default=500, help="Consultas no benchmark de recuperação")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Latência simulada do LLM (s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-multiplier", type=int, default=4, help="Requisições por nível = concorrência x N")
+    parser.add_argument("--batch-size", type=int, default=100, help="Perguntas no benchmark do /ask/batch")
+    parser.add_argument("--output", default=None, help="Arquivo JSON de resultados (padrão: data/bench/<data>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Resultado anterior para comparação")
+    args = parser.parse_args()
+
+    settings.coalesce_requests = False  # ver bench_ask; gravado em params para comparar execuções
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {
+            **{k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "coalesce_requests": settings.coalesce_requests,
+        },
+        "results": {},
+        "memory": {},
+    }
+    results = report["results"]
+
+    with tempfile.TemporaryDirectory(prefix="oi-bench-") as tmp:
+        workdir = Path(tmp)
+        needs_index = any(stage in args.only for stage in ("ingestion", "retrieval", "ask", "batch"))
+
+        if "chunking" in args.only:
+            print("▶ chunking")
+            results["chunking"] = bench_chunking(args.data_dir)
+            report["memory"]["after_chunking"] = _rss_peak_mb()
+
+        if needs_index:
+            # retrieval/ask dependem do índice construído pela ingestão
+            print("▶ ingestion")
+            results["ingestion"] = bench_ingestion(args.data_dir, workdir, args.workers)
+            report["memory"]["after_ingestion"] = _rss_peak_mb()
+
+        if "retrieval" in args.only:
+            print("▶ retrieval")
+            results["retrieval"] = bench_retrieval(workdir, args.queries)
+            report["memory"]["after_retrieval"] = _rss_peak_mb()
+
+        if "ask" in args.only:
+            print("▶ ask")
+            results["ask"] = bench_ask(workdir, args.concurrency, args.requests_multiplier, args.llm_latency)
+            report["memory"]["after_ask"] = _rss_peak_mb()
+
+        if "batch" in args.only:
+            print("▶ batch")
+            results["batch"] = bench_batch(workdir, args.batch_size, args.llm_latency)
+            report["memory"]["after_batch"] = _rss_peak_mb()
+
+    output = Path(args.output or f"data/bench/{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(report["results"], ensure_ascii=False, indent=2))
+    print(f"📄 Resultados gravados em {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
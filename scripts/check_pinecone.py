@@ -1,17 +1,10 @@
-import os
 from datetime import datetime
 from app.core.config import settings
-from pinecone import Pinecone
+from app.rag.vectorstore import get_pinecone_client
 
 
 def check_pinecone_status():
-    print("Conectando ao Pinecone...")
-
-    # Garantir que a key esteja disponível no ambiente
-    os.environ["PINECONE_API_KEY"] = settings.pinecone_api_key
-    os.environ["PINECONE_ENVIRONMENT"] = settings.pinecone_environment
-
-    pc = Pinecone(api_key=settings.pinecone_api_key)
+    pc = get_pinecone_client()
     indexes = pc.list_indexes()
 
     if not indexes:
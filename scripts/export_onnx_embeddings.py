@@ -0,0 +1,146 @@
+"""Exporta o modelo de embeddings para ONNX (e int8) para EMBEDDING_BACKEND=onnx.
+
+Gera em `--output` (padrão EMBEDDING_ONNX_PATH):
+- model.onnx: o transformer exportado (saída last_hidden_state);
+- model_quantized.onnx: quantização dinâmica int8 dos pesos (ONNX Runtime);
+- tokenizer.json e onnx_config.json (modelo de origem, dimensão, max_length).
+
+Em seguida compara os vetores das duas versões com os do sentence-transformers
+(perguntas da avaliação e chunks de `data/oi`) e falha se algum cosseno ficar
+abaixo de `--tolerance`: os vetores precisam continuar compatíveis com o índice.
+
+Requer torch, transformers, sentence-transformers e onnxruntime (só na exportação).
+
+Uso:
+    python -m scripts.export_onnx_embeddings [--model sentence-transformers/all-MiniLM-L6-v2] [--output data/models/...]
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+import scripts.bench_common  # noqa: F401  (chaves fictícias para carregar a configuração)
+
+import numpy as np
+
+from app.core.config import settings
+from app.rag.onnx_embeddings import CONFIG_FILE, OnnxEmbeddings
+
+QUESTIONS_PATH = Path("app/evaluation/evaluation.json")
+
+
+def export(model_name: str, output: Path, opset: int):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    class LastHiddenState(torch.nn.Module):
+        # Entradas nomeadas: a ordem posicional do forward muda entre versões do transformers
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            extra = {} if token_type_ids is None else {"token_type_ids": token_type_ids}
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, **extra).last_hidden_state
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    output.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(str(output))  # grava tokenizer.json (tokenizer "fast")
+
+    sample = tokenizer(["exemplo de texto", "outro exemplo"], padding=True, return_tensors="pt")
+    inputs = ["input_ids", "attention_mask"] + (["token_type_ids"] if "token_type_ids" in sample else [])
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in inputs}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            tuple(sample[name] for name in inputs),
+            str(output / "model.onnx"),
+            input_names=inputs,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=opset,
+        )
+
+    with open(output / CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "dim": st_model.get_sentence_embedding_dimension(),
+            "max_length": st_model.max_seq_length,
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+            "pooling": "mean",
+            "normalize": True,
+        }, f, indent=2)
+    return st_model
+
+
+def quantize(output: Path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(output / "model.onnx"), str(output / "model_quantized.onnx"), weight_type=QuantType.QInt8)
+
+
+def _sample_texts(data_dir: str, count: int):
+    from app.rag.ingest import chunk_documents, iter_source_files, load_file
+
+    with open(QUESTIONS_PATH, encoding="utf-8") as f:
+        texts = [row["question"] for row in json.load(f)]
+    chunks = []
+    for path in iter_source_files(data_dir):
+        try:
+            chunks.extend(c.page_content for c in chunk_documents(load_file(path)))
+        except Exception as e:
+            print(f"⚠️  Erro ao carregar {path.name}: {e}")
+    return texts + random.Random(42).sample(chunks, min(count, len(chunks)))
+
+
+def verify(st_model, output: Path, texts, tolerance: float, variants) -> bool:
+    """Cosseno entre os vetores de cada variante ONNX e os do sentence-transformers."""
+    reference = st_model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    ok = True
+    for quantized in variants:
+        onnx = OnnxEmbeddings(str(output), quantized=quantized)
+        cosines = np.sum(onnx.embed_array(texts) * reference, axis=1)
+        # O exportador do torch pode gravar os pesos num arquivo .onnx.data separado
+        files = [onnx.model_file, onnx.model_file.with_name(onnx.model_file.name + ".data")]
+        size_mb = sum(f.stat().st_size for f in files if f.exists()) / 1024 / 1024
+        print(
+            f"{onnx.model_file.name:<22} {size_mb:6.1f} MB | cosseno vs sentence-transformers: "
+            f"média {cosines.mean():.5f}, mínimo {cosines.min():.5f}"
+        )
+        ok = ok and cosines.min() >= tolerance
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.embedding_model)
+    parser.add_argument("--output", default=settings.embedding_onnx_path)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-quantize", action="store_true", help="Não gerar model_quantized.onnx")
+    parser.add_argument("--data-dir", default="data/oi")
+    parser.add_argument("--samples", type=int, default=200, help="Chunks usados na verificação")
+    parser.add_argument("--tolerance", type=float, default=0.98, help="Cosseno mínimo aceito contra o modelo original")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    print(f"Exportando {args.model} para {output}...")
+    st_model = export(args.model, output, args.opset)
+    if not args.no_quantize:
+        print("Quantizando pesos em int8...")
+        quantize(output)
+
+    texts = _sample_texts(args.data_dir, args.samples)
+    ok = verify(st_model, output, texts, args.tolerance, (False,) if args.no_quantize else (False, True))
+    if not ok:
+        print(f"❌ Cosseno abaixo de {args.tolerance}: os vetores não são compatíveis com o índice atual")
+        sys.exit(1)
+    print(f"✅ Modelo ONNX pronto: use EMBEDDING_BACKEND=onnx e EMBEDDING_ONNX_PATH={output}")
+
+
+if __name__ == "__main__":
+    main()
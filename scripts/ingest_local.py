@@ -1,9 +1,11 @@
+import argparse
 from pathlib import Path
 from time import perf_counter
-from app.rag.ingest import load_documents, chunk_documents
-from app.rag.vectorstore import build_or_load_vectorstore
+from app.core.config import settings
+from app.rag.ingest import LegacyIndexError, incremental_ingest
+from app.rag.vectorstore import index_vector_count
 
-def ingest_open_insurance_docs():
+def ingest_open_insurance_docs(workers=None, file_timeout=None, rebuild=False):
     t0 = perf_counter()
     base_dir = Path("data/oi")
 
@@ -11,24 +13,43 @@ def ingest_open_insurance_docs():
         print("Pasta 'data/oi/' não encontrada. Crie-a e adicione os arquivos oficiais da SUSEP/Open Insurance.")
         return
 
-    print("Lendo documentos em data/oi/ ...")
-    docs = load_documents(str(base_dir))
-    print(f"Total de documentos encontrados: {len(docs)}")
+    if rebuild:
+        print("Apagando o índice vetorial, o BM25 e o manifesto para reindexar todos os documentos...")
+    print("Sincronizando documentos em data/oi/ com o índice (ingestão incremental)...")
+    try:
+        stats = incremental_ingest(str(base_dir), workers=workers, file_timeout=file_timeout, rebuild=rebuild)
+    except LegacyIndexError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
 
-    if not docs:
+    if not stats.get("files_total"):
         print("Nenhum arquivo encontrado. Verifique se há PDFs, TXTs ou MDs na pasta.")
         return
 
-    print("Dividindo documentos em chunks...")
-    chunks = chunk_documents(docs)
-    print(f"Chunks gerados: {len(chunks)}")
-
-    print("Armazenando embeddings no Pinecone...")
-    vs = build_or_load_vectorstore(chunks)
+    print(f"Arquivos: {stats.get('files_total', 0)} | inalterados: {stats.get('files_unchanged', 0)} | "
+          f"alterados/novos: {stats.get('files_changed', 0)} | removidos: {stats.get('files_removed', 0)} | "
+          f"com erro: {stats.get('files_failed', 0)}")
+    print(f"Chunks adicionados: {stats.get('chunks_added', 0)} | removidos: {stats.get('chunks_deleted', 0)}")
+    if "chunks_per_second" in stats:
+        print(f"Embeddings: {stats['chunks_embedded']} chunks em {stats['embed_seconds']}s | "
+              f"upsert: {stats['vectors_upserted']} vetores | retentativas: {stats['retries']} | "
+              f"falhas: {stats['failed_vectors']}")
+        print(f"Throughput: {stats['chunks_per_second']} chunks/s")
+    if "sparse_chunks" in stats:
+        print(f"Índice BM25: {stats['sparse_chunks']} chunks")
 
     elapsed = round(perf_counter() - t0, 2)
     print(f"Ingestão concluída com sucesso em {elapsed}s!")
-    print("Vetores disponíveis no índice Pinecone configurado em .env.")
+    if settings.vector_backend == "local":
+        destination = f"índice local ({settings.local_index_path})"
+    else:
+        destination = f"índice Pinecone '{settings.pinecone_index_name}'"
+    print(f"Vetores disponíveis no {destination}: {index_vector_count()}")
 
 if __name__ == "__main__":
-    ingest_open_insurance_docs()
+    parser = argparse.ArgumentParser(description="Ingestão incremental dos documentos de data/oi no índice vetorial")
+    parser.add_argument("--workers", type=int, default=None, help="Processos para leitura/chunking (padrão: INGEST_WORKERS)")
+    parser.add_argument("--file-timeout", type=float, default=None, help="Tempo máximo por arquivo em segundos (padrão: INGEST_FILE_TIMEOUT)")
+    parser.add_argument("--rebuild", action="store_true", help="Apagar o índice e o manifesto e reindexar tudo (necessário uma vez em índices antigos, com IDs aleatórios)")
+    args = parser.parse_args()
+    ingest_open_insurance_docs(workers=args.workers, file_timeout=args.file_timeout, rebuild=args.rebuild)
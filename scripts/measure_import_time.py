@@ -0,0 +1,101 @@
+"""Mede o tempo de import dos pontos de entrada da API, do front e dos scripts.
+
+Cada módulo é importado em um processo Python novo com `-X importtime`; o
+resultado mostra o tempo total (processo inteiro e só imports) e as dependências
+mais pesadas, para identificar o que deixou o startup lento.
+
+Uso:
+    python -m scripts.measure_import_time [--top 5] [--json resultados.json] [modulo ...]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from time import perf_counter
+
+DEFAULT_MODULES = [
+    "app.core.config",
+    "app.rag.rag_pipeline",
+    "app.rag.ingest",
+    "app.api.routes",
+    "main",
+    "app.agents.open_insurance_agent",
+    "scripts.ingest_local",
+]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> dict:
+    env = dict(os.environ)
+    # Valores fictícios para que app.core.config carregue sem .env
+    env.setdefault("PINECONE_API_KEY", "offline")
+    env.setdefault("GROQ_API_KEY", "offline")
+
+    t0 = perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    wall = perf_counter() - t0
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            imports.append((name, int(cumulative), len(indent)))
+
+    # Pacotes importados diretamente (menor indentação) somam o tempo total de import
+    top_level = min((depth for _, _, depth in imports), default=0)
+    total_us = sum(us for _, us, depth in imports if depth == top_level)
+
+    # Custo de cada pacote externo = maior tempo acumulado entre seus módulos
+    own = {module.split(".")[0], "app", "main", "scripts", "site", "encodings"}
+    packages = {}
+    for name, us, _ in imports:
+        package = name.split(".")[0]
+        if package not in own and not package.startswith("_"):
+            packages[package] = max(packages.get(package, 0), us)
+
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "wall_seconds": round(wall, 3),
+        "import_seconds": round(total_us / 1e6, 3),
+        "heaviest": [
+            {"name": name, "seconds": round(us / 1e6, 3)}
+            for name, us in sorted(packages.items(), key=lambda p: p[1], reverse=True)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=5, help="Dependências mais pesadas exibidas por módulo")
+    parser.add_argument("--json", default=None, help="Grava os resultados em JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'módulo':<36} | {'processo (s)':>12} | {'imports (s)':>11} | mais pesados")
+    for module in args.modules:
+        r = measure(module)
+        r["heaviest"] = r["heaviest"][:args.top]
+        results.append(r)
+        if not r["ok"]:
+            print(f"{module:<36} | {'erro':>12} | {'':>11} | {r['error']}")
+            continue
+        heaviest = ", ".join(f"{h['name']} {h['seconds']}s" for h in r["heaviest"])
+        print(f"{module:<36} | {r['wall_seconds']:>12} | {r['import_seconds']:>11} | {heaviest}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
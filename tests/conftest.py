@@ -0,0 +1 @@
+import scripts.bench_common  # noqa: F401  (chaves fictícias para carregar a configuração)
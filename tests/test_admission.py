@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.admission import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdmissionController, Overloaded, ProviderLimiter, TokenBucket,
+)
+
+
+def _controller(max_concurrency=1, queue_size=8, limiters=None, service_time=2.0):
+    controller = AdmissionController(limiters or [ProviderLimiter("stub")], max_concurrency, queue_size)
+    controller.service_time = service_time
+    return controller
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.wait_time(2) == 0.0
+    bucket.take(2)
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+    assert TokenBucket(rate=0, capacity=0).wait_time(1000) == 0.0
+
+
+def test_acquire_returns_provider_and_release_frees_slot():
+    async def run():
+        controller = _controller()
+        assert await controller.acquire(deadline=1, tokens=0) == "stub"
+        assert controller.inflight == 1
+        controller.release(0.5)
+        assert controller.inflight == 0
+        assert controller.service_time == pytest.approx(0.9 * 2.0 + 0.1 * 0.5)
+
+    asyncio.run(run())
+
+
+def test_sheds_when_queue_is_full():
+    async def run():
+        controller = _controller(queue_size=1)
+        await controller.acquire(deadline=30, tokens=0)
+        waiting = asyncio.ensure_future(controller.acquire(deadline=30, tokens=0))
+        await asyncio.sleep(0)
+        assert controller.queue_depth() == 1
+
+        with pytest.raises(Overloaded) as exc:
+            await controller.acquire(deadline=30, tokens=0)
+        assert "fila" in exc.value.reason
+        assert exc.value.retry_after >= 1.0
+
+        controller.release(0.1)
+        assert await waiting == "stub"
+
+    asyncio.run(run())
+
+
+def test_sheds_immediately_when_estimated_wait_exceeds_deadline():
+    async def run():
+        controller = _controller(service_time=5.0)
+        await controller.acquire(deadline=30, tokens=0)
+        t0 = time.monotonic()
+        with pytest.raises(Overloaded) as exc:
+            await controller.acquire(deadline=1, tokens=0)
+        assert time.monotonic() - t0 < 0.1
+        assert "prazo" in exc.value.reason
+        assert exc.value.retry_after == pytest.approx(5.0)
+        assert controller.queue_depth() == 0
+
+    asyncio.run(run())
+
+
+def test_times_out_in_queue_and_leaves_no_waiter_behind():
+    async def run():
+        controller = _controller(service_time=0.05)
+        await controller.acquire(deadline=30, tokens=0)
+        with pytest.raises(Overloaded) as exc:
+            await controller.acquire(deadline=0.1, tokens=0)
+        assert "esgotado" in exc.value.reason
+        assert controller.queue_depth() == 0
+
+        controller.release(0.05)
+        assert controller.inflight == 0
+        assert await controller.acquire(deadline=1, tokens=0) == "stub"
+
+    asyncio.run(run())
+
+
+def test_interactive_requests_are_served_before_batch():
+    async def run():
+        controller = _controller()
+        await controller.acquire(deadline=30, tokens=0)
+        order = []
+
+        async def request(name, priority):
+            await controller.acquire(priority, deadline=30, tokens=0)
+            order.append(name)
+            controller.release(0.01)
+
+        batch = asyncio.ensure_future(request("batch", PRIORITY_BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(request("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+
+        controller.release(0.01)
+        await asyncio.gather(batch, interactive)
+        assert order == ["interactive", "batch"]
+
+    asyncio.run(run())
+
+
+def test_provider_quota_sheds_and_falls_back_to_provider_with_quota():
+    async def run():
+        limited = ProviderLimiter("groq", rpm=1)
+        controller = _controller(max_concurrency=4, limiters=[limited])
+        await controller.acquire(deadline=5, tokens=0)
+        # Próxima requisição só caberia em ~60s: recusada pelo prazo
+        with pytest.raises(Overloaded):
+            await controller.acquire(deadline=5, tokens=0)
+
+        controller = _controller(max_concurrency=4, limiters=[limited, ProviderLimiter("openai", rpm=60)])
+        assert await controller.acquire(deadline=5, tokens=0) == "openai"
+
+    asyncio.run(run())
+
+
+def test_token_quota_counts_estimated_tokens():
+    limiter = ProviderLimiter("groq", tpm=6000)
+    assert limiter.wait_time(1, 6000) == 0.0
+    limiter.take(6000)
+    assert limiter.wait_time(1, 3000) == pytest.approx(30.0, abs=0.5)
+    # Requisição maior que a cota inteira consome a cota cheia em vez de nunca caber
+    assert limiter.wait_time(1, 10**6) == pytest.approx(60.0, abs=0.5)
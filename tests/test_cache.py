@@ -0,0 +1,69 @@
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from scripts.bench_common import HashEmbeddings
+
+from app.rag.cache import AnswerCache, InMemoryCacheBackend, VectorMatrix
+
+QUESTIONS = ["qual o prazo do DCR", "o que é FAPI", "quais certificados são aceitos", "requisitos do RDD"]
+
+
+def _cache(max_size=8, ttl_seconds=60):
+    return AnswerCache(InMemoryCacheBackend(max_size, ttl_seconds), similarity_threshold=0.95)
+
+
+def _fill(cache, embeddings, questions=QUESTIONS):
+    for q in questions:
+        cache.set(q, "concise", f"resposta: {q}", [Document(page_content=q)], embeddings.embed_query(q))
+
+
+def test_vector_matrix_reuses_rows_and_skips_removed_keys():
+    matrix = VectorMatrix()
+    matrix.put("a", [1.0, 0.0])
+    matrix.put("b", [0.0, 1.0])
+    assert matrix.nearest([0.9, 0.1])[0] == "a"
+
+    matrix.remove("a")
+    assert matrix.nearest([1.0, 0.0])[0] == "b"
+    matrix.put("c", [0.7, 0.7])
+    assert len(matrix) == 2 and len(matrix._keys) == 2  # linha de "a" reaproveitada
+
+    key, score = matrix.nearest([1.0, 1.0])
+    assert key == "c" and score == pytest.approx(1.0)
+
+
+def test_similar_question_hits_and_unrelated_question_misses():
+    embeddings = HashEmbeddings()
+    cache = _cache()
+    _fill(cache, embeddings)
+
+    answer, docs = cache.get_similar(embeddings.embed_query("O que é FAPI?"), "concise")
+    assert answer == "resposta: o que é FAPI" and docs[0].page_content == "o que é FAPI"
+    assert cache.get_similar(embeddings.embed_query("horário de funcionamento"), "concise") is None
+    assert cache.get_similar(embeddings.embed_query("o que é FAPI"), "detailed") is None
+    assert cache.stats()["hits_semantic"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_evicted_and_invalidated_entries_leave_the_vector_matrix():
+    embeddings = HashEmbeddings()
+    cache = _cache(max_size=3)
+    _fill(cache, embeddings)
+
+    assert len(cache.backend) == 3
+    assert cache.get_similar(embeddings.embed_query(QUESTIONS[0]), "concise") is None  # expulsa (LRU)
+    assert cache.get_similar(embeddings.embed_query(QUESTIONS[-1]), "concise") is not None
+
+    cache.invalidate()
+    assert cache.get_similar(embeddings.embed_query(QUESTIONS[-1]), "concise") is None
+
+
+def test_expired_hit_counts_as_miss_and_drops_the_vector():
+    embeddings = HashEmbeddings()
+    cache = _cache(ttl_seconds=0.01)
+    _fill(cache, embeddings, QUESTIONS[:1])
+    time.sleep(0.02)
+
+    assert cache.get_similar(embeddings.embed_query(QUESTIONS[0]), "concise") is None
+    assert cache.backend.nearest(cache._namespace("concise"), embeddings.embed_query(QUESTIONS[0])) is None
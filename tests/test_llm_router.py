@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from scripts.bench_common import StubVectorStore
+
+from app.core.config import settings
+from app.core.llm_router import LLMRouter, Provider, StubChatModel
+from app.core.metrics import LLM_ERRORS
+from app.rag import rag_pipeline
+
+
+def _router():
+    # O provider preferido sempre falha: a resposta vem do segundo (failover)
+    return LLMRouter([
+        Provider("stub:0.01:1", StubChatModel(0.01, 1.0, answer="primário")),
+        Provider("stub:0.01", StubChatModel(0.01, answer="secundário")),
+    ])
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    monkeypatch.setattr(settings, "admission_enabled", False)
+    monkeypatch.setattr(settings, "coalesce_requests", False)
+    monkeypatch.setattr(rag_pipeline, "llm", _router())
+    return StubVectorStore(search_latency=0.0, embed_latency=0.0)
+
+
+def _errors(provider):
+    return LLM_ERRORS.labels(provider, "RuntimeError")._value.get()
+
+
+def test_metadata_reports_the_provider_that_answered(pipeline):
+    before = _errors("stub:0.01:1")
+    answer, metadata = asyncio.run(rag_pipeline.aanswer_question(pipeline, "Quais são os requisitos do DCR?"))
+    assert answer == "secundário"
+    assert metadata["llm_provider"] == "stub:0.01"
+
+    async def stream():
+        return [event async for event in rag_pipeline.astream_answer_question(pipeline, "O que é FAPI?")]
+
+    events = asyncio.run(stream())
+    assert dict(events)["done"]["llm_provider"] == "stub:0.01"
+    assert "".join(data for event, data in events if event == "token").strip() == "secundário"
+    # As falhas absorvidas pelo failover não contam como erro da requisição
+    assert _errors("stub:0.01:1") == before
+
+
+def test_errors_are_labeled_with_the_failing_provider(pipeline, monkeypatch):
+    monkeypatch.setattr(rag_pipeline, "llm", LLMRouter([Provider("stub:0.01:1", StubChatModel(0.01, 1.0))]))
+    before = _errors("stub:0.01:1")
+    with pytest.raises(RuntimeError):
+        asyncio.run(rag_pipeline.aanswer_question(pipeline, "Quais são os requisitos do DCR?"))
+    assert _errors("stub:0.01:1") == before + 1
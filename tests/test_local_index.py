@@ -0,0 +1,59 @@
+import threading
+
+import numpy as np
+import pytest
+
+from scripts.bench_common import HashEmbeddings
+
+from app.rag.local_index import LocalVectorIndex, LocalVectorStore
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_search_results_stay_consistent_during_concurrent_persist(tmp_path, quantization):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(600, 384)).astype(np.float32)
+    index = LocalVectorIndex(tmp_path, quantization=quantization)
+    index.upsert([{"id": str(i), "values": v, "metadata": {"n": i, "text": f"chunk {i}"}} for i, v in enumerate(data)])
+    index.persist()
+    store = LocalVectorStore(index, HashEmbeddings())
+
+    stop = threading.Event()
+    errors = []
+
+    def compact():
+        # Cada persist() remove linhas e renumera as restantes
+        for i in range(0, 300, 5):
+            index.delete(ids=[str(i)])
+            index.persist()
+        stop.set()
+
+    def query():
+        local_rng = np.random.default_rng()
+        try:
+            while not stop.is_set():
+                for hit in index.search(data[local_rng.integers(len(data))], 10, return_vectors=True):
+                    assert hit["metadata"]["n"] == int(hit["id"])
+                    assert np.allclose(hit["vector"], data[int(hit["id"])] / np.linalg.norm(data[int(hit["id"])]))
+                for doc in store.max_marginal_relevance_search_by_vector(data[0], k=5, fetch_k=20):
+                    assert doc.page_content == f"chunk {doc.id}"
+        except Exception as e:  # noqa: BLE001  (reportado na thread principal)
+            errors.append(e)
+
+    threads = [threading.Thread(target=query) for _ in range(3)] + [threading.Thread(target=compact)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    assert not errors, errors[0]
+    assert len(index) == 540
+
+
+def test_similarity_search_returns_documents_with_exact_scores(tmp_path):
+    embeddings = HashEmbeddings()
+    store = LocalVectorStore.from_texts(
+        ["prazo do DCR", "certificados FAPI", "relatório RDD"], embeddings, path=str(tmp_path), ids=["a", "b", "c"]
+    )
+    (doc, score), *_ = store.similarity_search_with_score("certificados FAPI", k=2)
+    assert doc.id == "b" and doc.page_content == "certificados FAPI"
+    assert score == pytest.approx(1.0, abs=1e-5)
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from scripts.bench_common import HashEmbeddings
+
+from app.core.config import settings
+from app.rag import vectorstore
+from app.rag.ingest import LegacyIndexError, incremental_ingest
+from app.rag.local_index import LocalVectorIndex
+from app.rag.manifest import IngestManifest, chunk_id, content_hash
+from app.rag.sparse import BM25Index
+
+PARAGRAPHS = [
+    f"Seção {i}. O participante deve registrar o cliente no diretório (DCR) e usar FAPI com certificados ICP. " * 4
+    for i in range(6)
+]
+
+
+def _write(path, paragraphs):
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+def test_chunk_id_is_deterministic_per_source_content_and_occurrence():
+    h = content_hash("texto")
+    assert chunk_id("data/oi/a.txt", h) == chunk_id("data/oi/a.txt", h)
+    assert chunk_id("data/oi/a.txt", h) != chunk_id("data/oi/b.txt", h)
+    assert chunk_id("data/oi/a.txt", h, 0) != chunk_id("data/oi/a.txt", h, 1)
+
+
+def test_is_unchanged_detects_content_changes(tmp_path):
+    doc = tmp_path / "a.txt"
+    doc.write_text("conteúdo original", encoding="utf-8")
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    assert not manifest.is_unchanged("a.txt", doc)
+
+    manifest.update("a.txt", doc, ["id-1"])
+    manifest.save()
+    manifest = IngestManifest.load(tmp_path / "manifest.json")
+    assert manifest.is_unchanged("a.txt", doc)
+
+    # Mesmo conteúdo com outro mtime (ex.: cópia): inalterado, e o mtime é atualizado
+    os.utime(doc, (1, 1))
+    assert manifest.is_unchanged("a.txt", doc)
+    assert manifest.get("a.txt")["mtime"] == 1
+
+    # Mesmo tamanho, conteúdo diferente
+    doc.write_text("conteúdo alterado", encoding="utf-8")
+    os.utime(doc, (2, 2))
+    assert not manifest.is_unchanged("a.txt", doc)
+
+    doc.write_text("conteúdo bem mais longo que o original", encoding="utf-8")
+    assert not manifest.is_unchanged("a.txt", doc)
+
+
+@pytest.fixture
+def local_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_backend", "local")
+    index = LocalVectorIndex(tmp_path / "index", dim=384)
+    monkeypatch.setattr(vectorstore, "_index", index)
+    monkeypatch.setattr(vectorstore, "_embeddings", HashEmbeddings())
+    return index
+
+
+def _ingest(tmp_path, **kwargs):
+    return incremental_ingest(
+        str(tmp_path / "docs"), manifest_path=tmp_path / "manifest.json", workers=1,
+        sparse=BM25Index(tmp_path / "sparse.json"), **kwargs,
+    )
+
+
+def test_incremental_ingest_only_reindexes_what_changed(tmp_path, local_index):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs / "a.txt", PARAGRAPHS)
+    _write(docs / "b.txt", PARAGRAPHS[:2])
+
+    first = _ingest(tmp_path)
+    assert first["files_changed"] == 2
+    total = len(local_index)
+    assert first["chunks_added"] == total > 0
+
+    second = _ingest(tmp_path)
+    assert second["files_unchanged"] == 2
+    assert "chunks_embedded" not in second  # nenhum embedding nem vectorstore carregado
+
+    # Só a seção nova de a.txt é embedada; as demais mantêm os IDs
+    _write(docs / "a.txt", PARAGRAPHS + ["Seção nova sobre o RDD e prazos de resposta. " * 4])
+    third = _ingest(tmp_path)
+    assert third["files_changed"] == 1 and third["files_unchanged"] == 1
+    assert third["chunks_added"] == third["chunks_embedded"] >= 1
+    assert third["chunks_embedded"] < third["chunks_total"]
+
+    (docs / "b.txt").unlink()
+    removed = IngestManifest.load(tmp_path / "manifest.json").get((docs / "b.txt").as_posix())["ids"]
+    fourth = _ingest(tmp_path)
+    assert fourth["files_removed"] == 1
+    assert fourth["chunks_deleted"] == len(removed)
+    assert len(local_index) == total + third["chunks_added"] - third.get("chunks_deleted", 0) - len(removed)
+
+
+def test_untracked_index_requires_rebuild(tmp_path, local_index):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs / "a.txt", PARAGRAPHS)
+    # Vetor de um índice antigo, com ID aleatório e sem manifesto
+    local_index.upsert([{"id": "6f1c2c9e-uuid", "values": [0.1] * 384, "metadata": {"text": "antigo"}}])
+
+    with pytest.raises(LegacyIndexError):
+        _ingest(tmp_path)
+    assert len(local_index) == 1
+
+    stats = _ingest(tmp_path, rebuild=True)
+    assert "6f1c2c9e-uuid" not in local_index._positions
+    assert len(local_index) == stats["chunks_added"]
+    assert _ingest(tmp_path)["files_unchanged"] == 1
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from app.rag import quantization as quant
+from app.rag.local_index import LocalVectorIndex
+
+K = 10
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    # Vetores densos agrupados em torno de "tópicos", como embeddings de chunks reais
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(40, 384))
+    data = centers[rng.integers(0, len(centers), 2000)] + rng.normal(scale=0.8, size=(2000, 384))
+    queries = data[rng.choice(len(data), 100, replace=False)] + rng.normal(scale=0.5, size=(100, 384))
+    return data.astype(np.float32), queries.astype(np.float32)
+
+
+def _build(path, kind, data, rescore_factor=4):
+    index = LocalVectorIndex(path / kind, quantization=kind, rescore_factor=rescore_factor)
+    index.upsert([{"id": str(i), "values": v, "metadata": {"n": i}} for i, v in enumerate(data)])
+    index.persist()
+    return index
+
+
+def _recall(index, baseline, queries):
+    found = [{hit["id"] for hit in index.search(q, K)} for q in queries]
+    return float(np.mean([len(f & set(b)) / K for f, b in zip(found, baseline)]))
+
+
+@pytest.fixture(scope="module")
+def indexes(corpus, tmp_path_factory):
+    data, queries = corpus
+    path = tmp_path_factory.mktemp("quant")
+    built = {kind: _build(path, kind, data) for kind in quant.QUANTIZATIONS}
+    baseline = [[hit["id"] for hit in built["none"].search(q, K)] for q in queries]
+    return built, baseline
+
+
+@pytest.mark.parametrize("kind, factor, minimum", [
+    ("int8", 1, 0.95),
+    ("int8", 4, 0.99),
+    ("binary", 4, 0.9),
+    ("binary", 10, 0.99),
+])
+def test_recall_against_float_search(corpus, indexes, kind, factor, minimum):
+    _, queries = corpus
+    built, baseline = indexes
+    index = built[kind]
+    index.rescore_factor = factor
+    assert _recall(index, baseline, queries) >= minimum
+
+
+def test_rescored_scores_are_exact_cosines(corpus, indexes):
+    data, queries = corpus
+    built, _ = indexes
+    normalized = data / np.linalg.norm(data, axis=1, keepdims=True)
+    query = queries[0] / np.linalg.norm(queries[0])
+    for kind in ("int8", "binary"):
+        for hit in built[kind].search(queries[0], K):
+            assert hit["score"] == pytest.approx(float(normalized[int(hit["id"])] @ query), abs=1e-5)
+
+
+def test_codes_are_smaller_than_float_vectors(indexes):
+    built, _ = indexes
+    float_bytes = built["none"].memory_bytes()["vectors"]
+    assert built["int8"].memory_bytes()["codes"] * 4 == float_bytes
+    assert built["binary"].memory_bytes()["codes"] * 32 == float_bytes
+
+
+def test_int8_approximate_scores_track_float_scores(corpus):
+    data, queries = corpus
+    normalized = data / np.linalg.norm(data, axis=1, keepdims=True)
+    query = queries[0] / np.linalg.norm(queries[0])
+    codes, scale = quant.encode("int8", normalized)
+    approx = quant.approximate_scores("int8", codes, query, scale)
+    assert np.corrcoef(approx, normalized @ query)[0, 1] > 0.999
+
+
+def test_quantized_index_reloads_and_keeps_incremental_changes(corpus, tmp_path):
+    data, queries = corpus
+    index = _build(tmp_path, "int8", data[:500])
+    index.upsert([{"id": "novo", "values": queries[0], "metadata": {}}])
+    index.delete(ids=["0"])
+    index.persist()
+
+    reloaded = LocalVectorIndex(tmp_path / "int8", quantization="int8")
+    assert len(reloaded) == 500
+    best = reloaded.search(queries[0], 1)[0]
+    assert best["id"] == "novo" and best["score"] == pytest.approx(1.0, abs=1e-5)
+    assert "0" not in {hit["id"] for hit in reloaded.search(data[0], K)}
+
+
+def test_unknown_quantization_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        LocalVectorIndex(tmp_path / "x", quantization="pq")
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from scripts.bench_common import StubLLM, StubVectorStore
+
+from app.core.admission import request_options
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.core.tracing import start_trace
+from app.rag import rag_pipeline
+
+
+class Boom(Exception):
+    pass
+
+
+def test_do_shares_the_leader_error_with_followers():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, errors = [], []
+
+    def failing():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        raise Boom("falhou")
+
+    def call():
+        try:
+            flight.do("k", failing)
+        except Boom as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(1)
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for t in followers:
+        t.start()
+    time.sleep(0.1)  # seguidores chegam com o líder ainda em execução
+    release.set()
+    for t in [leader, *followers]:
+        t.join(1)
+
+    assert len(calls) == 1
+    assert len(errors) == 4 and len({id(e) for e in errors}) == 1
+    assert flight.in_flight() == 0
+    # A chave é liberada: a próxima chamada executa de novo
+    assert flight.do("k", lambda: "ok") == ("ok", False)
+
+
+def test_ado_shares_the_leader_error_and_forgets_the_key():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise Boom("falhou")
+
+        results = await asyncio.gather(*(flight.ado("k", failing) for _ in range(5)), return_exceptions=True)
+        assert len(calls) == 1
+        assert all(isinstance(r, Boom) for r in results)
+        assert flight.in_flight() == 0
+
+        async def ok():
+            return "ok"
+
+        assert await flight.ado("k", ok) == ("ok", False)
+
+    asyncio.run(run())
+
+
+def test_ado_followers_survive_leader_cancellation():
+    async def run():
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "resposta"
+
+        leader = asyncio.ensure_future(flight.ado("k", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == ("resposta", True)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    monkeypatch.setattr(settings, "admission_enabled", False)
+    monkeypatch.setattr(settings, "coalesce_requests", True)
+    monkeypatch.setattr(rag_pipeline, "llm", StubLLM(latency=0.05))
+    return StubVectorStore(search_latency=0.0, embed_latency=0.0)
+
+
+def test_aanswer_question_coalesces_only_matching_admission_options(pipeline):
+    async def ask(deadline=None, trace=False):
+        with request_options(deadline=deadline):
+            if trace:
+                with start_trace("ask"):
+                    return await rag_pipeline.aanswer_question(pipeline, "Quais são os requisitos do DCR?")
+            return await rag_pipeline.aanswer_question(pipeline, "quais são os requisitos do  DCR")
+
+    async def run():
+        return await asyncio.gather(ask(), ask(), ask(deadline=5), ask(trace=True))
+
+    coalesced = [metadata.get("coalesced", False) for _, metadata in asyncio.run(run())]
+    assert coalesced == [False, True, False, False]
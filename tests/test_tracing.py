@@ -0,0 +1,34 @@
+import asyncio
+
+from app.core.tracing import current_trace, span, start_trace
+
+
+def test_trace_closed_from_another_context_does_not_raise():
+    # Como no SSE após a desconexão do cliente: o gerador é finalizado em outra task
+    traces = []
+
+    async def events():
+        with start_trace("ask_stream") as trace, span("llm"):
+            traces.append(trace)
+            yield "token"
+            yield "token"
+
+    async def run():
+        stream = events()
+        assert await stream.__anext__() == "token"
+        await asyncio.create_task(stream.aclose())
+        assert traces[0].root.end is not None
+
+    asyncio.run(run())
+
+
+def test_nested_spans_restore_the_parent():
+    with start_trace("ask") as trace:
+        with span("retrieval"):
+            with span("rerank"):
+                pass
+        with span("llm"):
+            pass
+    assert [child.name for child in trace.root.children] == ["retrieval", "llm"]
+    assert [child.name for child in trace.root.children[0].children] == ["rerank"]
+    assert current_trace() is None